@@ -14,11 +14,44 @@ def create_app(config_class=Config):
                 template_folder='../templates',
                 static_folder='../static')
     app.config.from_object(config_class)
+
+    from app.utils.db_engine import init_engine_options
+    init_engine_options(app)
     
     # Initialize extensions
     db.init_app(app)
     migrate.init_app(app, db)
     login_manager.init_app(app)
+
+    from app.utils.metrics import metrics
+    metrics.init_app(app)
+
+    from app.utils.db_engine import configure_engine
+    configure_engine(app, db)
+
+    from app.utils.blob_store import blob_store
+    blob_store.init_app(app)
+
+    from app.utils.jobs import job_queue
+    job_queue.init_app(app)
+
+    from app.utils.tts_pool import tts_pool
+    tts_pool.init_app(app)
+
+    from app.utils.summarizer import summarizer
+    summarizer.init_app(app)
+
+    from app.utils.context_cache import context_cache
+    context_cache.init_app(app)
+
+    from app.utils.media_gc import media_collector
+    media_collector.init_app(app)
+
+    from app.utils.services import services
+    services.init_app(app)
+
+    from app.utils.model_manager import model_manager
+    model_manager.init_app(app)
     
     # Define user loader for Flask-Login
     @login_manager.user_loader
@@ -30,9 +63,11 @@ def create_app(config_class=Config):
     from app.routes.main import main_bp
     from app.routes.auth import auth_bp
     from app.routes.chat import chat_bp
+    from app.routes.media import media_bp
     
     app.register_blueprint(main_bp)
     app.register_blueprint(auth_bp, url_prefix='/auth')
     app.register_blueprint(chat_bp, url_prefix='/chat')
+    app.register_blueprint(media_bp)
     
     return app
\ No newline at end of file
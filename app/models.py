@@ -2,6 +2,7 @@ from app import db, login_manager
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
+import json
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -31,28 +32,41 @@ class User(UserMixin, db.Model):
         return f'<User {self.username}>'
 
 class Conversation(db.Model):
+    __table_args__ = (
+        db.Index('ix_conversation_user_id_start_time', 'user_id', 'start_time'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     start_time = db.Column(db.DateTime, default=datetime.utcnow)
     last_updated = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    summary = db.Column(db.Text)  # Running summary of the turns older than the recent window
+    summarized_until = db.Column(db.Integer)  # Id of the last message folded into the summary
     messages = db.relationship('Message', backref='conversation', lazy='dynamic', cascade='all, delete-orphan', order_by='Message.timestamp.asc()')
+    jobs = db.relationship('ChatJob', backref='conversation', lazy='dynamic', cascade='all, delete-orphan')
     
-    def to_dict(self):
+    def to_dict(self, messages=None):
+        # Pass already-loaded ``messages`` to avoid a query per conversation.
         return {
             'id': self.id,
             'user_id': self.user_id,
             'start_time': self.start_time.isoformat(),
             'last_updated': self.last_updated.isoformat(),
-            'messages': [message.to_dict() for message in self.messages]
+            'messages': [message.to_dict() for message in (self.messages if messages is None else messages)]
         }
 
 class Message(db.Model):
+    __table_args__ = (
+        db.Index('ix_message_conversation_id_timestamp', 'conversation_id', 'timestamp'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     conversation_id = db.Column(db.Integer, db.ForeignKey('conversation.id'), nullable=False)
     sender = db.Column(db.String(20), nullable=False)  # 'user' or 'doctor'
     text_content = db.Column(db.Text)
     image_path = db.Column(db.String(255))
     audio_path = db.Column(db.String(255))
+    audio_status = db.Column(db.String(10))  # 'pending', 'ready' or 'failed' for synthesized replies
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     
     def to_dict(self):
@@ -62,9 +76,44 @@ class Message(db.Model):
             'text_content': self.text_content,
             'image_path': self.image_path,
             'audio_path': self.audio_path,
+            'audio_status': self.audio_status,
             'timestamp': self.timestamp.isoformat()
         }
 
+class Blob(db.Model):
+    """One stored upload per distinct content (see app/utils/blob_store.py)."""
+    digest = db.Column(db.String(64), primary_key=True)  # SHA-256 of the content
+    extension = db.Column(db.String(10), nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)  # Messages whose image_path/audio_path point here
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class ChatJob(db.Model):
+    __table_args__ = (
+        db.Index('ix_chat_job_user_id_status', 'user_id', 'status'),
+        db.Index('ix_chat_job_finished_at', 'finished_at'),
+    )
+
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    conversation_id = db.Column(db.Integer, db.ForeignKey('conversation.id'), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # 'queued', 'running', 'done' or 'failed'
+    result = db.Column(db.Text)  # JSON-encoded chat response once done
+    error = db.Column(db.String(255))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'conversation_id': self.conversation_id,
+            'result': json.loads(self.result) if self.result else None,
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
 @login_manager.user_loader
 def load_user(id):
     return User.query.get(int(id))
\ No newline at end of file
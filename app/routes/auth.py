@@ -1,9 +1,11 @@
-import os
 from datetime import datetime
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_user, logout_user, login_required, current_user
 from app.models import User, Conversation, Message
 from app import db
+from app.utils.blob_store import blob_store
+from app.utils.context_cache import context_cache
+from app.utils.media_gc import media_collector
 import logging
 
 auth_bp = Blueprint('auth', __name__)
@@ -139,6 +141,7 @@ def update_profile():
     current_user.medical_history = medical_history if medical_history else None
 
     db.session.commit()
+    context_cache.invalidate_user(current_user.id)
     flash('Profile updated successfully!', category='success')
     logger.info(f"User {current_user.username} updated their profile successfully")
     return redirect(url_for('auth.profile'))
@@ -148,21 +151,18 @@ def update_profile():
 def delete_account():
     logger.info(f"User {current_user.username} is deleting their account")
     
-    # Delete associated files (images and audio)
+    # Media files are removed by the collector once nothing references them
     conversations = Conversation.query.filter_by(user_id=current_user.id).all()
     for conversation in conversations:
         for message in conversation.messages:
-            if message.image_path and os.path.exists(os.path.join('app', 'static', message.image_path.lstrip('/'))):
-                os.remove(os.path.join('app', 'static', message.image_path.lstrip('/')))
-                logger.info(f"Deleted image file: {message.image_path}")
-            if message.audio_path and os.path.exists(os.path.join('app', 'static', message.audio_path.lstrip('/'))):
-                os.remove(os.path.join('app', 'static', message.audio_path.lstrip('/')))
-                logger.info(f"Deleted audio file: {message.audio_path}")
+            blob_store.release(message.image_path, message.audio_path)
 
     # Delete the user (conversations and messages will be deleted automatically due to CASCADE)
     user = User.query.get(current_user.id)
     db.session.delete(user)
     db.session.commit()
+    context_cache.invalidate_user(user.id)
+    media_collector.schedule()
     
     logout_user()
     flash('Your account has been deleted successfully.', category='success')
@@ -1,15 +1,26 @@
 import os
+import re
+import json
 import time
+import uuid
 import logging
-from datetime import datetime
-from flask import Blueprint, render_template, request, jsonify, current_app
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from flask import Blueprint, render_template, request, jsonify, current_app, Response, stream_with_context
 from flask_login import login_required, current_user
-from werkzeug.utils import secure_filename
 
 from app import db
-from app.models import Conversation, Message
-from app.utils.llm_local import llm_service
-from app.utils.speech import speech_service
+from app.models import User, Conversation, Message, ChatJob
+from app.utils.audio_decode import AudioDecodeError
+from app.utils.blob_store import blob_store
+from app.utils.context_cache import context_cache, message_entry
+from app.utils.conversation_feed import conversation_page
+from app.utils.jobs import job_queue, QueueFullError
+from app.utils.metrics import stage
+from app.utils.services import llm_service, speech_service
+from app.utils.summarizer import summarizer
+from app.utils.tts_pool import tts_pool
 
 chat_bp = Blueprint('chat', __name__)
 
@@ -21,63 +32,89 @@ ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'mp3', 'wav', 'webm', 'pdf'}
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def get_user_info(conversation_id=None):
-    if not current_user.is_authenticated:
+def get_user_info(conversation=None, user=None):
+    """Profile and recent history for the prompt.
+
+    ``conversation`` may be a loaded Conversation (no extra lookup), its
+    id, or a new, not yet flushed Conversation with no history.
+    """
+    user = user or current_user
+    if not user.is_authenticated:
         logger.warning("Unauthenticated user attempted to fetch user info")
         return None
 
-    user_info = {
-        'username': current_user.username,
-        'email': current_user.email,
-        'age': current_user.age,
-        'gender': current_user.gender,
-        'medical_history': current_user.medical_history or "No medical history provided."
-    }
+    profile, rendered_profile = context_cache.profile(user)
+    user_info = dict(profile, profile_message=rendered_profile)
 
-    if conversation_id:
-        conversation = Conversation.query.get(conversation_id)
-        if conversation and conversation.user_id == current_user.id:
-            messages = conversation.messages.order_by(Message.timestamp.asc()).limit(5).all()
-            user_info['previous_conversation'] = [{
-                'sender': m.sender,
-                'text': m.text_content,
-                'image_path': m.image_path,
-                'timestamp': m.timestamp.isoformat()
-            } for m in messages]
+    if isinstance(conversation, int):
+        conversation_id, conversation = conversation, db.session.get(Conversation, conversation)
+        if not conversation:
+            logger.warning(f"Conversation {conversation_id} not found for user {user.username}")
+
+    if conversation and conversation.id:
+        if conversation.user_id == user.id:
+            user_info['summary'] = conversation.summary
+            user_info['previous_conversation'], user_info['history'] = context_cache.history(
+                conversation, lambda: _recent_messages(conversation)
+            )
         else:
             user_info['previous_conversation'] = []
-            logger.warning(f"Conversation {conversation_id} not found or unauthorized for user {current_user.username}")
+            logger.warning(f"Conversation {conversation.id} unauthorized for user {user.username}")
     else:
         user_info['previous_conversation'] = []
 
     return user_info
 
+def _recent_messages(conversation):
+    # The running summary covers everything up to summarized_until;
+    # only the newest messages after it are sent verbatim.
+    query = Message.query.filter(Message.conversation_id == conversation.id)
+    if conversation.summarized_until:
+        query = query.filter(Message.id > conversation.summarized_until)
+    # Ordered like ix_message_conversation_id_timestamp (id breaks ties) so no sort is needed.
+    messages = query.order_by(Message.timestamp.desc(), Message.id.desc()).limit(summarizer.window).all()[::-1]
+    return [message_entry(m) for m in messages]
+
 @chat_bp.route('/')
 @login_required
 def chat_page():
-    conversations = Conversation.query.filter_by(user_id=current_user.id).order_by(Conversation.start_time.asc()).all()
+    # Only the latest conversation is rendered; older ones are fetched from
+    # /chat/conversations as the user scrolls back.
+    feed, next_cursor = conversation_page(current_user.id, limit=1)
 
-    if not conversations:
+    if not feed:
         conversation = Conversation(user_id=current_user.id)
-        db.session.add(conversation)
+        message = Message(
+            conversation=conversation,
+            sender='user',
+            text_content=f"Medical History: {current_user.medical_history or 'No medical history provided.'}"
+        )
+        db.session.add_all([conversation, message])
         try:
             db.session.commit()
             logger.info(f"New conversation created for {current_user.username} (ID: {conversation.id})")
-
-            message = Message(
-                conversation_id=conversation.id,
-                sender='user',
-                text_content=f"Medical History: {current_user.medical_history or 'No medical history provided.'}"
-            )
-            db.session.add(message)
-            db.session.commit()
-            conversations = [conversation]
+            feed = [(conversation, [message])]
         except Exception as e:
             db.session.rollback()
             logger.error(f"Error initializing conversation for {current_user.username}: {e}")
-            return render_template('index.html', username=current_user.username, conversations=[], error="Conversation init failed.")
+            return render_template('index.html', username=current_user.username, feed=[], next_cursor=None, error="Conversation init failed.")
 
-    return render_template('index.html', username=current_user.username, conversations=conversations)
+    return render_template('index.html', username=current_user.username, feed=feed, next_cursor=next_cursor)
+
+@chat_bp.route('/conversations')
+@login_required
+def list_conversations():
+    """Keyset-paginated conversations with their messages, newest first."""
+    per_page = current_app.config['CONVERSATIONS_PER_PAGE']
+    limit = min(max(request.args.get('limit', per_page, type=int), 1), 50)
+    try:
+        feed, next_cursor = conversation_page(current_user.id, limit, before=request.args.get('before'))
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    return jsonify({
+        'conversations': [conversation.to_dict(messages) for conversation, messages in feed],
+        'next_cursor': next_cursor
+    })
 
 @chat_bp.route('/upload', methods=['POST'])
 @login_required
@@ -91,18 +128,17 @@ def upload_file():
         logger.warning(f"{current_user.username} attempted to upload unsupported file: {file.filename}")
         return jsonify({'error': 'File type not allowed'}), 400
 
-    filename = secure_filename(f"{int(time.time())}_{file.filename}")
-    upload_folder = current_app.config['UPLOAD_FOLDER']
-    os.makedirs(upload_folder, exist_ok=True)
-
-    file_path = os.path.join(upload_folder, filename)
-    relative_path = f"/static/uploads/{filename}"
+    extension = file.filename.rsplit('.', 1)[1].lower()
 
     try:
-        file.save(file_path)
+        # Identical uploads share one stored file, named by content hash.
+        with stage('upload_save'):
+            blob = blob_store.store(file, extension)
+        file_path = blob_store.path(blob)
+        relative_path = blob_store.url(blob)
         logger.info(f"{current_user.username} uploaded file: {relative_path}")
 
-        if filename.lower().endswith(('.mp3', '.wav', '.webm')):
+        if extension in ('mp3', 'wav', 'webm'):
             try:
                 transcription = speech_service.speech_to_text(file_path, language="en-US")
                 if not transcription:
@@ -117,96 +153,530 @@ def upload_file():
                 logger.error(f"Audio transcription failed for {file_path}: {e}")
                 return jsonify({'error': 'Failed to transcribe audio'}), 500
 
-        file_type = 'pdf' if filename.endswith('.pdf') else 'image'
+        file_type = 'pdf' if extension == 'pdf' else 'image'
         return jsonify({'file_path': relative_path, 'file_type': file_type})
 
     except Exception as e:
         logger.error(f"Failed to save file from {current_user.username}: {e}")
         return jsonify({'error': 'File save error'}), 500
 
-@chat_bp.route('/message', methods=['POST'])
+# Incremental transcription state of recordings being uploaded, newest last.
+_recordings = OrderedDict()
+_recordings_lock = threading.Lock()
+MAX_TRACKED_RECORDINGS = 64
+MAX_RECORDINGS_PER_USER = 2
+# The browser uploads a chunk every CHUNK_INTERVAL_MS (1s, static/js/script.js); a recording
+# that has sent nothing for five of them is taken as abandoned and its decoder closed.
+RECORDING_IDLE_SECONDS = 5
+
+def _recording_path(recording_id):
+    if not re.fullmatch(r'[0-9a-f]{32}', recording_id):
+        return None
+    filename = f"{current_user.id}_{recording_id}_recording.webm"
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
+
+def _recording_state(recording_id):
+    """State of ``recording_id`` for :meth:`SpeechService.transcribe_stream`, marked in use.
+
+    Pass it to :func:`_release_recording` when the request is done with
+    it. Idle recordings are closed first, and the current user's oldest
+    idle ones beyond ``MAX_RECORDINGS_PER_USER``.
+    """
+    # Another gunicorn worker may hold the state; starting over only costs re-transcription.
+    with _recordings_lock:
+        idle_since = time.monotonic() - RECORDING_IDLE_SECONDS
+        for key, other in list(_recordings.items()):
+            if other['touched'] is not None and other['touched'] < idle_since:
+                _close_recording(_recordings.pop(key))
+        state = _recordings.pop(recording_id, None) or {'user_id': current_user.id, 'offset': 0, 'texts': []}
+        state['touched'] = None
+        own = [key for key, other in _recordings.items() if other['user_id'] == current_user.id and other['touched'] is not None]
+        for key in own[:max(0, len(own) + 1 - MAX_RECORDINGS_PER_USER)]:
+            _close_recording(_recordings.pop(key))
+        _recordings[recording_id] = state
+        while len(_recordings) > MAX_TRACKED_RECORDINGS:
+            _close_recording(_recordings.popitem(last=False)[1])
+    return state
+
+def _release_recording(state):
+    state['touched'] = time.monotonic()
+
+def _close_recording(state):
+    if state and 'decoder' in state:
+        state['decoder'].close()
+
+def _append_chunk(path):
+    data = request.get_data()
+    if not data:
+        return None
+    if os.path.getsize(path) + len(data) > current_app.config['MAX_CONTENT_LENGTH']:
+        return jsonify({'error': 'Recording is too long'}), 413
+    with stage('upload_save'), open(path, 'ab') as f:
+        f.write(data)
+    return None
+
+@chat_bp.route('/recordings', methods=['POST'])
 @login_required
-def send_message():
-    data = request.json or {}
+def start_recording():
+    """Open a recording that the browser uploads in MediaRecorder timeslices."""
+    recording_id = uuid.uuid4().hex
+    path = _recording_path(recording_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, 'wb').close()
+    logger.info(f"{current_user.username} started streaming recording {recording_id}")
+    return jsonify({'recording_id': recording_id}), 201
+
+@chat_bp.route('/recordings/<recording_id>/chunks', methods=['POST'])
+@login_required
+def upload_recording_chunk(recording_id):
+    """Append a chunk and return the transcript of the speech completed so far."""
+    path = _recording_path(recording_id)
+    if not path or not os.path.exists(path):
+        return jsonify({'error': 'Recording not found'}), 404
+    error = _append_chunk(path)
+    if error:
+        return error
+
+    state = _recording_state(recording_id)
+    try:
+        partial = speech_service.transcribe_stream(path, state)
+    except AudioDecodeError as e:
+        logger.warning(f"Recording {recording_id} could not be decoded: {e}")
+        partial = ' '.join(state['texts'])
+    except Exception as e:
+        logger.error(f"Partial transcription failed for recording {recording_id}: {e}")
+        partial = ' '.join(state['texts'])
+    finally:
+        _release_recording(state)
+    return jsonify({'partial': partial})
+
+@chat_bp.route('/recordings/<recording_id>/finish', methods=['POST'])
+@login_required
+def finish_recording(recording_id):
+    """Append the last chunk and transcribe whatever is left."""
+    path = _recording_path(recording_id)
+    if not path or not os.path.exists(path):
+        return jsonify({'error': 'Recording not found'}), 404
+    error = _append_chunk(path)
+    if error:
+        return error
+
+    state = _recording_state(recording_id)
+    try:
+        transcription = speech_service.transcribe_stream(path, state, final=True)
+    except Exception as e:
+        logger.error(f"Audio transcription failed for recording {recording_id}: {e}")
+        transcription = None
+    finally:
+        with _recordings_lock:
+            _close_recording(_recordings.pop(recording_id, None))
+    if not transcription:
+        return jsonify({'error': 'Failed to transcribe audio'}), 500
+
+    try:
+        relative_path = blob_store.url(blob_store.store_file(path, 'webm'))
+    except Exception as e:
+        logger.error(f"Failed to store recording {recording_id}: {e}")
+        return jsonify({'error': 'File save error'}), 500
+    logger.info(f"{current_user.username} finished streaming recording: {relative_path}")
+    return jsonify({
+        'file_path': relative_path,
+        'transcription': transcription,
+        'file_type': 'audio',
+        'detected_language': 'en'
+    })
+
+def _start_turn(data):
+    """Validate a chat turn and build, without writing anything, its user message.
+
+    Returns ``(conversation, user_msg, user_info, error_response)``; either
+    the first three or the last is meaningful. A new conversation and the
+    user message are only added to the session by :func:`_stage_turn`, so
+    no write transaction is held open while the model is generating.
+    """
     text = data.get('text', '')
     image_path = data.get('image_path')
     audio_path = data.get('audio_path')
     conv_id = data.get('conversation_id')
 
+    if not all(isinstance(value, str) for value in (text, image_path, audio_path) if value is not None):
+        return None, None, None, (jsonify({'error': 'text, image_path and audio_path must be strings'}), 400)
+
     if not any([text, image_path, audio_path]):
         logger.warning(f"{current_user.username} submitted empty message")
-        return jsonify({'error': 'Message or media required'}), 400
+        return None, None, None, (jsonify({'error': 'Message or media required'}), 400)
+
+    if image_path and not os.path.exists(_image_abs_path(image_path) or ''):
+        return None, None, None, (jsonify({'error': 'Image file missing'}), 404)
 
-    conversation = None
     if conv_id:
         try:
-            conv_id = int(conv_id)
-            conversation = Conversation.query.get(conv_id)
-            if not conversation or conversation.user_id != current_user.id:
-                return jsonify({'error': 'Invalid conversation'}), 404
+            conversation = db.session.get(Conversation, int(conv_id))
         except (TypeError, ValueError):
-            return jsonify({'error': 'Invalid conversation ID'}), 400
+            return None, None, None, (jsonify({'error': 'Invalid conversation ID'}), 400)
+        if not conversation or conversation.user_id != current_user.id:
+            return None, None, None, (jsonify({'error': 'Invalid conversation'}), 404)
     else:
         conversation = Conversation(user_id=current_user.id)
-        db.session.add(conversation)
-        try:
-            db.session.commit()
-        except Exception as e:
-            db.session.rollback()
-            return jsonify({'error': 'Conversation creation failed'}), 500
 
+    # Timestamped now so it sorts before the reply, which is inserted with it.
     user_msg = Message(
-        conversation_id=conversation.id,
         sender='user',
         text_content=text,
         image_path=image_path,
-        audio_path=audio_path
+        audio_path=audio_path,
+        timestamp=datetime.utcnow()
     )
-    db.session.add(user_msg)
-    conversation.last_updated = datetime.utcnow()
 
-    user_info = get_user_info(conversation.id)
+    with stage('context'):
+        user_info = get_user_info(conversation)
     if not user_info:
-        return jsonify({'error': 'User info retrieval failed'}), 500
+        return None, None, None, (jsonify({'error': 'User info retrieval failed'}), 500)
+
+    return conversation, user_msg, user_info, None
+
+def _stage_turn(conversation, user_msg):
+    """Add a turn's conversation and user message to the session, uncommitted."""
+    user_msg.conversation = conversation
+    conversation.last_updated = datetime.utcnow()
+    db.session.add_all([conversation, user_msg])
+    blob_store.acquire(user_msg.image_path, user_msg.audio_path)
+
+def _image_abs_path(image_path):
+    # None for URLs that do not name a file in UPLOAD_FOLDER.
+    return blob_store.resolve(image_path)
+
+def _save_doctor_reply(conversation, response, user_msg=None):
+    """Persist the doctor's reply, and ``user_msg`` if given, in one transaction.
+
+    A new conversation is inserted along with them and ``last_updated`` is
+    bumped in the same commit. Speech is queued on the TTS pool rather than
+    synthesized inline, so the returned message starts with
+    ``audio_status='pending'`` and no audio. Commit failures are rolled
+    back and re-raised.
+    """
+    previous_version = (conversation.last_updated, conversation.summarized_until)
+    if user_msg is not None:
+        _stage_turn(conversation, user_msg)
+    else:
+        conversation.last_updated = datetime.utcnow()
+    doctor_msg = Message(
+        conversation=conversation,
+        sender='doctor',
+        text_content=response,
+        audio_status='pending',
+        timestamp=datetime.utcnow()
+    )
+    db.session.add(doctor_msg)
+    entries = [message_entry(m) for m in (user_msg, doctor_msg) if m is not None]
+
+    try:
+        with stage('db_commit'):
+            db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    context_cache.record_turn(conversation, previous_version, entries)
+
+    try:
+        tts_pool.submit(doctor_msg.id, response)
+    except Exception as e:
+        logger.warning(f"Could not queue speech generation: {e}")
+        doctor_msg.audio_status = 'failed'
+        db.session.commit()
+    summarizer.schedule(conversation.id)
+    return doctor_msg
+
+def _reply_payload(conversation, doctor_msg):
+    return {
+        'response': doctor_msg.text_content,
+        'audio': doctor_msg.audio_path,
+        'audio_pending': doctor_msg.audio_status == 'pending',
+        'message_id': doctor_msg.id,
+        'conversation_id': conversation.id
+    }
+
+def _sse(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+@chat_bp.route('/message', methods=['POST'])
+@login_required
+def send_message():
+    data = request.json or {}
+    text = data.get('text', '')
+    image_path = data.get('image_path')
+
+    conversation, user_msg, user_info, error = _start_turn(data)
+    if error:
+        return error
 
     try:
         if image_path:
-            abs_path = os.path.join(current_app.root_path, '..', image_path.lstrip('/'))
-            if not os.path.exists(abs_path):
-                return jsonify({'error': 'Image file missing'}), 404
-            response = llm_service.process_image_query(abs_path, text, user_info)
+            response = llm_service.process_image_query(_image_abs_path(image_path), text, user_info)
         else:
             response = llm_service.process_text_only(text, user_info)
     except Exception as e:
         logger.error(f"LLM failed for user {current_user.username}: {e}")
         return jsonify({'error': 'LLM processing failed'}), 500
 
-    audio_filename = f"response_{int(time.time())}.mp3"
-    audio_abs_path = os.path.join(current_app.config['UPLOAD_FOLDER'], audio_filename)
-    audio_rel_path = f"/static/uploads/{audio_filename}"
+    try:
+        doctor_msg = _save_doctor_reply(conversation, response, user_msg)
+    except Exception as e:
+        logger.error(f"Saving the reply failed for user {current_user.username}: {e}")
+        return jsonify({'error': 'Database commit failed'}), 500
+
+    return jsonify(_reply_payload(conversation, doctor_msg))
 
-    doctor_msg = Message(
-        conversation_id=conversation.id,
-        sender='doctor',
-        text_content=response,
-        audio_path=audio_rel_path
+@chat_bp.route('/message/stream', methods=['POST'])
+@login_required
+def stream_message():
+    """Server-sent events variant of :func:`send_message`.
+
+    Emits a ``token`` event per chunk produced by Ollama, then a single
+    ``done`` event carrying the cleaned reply, message id and
+    time-to-first-token once the doctor message has been persisted.
+    """
+    started = time.perf_counter()
+    data = request.json or {}
+    text = data.get('text', '')
+    image_path = data.get('image_path')
+
+    conversation, user_msg, user_info, error = _start_turn(data)
+    if error:
+        return error
+
+    if image_path:
+        chunks = llm_service.stream_image_query(_image_abs_path(image_path), text, user_info)
+    else:
+        chunks = llm_service.stream_text_only(text, user_info)
+
+    def generate():
+        ttft_ms = None
+        parts = []
+        try:
+            for chunk in chunks:
+                if ttft_ms is None:
+                    ttft_ms = round((time.perf_counter() - started) * 1000, 1)
+                    logger.info(f"Time to first token for {current_user.username}: {ttft_ms} ms")
+                parts.append(chunk)
+                yield _sse('token', {'text': chunk})
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"LLM stream failed for user {current_user.username}: {e}")
+            yield _sse('error', {'error': 'LLM processing failed'})
+            return
+
+        response = llm_service.clean_response(''.join(parts))
+        if not response:
+            response = "I'm sorry, I couldn't process your request. Please try again or consult a local doctor."
+
+        try:
+            doctor_msg = _save_doctor_reply(conversation, response, user_msg)
+        except Exception as e:
+            logger.error(f"Saving the streamed reply failed for user {current_user.username}: {e}")
+            yield _sse('error', {'error': 'Database commit failed'})
+            return
+
+        payload = _reply_payload(conversation, doctor_msg)
+        payload['ttft_ms'] = ttft_ms
+        payload['total_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        yield _sse('done', payload)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
     )
-    db.session.add(doctor_msg)
 
+def _run_chat_job(job_id, text, image_abs_path=None):
+    """Worker-side half of :func:`submit_job`; runs in a job queue thread."""
+    job = ChatJob.query.get(job_id)
+    if not job:
+        logger.warning(f"Job {job_id} vanished before it could run")
+        return
+
+    job.status = 'running'
+    db.session.commit()
+
+    conversation = job.conversation
+    user = User.query.get(job.user_id)
+
+    try:
+        user_info = get_user_info(conversation, user=user)
+        if image_abs_path:
+            response = llm_service.process_image_query(image_abs_path, text, user_info)
+        else:
+            response = llm_service.process_text_only(text, user_info)
+        doctor_msg = _save_doctor_reply(conversation, response)
+    except Exception as e:
+        logger.error(f"Job {job_id} failed for user {user.username}: {e}")
+        job.status = 'failed'
+        job.error = 'LLM processing failed'
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        return
+
+    job.status = 'done'
+    job.result = json.dumps(_reply_payload(conversation, doctor_msg))
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+
+@chat_bp.route('/jobs', methods=['POST'])
+@login_required
+def submit_job():
+    """Queue a chat turn and return a job id immediately (HTTP 202).
+
+    The user message is committed up front; the reply is produced by the
+    job queue and can be fetched via :func:`job_status` or
+    :func:`job_events`. Returns 429 when the user already has too many jobs
+    in flight and 503 when the queue is full.
+    """
+    _purge_finished_jobs()
+
+    pending = ChatJob.query.filter(
+        ChatJob.user_id == current_user.id,
+        ChatJob.status.in_(['queued', 'running'])
+    ).count()
+    if pending >= current_app.config['JOB_MAX_PENDING_PER_USER']:
+        return jsonify({'error': 'Too many pending messages'}), 429
+
+    data = request.json or {}
+    text = data.get('text', '')
+    image_path = data.get('image_path')
+    conversation, user_msg, user_info, error = _start_turn(data)
+    if error:
+        return error
+
+    # The conversation, user message and job are written in one commit.
+    previous_version = (conversation.last_updated, conversation.summarized_until)
+    _stage_turn(conversation, user_msg)
+    job = ChatJob(id=uuid.uuid4().hex, user_id=current_user.id, conversation=conversation)
+    db.session.add(job)
     try:
         db.session.commit()
     except Exception as e:
         db.session.rollback()
+        logger.error(f"Queueing a chat job failed for user {current_user.username}: {e}")
         return jsonify({'error': 'Database commit failed'}), 500
+    context_cache.record_turn(conversation, previous_version, [message_entry(user_msg)])
 
     try:
-        speech_service.text_to_speech(response, audio_abs_path)
-    except Exception as e:
-        logger.warning(f"Speech generation failed: {e}")
-        audio_rel_path = None
+        job_queue.submit(_run_chat_job, job.id, text, _image_abs_path(image_path) if image_path else None)
+    except QueueFullError as e:
+        logger.warning(f"Rejected job for {current_user.username}: {e}")
+        job.status = 'failed'
+        job.error = 'Server busy'
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        response = jsonify({'error': 'Server busy, please retry shortly', 'job_id': job.id})
+        response.headers['Retry-After'] = '5'
+        return response, 503
 
     return jsonify({
-        'response': response,
-        'audio': audio_rel_path,
-        'conversation_id': conversation.id
+        'job_id': job.id,
+        'status': job.status,
+        'conversation_id': conversation.id,
+        'queue_depth': job_queue.depth
+    }), 202
+
+def _get_own_job(job_id):
+    job = ChatJob.query.get(job_id)
+    if not job or job.user_id != current_user.id:
+        return None
+    return job
+
+@chat_bp.route('/jobs/<job_id>', methods=['GET'])
+@login_required
+def job_status(job_id):
+    job = _get_own_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
+@chat_bp.route('/jobs/<job_id>/events', methods=['GET'])
+@login_required
+def job_events(job_id):
+    """Server-sent events stream that emits a ``status`` event on every
+    state change and closes after the job finishes."""
+    job = _get_own_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+
+    def generate():
+        last_status = None
+        deadline = time.monotonic() + _job_timeout()
+        while True:
+            db.session.expire_all()
+            current = ChatJob.query.get(job_id)
+            if current is None:
+                yield _sse('error', {'error': 'Job not found'})
+                return
+            if current.status != last_status:
+                last_status = current.status
+                yield _sse('status', current.to_dict())
+            if current.status in ('done', 'failed'):
+                return
+            if time.monotonic() > deadline:
+                yield _sse('error', {'error': 'Timed out waiting for the job'})
+                return
+            time.sleep(0.5)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@chat_bp.route('/messages/<int:message_id>/audio', methods=['GET'])
+@login_required
+def message_audio(message_id):
+    """Report whether the synthesized audio for a doctor reply is ready.
+
+    Audio the TTS cache has evicted since is queued for synthesis again
+    and reported as pending.
+    """
+    message = Message.query.get(message_id)
+    if not message or message.conversation.user_id != current_user.id:
+        return jsonify({'error': 'Message not found'}), 404
+    if message.audio_status == 'ready' and tts_pool.is_missing(message.audio_path):
+        # Evicted from the TTS cache; synthesize it again under the same name.
+        message.audio_status = 'pending'
+        db.session.commit()
+        try:
+            tts_pool.submit(message.id, message.text_content)
+        except Exception as e:
+            logger.warning(f"Could not queue speech generation: {e}")
+            message.audio_status = 'failed'
+            db.session.commit()
+    return jsonify({
+        'message_id': message.id,
+        'status': message.audio_status or ('ready' if message.audio_path else 'none'),
+        'audio': message.audio_path
     })
+
+def _job_timeout():
+    """Seconds a job may stay queued or running before it is given up on.
+
+    Defaults to the longest an LLM call can take with all its retries, for
+    the job itself and for each queue slot ahead of it.
+    """
+    config = current_app.config
+    if config.get('JOB_TIMEOUT'):
+        return config['JOB_TIMEOUT']
+    slots = 1 + config['JOB_QUEUE_MAX_DEPTH'] // max(1, config['JOB_WORKERS'])
+    return config['OLLAMA_READ_TIMEOUT'] * config['OLLAMA_RETRY_ATTEMPTS'] * slots
+
+def _purge_finished_jobs():
+    """Delete expired results and fail jobs stranded by a worker restart.
+
+    Queue threads die with their process, so a job they held would stay
+    ``queued`` or ``running`` and count against its user's limit forever.
+    """
+    now = datetime.utcnow()
+    ChatJob.query.filter(
+        ChatJob.status.in_(['queued', 'running']),
+        ChatJob.created_at < now - timedelta(seconds=_job_timeout())
+    ).update({'status': 'failed', 'error': 'Timed out', 'finished_at': now}, synchronize_session=False)
+    cutoff = now - timedelta(seconds=current_app.config['JOB_RESULT_TTL'])
+    ChatJob.query.filter(ChatJob.finished_at < cutoff).delete(synchronize_session=False)
+    db.session.commit()
@@ -1,8 +1,13 @@
-import os
-from flask import Blueprint, render_template, jsonify, redirect, url_for, current_app
+from flask import Blueprint, Response, render_template, jsonify, redirect, url_for, current_app
 from flask_login import login_required, current_user
 from app import db
 from app.models import Conversation, Message
+from app.utils.blob_store import blob_store
+from app.utils.context_cache import context_cache
+from app.utils.conversation_feed import conversation_page
+from app.utils.media_gc import media_collector
+from app.utils.metrics import metrics
+from app.utils.model_manager import model_manager
 
 main_bp = Blueprint('main', __name__)
 
@@ -15,13 +20,31 @@ def index():
 @main_bp.route('/history')
 @login_required
 def history():
-    conversations = (
-        Conversation.query
-        .filter_by(user_id=current_user.id)
-        .order_by(Conversation.start_time.asc())
-        .all()
-    )
-    return render_template('history.html', conversations=conversations)
+    feed, next_cursor = conversation_page(current_user.id, current_app.config['CONVERSATIONS_PER_PAGE'])
+    return render_template('history.html', feed=feed, next_cursor=next_cursor)
+
+@main_bp.route('/status/llm')
+@login_required
+def llm_status():
+    """Per-host queue depth, latency and health of the Ollama backends, plus cache hit rates."""
+    from app.utils.services import llm_service
+    router = llm_service.connection
+    stats = router.stats() if hasattr(router, 'stats') else {'hosts': [{'host': llm_service.host}]}
+    response_cache = llm_service.response_cache.stats() if llm_service.response_cache else None
+    return jsonify(dict(stats, prefill=llm_service.prefill_stats(), context_cache=context_cache.stats(),
+                        response_cache=response_cache, image_cache=llm_service.image_preprocessor.stats(),
+                        models=model_manager.stats()))
+
+@main_bp.route('/ready')
+def ready():
+    """Load balancer readiness check: 200 once the Ollama models are loaded, 503 until then."""
+    is_ready = model_manager.ready()
+    return jsonify({'ready': is_ready, 'models': model_manager.stats()}), 200 if is_ready else 503
+
+@main_bp.route('/metrics')
+def metrics_endpoint():
+    """Prometheus scrape target for this process's request, stage and Ollama metrics."""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 @main_bp.route('/delete_conversation/<int:conversation_id>', methods=['DELETE'])
 @login_required
@@ -32,20 +55,16 @@ def delete_conversation(conversation_id):
         return jsonify({'error': 'Unauthorized'}), 403
 
     try:
-        upload_folder = current_app.config['UPLOAD_FOLDER']
-
-        # Delete associated media files (image and audio)
+        # Media files are removed by the collector once nothing references
+        # them; here only the blob references are dropped.
         for message in conversation.messages:
-            for file_attr in ['image_path', 'audio_path']:
-                file_path = getattr(message, file_attr)
-                if file_path:
-                    absolute_path = os.path.join(upload_folder, os.path.basename(file_path))
-                    if os.path.exists(absolute_path):
-                        os.remove(absolute_path)
+            blob_store.release(message.image_path, message.audio_path)
 
         # Delete the conversation and its messages
         db.session.delete(conversation)
         db.session.commit()
+        context_cache.invalidate_conversation(conversation_id)
+        media_collector.schedule()
         return jsonify({'message': 'Conversation deleted successfully'})
 
     except Exception as e:
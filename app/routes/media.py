@@ -0,0 +1,57 @@
+import os
+import re
+import mimetypes
+from flask import Blueprint, abort, current_app, make_response, request, send_from_directory
+from werkzeug.security import safe_join
+
+media_bp = Blueprint('media', __name__)
+
+# Blobs are named after the SHA-256 of their content and TTS files after a
+# hash of what was synthesized, so the name is a ready-made ETag and the
+# file behind a name never changes.
+_HASHED_NAME = re.compile(r'(?:^|/)([0-9a-f]{64})\.[a-z0-9]{1,10}$')
+
+
+def _cache_headers(response, etag):
+    response.cache_control.public = False
+    response.cache_control.private = True  # Patients' media; no shared caches
+    response.cache_control.max_age = current_app.config['MEDIA_MAX_AGE']
+    if etag:
+        response.cache_control.immutable = True
+    return response
+
+
+@media_bp.route('/static/uploads/<path:filename>')
+def serve_upload(filename):
+    """Serve an upload or synthesized reply with range, ETag and cache support.
+
+    Takes precedence over Flask's static route for ``/static/uploads``.
+    With ``MEDIA_ACCEL_REDIRECT`` set, nginx sends the file instead, from
+    the internal location given there.
+    """
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    path = safe_join(upload_folder, filename)
+    # Dot-files and dot-directories, such as the blob store's .tmp spool, are never served.
+    if path is None or not os.path.isfile(path) or any(part.startswith('.') for part in filename.split('/')):
+        abort(404)
+    match = _HASHED_NAME.search(filename)
+    etag = match.group(1) if match else None
+
+    accel_prefix = current_app.config.get('MEDIA_ACCEL_REDIRECT')
+    if accel_prefix:
+        response = make_response('')
+        response.headers['X-Accel-Redirect'] = f"{accel_prefix.rstrip('/')}/{filename}"
+        response.mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        stat = os.stat(path)
+        response.last_modified = stat.st_mtime
+        response.set_etag(etag or f"{stat.st_mtime_ns:x}-{stat.st_size:x}")
+        response.make_conditional(request)
+        return _cache_headers(response, etag)
+
+    response = send_from_directory(
+        upload_folder, filename,
+        conditional=True,  # Range requests, If-None-Match and If-Modified-Since
+        etag=etag or True,
+        max_age=current_app.config['MEDIA_MAX_AGE']
+    )
+    return _cache_headers(response, etag)
@@ -0,0 +1,156 @@
+import os
+import wave
+import logging
+import threading
+import subprocess
+
+import speech_recognition as sr
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+FFMPEG = os.environ.get('FFMPEG_BINARY', 'ffmpeg')
+
+
+class AudioDecodeError(Exception):
+    """Raised when a recording cannot be decoded to PCM."""
+
+
+def decode_pcm(source, sample_rate=SAMPLE_RATE, timeout=60):
+    """Decode a file path or encoded bytes to mono 16-bit PCM at ``sample_rate``.
+
+    ffmpeg reads the input and writes raw samples to a pipe, so nothing is
+    written to disk.
+    """
+    from_bytes = isinstance(source, (bytes, bytearray))
+    cmd = [
+        FFMPEG, '-hide_banner', '-loglevel', 'error',
+        '-i', 'pipe:0' if from_bytes else source,
+        '-vn', '-ac', '1', '-ar', str(sample_rate), '-f', 's16le', '-acodec', 'pcm_s16le', 'pipe:1'
+    ]
+    try:
+        proc = subprocess.run(
+            cmd,
+            input=source if from_bytes else None,
+            stdin=None if from_bytes else subprocess.DEVNULL,
+            capture_output=True,
+            timeout=timeout
+        )
+    except FileNotFoundError:
+        raise AudioDecodeError(f"{FFMPEG} is not installed")
+    except subprocess.TimeoutExpired:
+        raise AudioDecodeError(f"Decoding took longer than {timeout}s")
+    if proc.returncode != 0:
+        message = proc.stderr.decode('utf-8', 'replace').strip().splitlines()
+        raise AudioDecodeError(message[-1] if message else f"ffmpeg exited with {proc.returncode}")
+    return proc.stdout
+
+
+class StreamDecoder:
+    """Decodes a recording that is still being uploaded, one appended chunk at a time.
+
+    A single ffmpeg process reads the recording from a pipe for its whole
+    upload; :meth:`feed` hands it only the bytes appended to the file
+    since the last call and :meth:`take` returns the PCM decoded since
+    then, so each byte is decoded once however many chunks arrive.
+    """
+
+    def __init__(self, sample_rate=SAMPLE_RATE):
+        self.sample_rate = sample_rate
+        self.fed = 0  # Bytes of the file handed to ffmpeg
+        self._pcm = bytearray()
+        self._lock = threading.Lock()
+        self._proc = None
+        self._reader = None
+
+    def _start(self):
+        cmd = [
+            FFMPEG, '-hide_banner', '-loglevel', 'error', '-i', 'pipe:0',
+            '-vn', '-ac', '1', '-ar', str(self.sample_rate), '-f', 's16le', '-acodec', 'pcm_s16le', 'pipe:1'
+        ]
+        try:
+            self._proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        except FileNotFoundError:
+            raise AudioDecodeError(f"{FFMPEG} is not installed")
+        self._reader = threading.Thread(target=self._read, name='audio-decode', daemon=True)
+        self._reader.start()
+
+    def _read(self):
+        while True:
+            chunk = self._proc.stdout.read1(65536)
+            if not chunk:
+                return
+            with self._lock:
+                self._pcm.extend(chunk)
+
+    def _error(self):
+        message = self._proc.stderr.read().decode('utf-8', 'replace').strip().splitlines()
+        return AudioDecodeError(message[-1] if message else f"ffmpeg exited with {self._proc.returncode}")
+
+    def feed(self, path):
+        """Pass whatever was appended to the file at ``path`` since the last call to ffmpeg."""
+        with open(path, 'rb') as f:
+            f.seek(self.fed)
+            data = f.read()
+        if not data:
+            return
+        if self._proc is None:
+            self._start()
+        try:
+            self._proc.stdin.write(data)
+            self._proc.stdin.flush()
+        except (BrokenPipeError, ValueError):
+            self._proc.wait()
+            raise self._error()
+        self.fed += len(data)
+
+    def take(self):
+        """Return the PCM decoded since the last call."""
+        with self._lock:
+            pcm = bytes(self._pcm)
+            self._pcm.clear()
+        return pcm
+
+    def finish(self, timeout=60):
+        """Decode the rest of the recording and return the PCM not yet taken."""
+        if self._proc is None:
+            return b''
+        try:
+            self._proc.stdin.close()
+            self._proc.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.close()
+            raise AudioDecodeError(f"Decoding took longer than {timeout}s")
+        self._reader.join()
+        pcm = self.take()
+        if self._proc.returncode != 0 and not pcm:
+            raise self._error()
+        return pcm
+
+    def close(self):
+        if self._proc is not None and self._proc.poll() is None:
+            self._proc.kill()
+            self._proc.wait()
+
+
+def _read_pcm_wav(path):
+    """Return AudioData for a mono 16-bit WAV without spawning ffmpeg, else None."""
+    try:
+        with wave.open(path, 'rb') as w:
+            if w.getnchannels() != 1 or w.getsampwidth() != 2 or w.getcomptype() != 'NONE':
+                return None
+            return sr.AudioData(w.readframes(w.getnframes()), w.getframerate(), 2)
+    except (wave.Error, EOFError):
+        return None
+
+
+def decode_audio(source, sample_rate=SAMPLE_RATE):
+    """Decode a recording (path or bytes) into ``sr.AudioData`` ready for an STT backend."""
+    if isinstance(source, str) and source.lower().endswith('.wav'):
+        audio = _read_pcm_wav(source)
+        if audio is not None:
+            return audio
+    pcm = decode_pcm(source, sample_rate)
+    if not pcm:
+        raise AudioDecodeError("Recording contains no audio")
+    return sr.AudioData(pcm, sample_rate, 2)
@@ -0,0 +1,36 @@
+import threading
+
+
+class LazyThreads:
+    """Daemon threads running ``target`` that are only started when first needed.
+
+    Threads do not survive ``fork``, and gunicorn builds the app in its
+    master before forking the workers, so background threads have to be
+    started from the worker, by its first request or first submitted job,
+    rather than when the app is built. :meth:`start` is safe to call on
+    every request; only the first call starts anything, after running
+    ``setup()`` if one is given.
+    """
+
+    def __init__(self, target, name, setup=None):
+        self.target = target
+        self.name = name
+        self.setup = setup
+        self.threads = []
+        self._lock = threading.Lock()
+
+    def start(self, count=1):
+        """Start ``count`` threads unless they are already running."""
+        if self.threads:
+            return
+        with self._lock:
+            if self.threads:
+                return
+            if self.setup:
+                self.setup()
+            for i in range(count):
+                thread = threading.Thread(
+                    target=self.target, name=self.name if count == 1 else f"{self.name}-{i}", daemon=True
+                )
+                thread.start()
+                self.threads.append(thread)
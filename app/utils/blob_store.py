@@ -0,0 +1,203 @@
+"""Content-addressed, reference-counted storage for uploads.
+
+Each distinct upload is stored once, named after the SHA-256 of its
+content, in two levels of shard directories so no single directory grows
+large::
+
+    UPLOAD_FOLDER/blobs/3f/a2/3fa2...e9.jpg   ->   /static/uploads/blobs/3f/a2/3fa2...e9.jpg
+
+:class:`UploadRequest` makes Werkzeug stream each file part of a
+multipart body into a temp file next to the blobs, hashing it as the
+chunks arrive. Storing the upload is then only a hard link into place,
+or nothing at all when the content is already stored. ``Blob.ref_count``
+counts the messages that point at a blob. Blobs nobody references are
+left for :mod:`app.utils.media_gc` to remove once their file has not
+been uploaded again for a grace period, so a re-upload racing a delete
+never loses its file.
+"""
+import os
+import re
+import shutil
+import hashlib
+import logging
+import tempfile
+
+from flask import Request, current_app
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+
+logger = logging.getLogger(__name__)
+
+PUBLIC_PREFIX = '/static/uploads/blobs/'
+_BLOB_NAME = re.compile(r'^([0-9a-f]{2})/([0-9a-f]{2})/(\1\2[0-9a-f]{60})\.([a-z0-9]{1,10})$')
+
+
+def digest_of(path_or_url):
+    """Return the content hash encoded in a blob path or URL, or None for other files."""
+    match = re.search(r'([0-9a-f]{2})[\\/]([0-9a-f]{2})[\\/](\1\2[0-9a-f]{60})\.[a-z0-9]{1,10}$', path_or_url or '')
+    return match.group(3) if match else None
+
+
+class HashingSpool:
+    """Writable temp file that hashes everything written to it."""
+
+    def __init__(self, directory):
+        self.file = tempfile.NamedTemporaryFile(dir=directory, prefix='.upload_')
+        self.name = self.file.name
+        self.size = 0
+        self._hash = hashlib.sha256()
+
+    def write(self, data):
+        self._hash.update(data)
+        self.size += len(data)
+        return self.file.write(data)
+
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+    def __getattr__(self, name):
+        # read, readline, seek, tell, flush and close go straight to the file.
+        return getattr(self.file, name)
+
+
+class UploadRequest(Request):
+    """Request whose uploaded files are spooled through :class:`HashingSpool`."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        store = current_app.extensions.get('blob_store')
+        if store is None or not filename:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        return store.spool()
+
+
+class BlobStore:
+    chunk_size = 64 * 1024
+
+    def __init__(self, app=None):
+        self.root = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.root = os.path.join(app.config['UPLOAD_FOLDER'], 'blobs')
+        app.request_class = UploadRequest
+        app.extensions['blob_store'] = self
+
+    @property
+    def tmp_dir(self):
+        # Inside the store so finished uploads can be hard-linked into place.
+        path = os.path.join(self.root, '.tmp')
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def spool(self):
+        return HashingSpool(self.tmp_dir)
+
+    @staticmethod
+    def relative(digest, extension):
+        return f"{digest[:2]}/{digest[2:4]}/{digest}.{extension}"
+
+    def path(self, blob):
+        return os.path.join(self.root, *self.relative(blob.digest, blob.extension).split('/'))
+
+    def url(self, blob):
+        return PUBLIC_PREFIX + self.relative(blob.digest, blob.extension)
+
+    def resolve(self, url):
+        """Filesystem path behind a ``/static/uploads/...`` URL.
+
+        Only well-formed blob names and bare file names inside
+        ``UPLOAD_FOLDER`` (uploads from before the blob store) resolve, so
+        a client-supplied URL can not point anywhere else.
+        """
+        if url.startswith(PUBLIC_PREFIX):
+            match = _BLOB_NAME.match(url[len(PUBLIC_PREFIX):])
+            if not match:
+                return None
+            return os.path.join(self.root, match.group(1), match.group(2), f"{match.group(3)}.{match.group(4)}")
+        return os.path.join(os.path.dirname(self.root), os.path.basename(url))
+
+    def store(self, file_storage, extension):
+        """Store an uploaded ``FileStorage`` and return its Blob, committed.
+
+        Uploads that did not arrive through :class:`UploadRequest` are
+        copied through a spool in chunks.
+        """
+        spool = file_storage.stream
+        if not isinstance(spool, HashingSpool):
+            spool = self.spool()
+            shutil.copyfileobj(file_storage.stream, spool, self.chunk_size)
+        spool.flush()
+        return self._add(spool.name, spool.hexdigest(), spool.size, extension, link=True)
+
+    def store_file(self, path, extension):
+        """Move the file at ``path`` into the store and return its Blob, committed."""
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(self.chunk_size), b''):
+                digest.update(chunk)
+        return self._add(path, digest.hexdigest(), os.path.getsize(path), extension, link=False)
+
+    def _add(self, source, digest, size, extension, link):
+        from app import db
+        from app.models import Blob
+
+        blob = db.session.get(Blob, digest)
+        created = blob is None
+        if created:
+            blob = Blob(digest=digest, extension=extension.lower(), size=size, ref_count=0)
+        target = self.path(blob)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if not link:
+            os.replace(source, target)  # An existing copy has the same content
+        else:
+            self._link(source, target)
+
+        if created:
+            db.session.add(blob)
+            try:
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()
+                blob = db.session.get(Blob, digest)
+            logger.info(f"Stored blob {digest[:12]} ({size} bytes)")
+        else:
+            logger.info(f"Upload matches stored blob {digest[:12]}, {size} bytes not written again")
+        return blob
+
+    @staticmethod
+    def _link(source, target):
+        for _ in range(2):
+            try:
+                os.link(source, target)
+                return
+            except FileExistsError:
+                try:
+                    # Already stored; fresh again, so the collector gives it a new grace period.
+                    os.utime(target)
+                    return
+                except FileNotFoundError:
+                    continue  # Taken by the collector in between; link this copy instead
+            except OSError:
+                shutil.copyfile(source, target)  # No hard links on this filesystem
+                return
+
+    def _adjust(self, urls, delta):
+        from app import db
+        from app.models import Blob
+
+        for digest in filter(None, (digest_of(url) for url in urls if url and url.startswith(PUBLIC_PREFIX))):
+            db.session.execute(
+                update(Blob).where(Blob.digest == digest).values(ref_count=Blob.ref_count + delta)
+            )
+
+    def acquire(self, *urls):
+        """Count a new reference to each blob URL in ``urls``, in the current transaction."""
+        self._adjust(urls, 1)
+
+    def release(self, *urls):
+        """Drop a reference to each blob URL in ``urls``, in the current transaction."""
+        self._adjust(urls, -1)
+
+
+blob_store = BlobStore()
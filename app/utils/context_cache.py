@@ -0,0 +1,161 @@
+"""Per-user prompt context reused across chat turns.
+
+Building a turn's prompt needs the patient's profile and the recent,
+not yet summarized messages of the conversation. Both change far less
+often than they are read, so they are kept here along with their
+rendered prompt messages:
+
+* Profiles are keyed by user and checked against the profile fields on
+  every read, so an edit made through any process is noticed.
+  ``update_profile`` also drops the entry explicitly.
+* Conversation histories are keyed by conversation and versioned by
+  ``(last_updated, summarized_until)``. Turns written by this process are
+  appended in place (:meth:`ContextCache.record_turn`). Anything else that
+  touches the conversation, such as a summary fold or a turn written by
+  another process, changes the version and the history is reloaded.
+"""
+import logging
+import threading
+from collections import OrderedDict
+from datetime import date
+
+from app.utils import prompts
+
+logger = logging.getLogger(__name__)
+
+
+def message_entry(message):
+    return {
+        'sender': message.sender,
+        'text': message.text_content,
+        'image_path': message.image_path,
+        'timestamp': message.timestamp.isoformat()
+    }
+
+
+class ContextCache:
+    """LRU of user profiles and conversation histories, ``max_entries`` of each."""
+
+    def __init__(self, app=None, max_entries=1024):
+        self.max_entries = max_entries
+        self.window = 10
+        self._profiles = OrderedDict()
+        self._histories = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        from app.utils.summarizer import summarizer
+        self.max_entries = app.config.get('CONTEXT_CACHE_ENTRIES', self.max_entries)
+        self.window = summarizer.window
+        app.extensions['context_cache'] = self
+
+    @staticmethod
+    def _fingerprint(user):
+        # Today's date is part of it so the cached age rolls over on birthdays.
+        return (user.username, user.email, user.date_of_birth, user.gender, user.medical_history, date.today())
+
+    @staticmethod
+    def _version(conversation):
+        return (conversation.last_updated, conversation.summarized_until)
+
+    def _put(self, entries, key, value):
+        entries[key] = value
+        entries.move_to_end(key)
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+
+    def profile(self, user):
+        """Return ``(profile, profile_message)`` for ``user``."""
+        fingerprint = self._fingerprint(user)
+        with self._lock:
+            entry = self._profiles.get(user.id)
+            if entry and entry[0] == fingerprint:
+                self._profiles.move_to_end(user.id)
+                return entry[1], entry[2]
+        profile = {
+            'username': user.username,
+            'email': user.email,
+            'age': user.age,
+            'gender': user.gender,
+            'medical_history': user.medical_history or "No medical history provided."
+        }
+        rendered = prompts.profile_message(profile)
+        if self.max_entries:
+            with self._lock:
+                self._put(self._profiles, user.id, (fingerprint, profile, rendered))
+        return profile, rendered
+
+    def history(self, conversation, load):
+        """Return ``(previous_conversation, history_messages)`` for ``conversation``.
+
+        ``load()`` is called on a miss and must return the recent messages,
+        oldest first, as :func:`message_entry` dicts.
+        """
+        version = self._version(conversation)
+        with self._lock:
+            entry = self._histories.get(conversation.id)
+            if entry and entry['version'] == version:
+                self._histories.move_to_end(conversation.id)
+                self.hits += 1
+                return entry['previous'], entry['messages']
+            self.misses += 1
+        previous = load()
+        messages = prompts.history_messages(previous)
+        if self.max_entries:
+            with self._lock:
+                self._put(self._histories, conversation.id, {
+                    'user_id': conversation.user_id, 'version': version,
+                    'previous': previous, 'messages': messages
+                })
+        return previous, messages
+
+    def record_turn(self, conversation, previous_version, entries):
+        """Append messages this process just committed to a cached history.
+
+        ``previous_version`` is the conversation's version before the
+        commit. If the cached history is not at that version it is dropped
+        rather than patched, and the next read reloads it. So is a history
+        whose ``summarized_until`` moved in between: a summary fold that
+        committed while the reply was generated would otherwise leave the
+        folded messages in it.
+        """
+        version = self._version(conversation)
+        with self._lock:
+            entry = self._histories.get(conversation.id)
+            if not entry:
+                return
+            if entry['version'] != previous_version or version[1] != previous_version[1]:
+                del self._histories[conversation.id]
+                return
+            previous = (entry['previous'] + entries)[-self.window:]
+            entry.update(
+                version=version,
+                previous=previous,
+                messages=prompts.history_messages(previous)
+            )
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            self._profiles.pop(user_id, None)
+            for conversation_id in [k for k, v in self._histories.items() if v['user_id'] == user_id]:
+                del self._histories[conversation_id]
+
+    def invalidate_conversation(self, conversation_id):
+        with self._lock:
+            self._histories.pop(conversation_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'profiles': len(self._profiles),
+                'conversations': len(self._histories),
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+context_cache = ContextCache()
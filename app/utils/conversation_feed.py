@@ -0,0 +1,59 @@
+"""Keyset-paginated conversation feed for the chat and history pages.
+
+A page is two queries however many conversations it holds: one for the
+conversations, newest first, and one for all of their messages.
+"""
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+from app.models import Conversation, Message
+
+
+def encode_cursor(conversation):
+    return f"{conversation.start_time.isoformat()}_{conversation.id}"
+
+
+def decode_cursor(cursor):
+    """Return ``(start_time, id)`` for a cursor, raising ValueError if it is malformed."""
+    start_time, _, conversation_id = cursor.rpartition('_')
+    return datetime.fromisoformat(start_time), int(conversation_id)
+
+
+def messages_by_conversation(conversation_ids):
+    messages = {conversation_id: [] for conversation_id in conversation_ids}
+    if not conversation_ids:
+        return messages
+    rows = (
+        Message.query
+        .filter(Message.conversation_id.in_(conversation_ids))
+        .order_by(Message.conversation_id, Message.timestamp.asc(), Message.id.asc())
+        .all()
+    )
+    for message in rows:
+        messages[message.conversation_id].append(message)
+    return messages
+
+
+def conversation_page(user_id, limit, before=None):
+    """Return ``([(conversation, messages), ...], next_cursor)``, newest conversation first.
+
+    ``before`` is a cursor from a previous page; ``next_cursor`` is None
+    once the oldest conversation has been returned.
+    """
+    query = Conversation.query.filter(Conversation.user_id == user_id)
+    if before:
+        start_time, conversation_id = decode_cursor(before)
+        query = query.filter(or_(
+            Conversation.start_time < start_time,
+            and_(Conversation.start_time == start_time, Conversation.id < conversation_id)
+        ))
+    conversations = (
+        query.order_by(Conversation.start_time.desc(), Conversation.id.desc())
+        .limit(limit + 1)
+        .all()
+    )
+    next_cursor = encode_cursor(conversations[limit - 1]) if len(conversations) > limit else None
+    conversations = conversations[:limit]
+    messages = messages_by_conversation([c.id for c in conversations])
+    return [(c, messages[c.id]) for c in conversations], next_cursor
@@ -0,0 +1,49 @@
+import logging
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+
+def sqlite_pragma_listener(pragmas):
+    """Return a ``connect`` listener applying ``pragmas`` to each new SQLite connection."""
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+    return set_pragmas
+
+
+def init_engine_options(app):
+    """Set ``SQLALCHEMY_ENGINE_OPTIONS`` for the app's database unless the config sets them.
+
+    Derived from the final ``app.config``, so a config subclass that only
+    switches ``SQLALCHEMY_DATABASE_URI`` (to ``sqlite://`` in tests, say)
+    gets the pool that fits it. Must run before ``db.init_app``.
+    """
+    from config import engine_options
+
+    config = app.config
+    config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(
+        config['SQLALCHEMY_DATABASE_URI'], config['DB_POOL_SIZE'], config['DB_MAX_OVERFLOW'],
+        config['DB_POOL_TIMEOUT'], config['DB_POOL_RECYCLE'], config['SQLITE_BUSY_TIMEOUT']
+    ))
+
+
+def configure_engine(app, db):
+    """Attach per-connection setup to the app's engine.
+
+    SQLite file databases get ``SQLITE_PRAGMAS`` (WAL, busy timeout, ...)
+    on every pooled connection; other databases are left as configured by
+    ``SQLALCHEMY_ENGINE_OPTIONS``.
+    """
+    with app.app_context():
+        engine = db.engine
+        if engine.dialect.name != 'sqlite' or engine.url.database in (None, '', ':memory:'):
+            return
+        pragmas = app.config.get('SQLITE_PRAGMAS') or {}
+        event.listen(engine, 'connect', sqlite_pragma_listener(pragmas))
+        logger.info(f"SQLite pragmas for {engine.url.database}: {pragmas}")
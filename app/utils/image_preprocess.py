@@ -0,0 +1,132 @@
+import io
+import os
+import base64
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+from PIL import Image, ImageOps
+
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidImageError(Exception):
+    """Raised when an upload cannot be decoded as an image."""
+
+
+class ImagePreprocessor:
+    """Turns an uploaded image into the compact base64 JPEG sent to LLaVA.
+
+    Each file is decoded once (JPEGs are DCT-downscaled while decoding),
+    rotated according to its EXIF orientation, flattened to RGB, shrunk
+    to fit ``max_side`` and re-encoded. Results are kept in an LRU keyed
+    by content hash, with a path/mtime/size index in front so repeated
+    references to the same upload don't even re-read the file.
+    """
+
+    def __init__(self, max_side=672, quality=85, max_entries=64):
+        self.max_side = max_side
+        self.quality = quality
+        self.max_entries = max_entries
+        self._by_stat = OrderedDict()
+        self._by_digest = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.lookups = metrics.counter(
+            'image_cache_lookups_total', 'Preprocessed image cache lookups, by result (hit or miss).', ('result',)
+        )
+
+    def encode(self, path, digest=None):
+        """Return the base64 JPEG for the image at ``path``.
+
+        ``digest`` is the SHA-256 of the file when the caller already
+        knows it (blob store files are named after it), saving a read.
+        """
+        if digest:
+            with self._lock:
+                encoded = self._lookup(digest)
+                if encoded:
+                    self._hit()
+                    return encoded
+        stat = os.stat(path)
+        stat_key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            digest = self._by_stat.get(stat_key)
+            encoded = self._lookup(digest) if digest else None
+            if encoded:
+                self._by_stat.move_to_end(stat_key)
+                self._hit()
+                return encoded
+
+        with open(path, 'rb') as f:
+            data = f.read()
+        digest = digest or hashlib.sha256(data).hexdigest()
+        with self._lock:
+            encoded = self._lookup(digest)
+            if encoded:
+                self._hit()
+                self._remember(self._by_stat, stat_key, digest)
+                return encoded
+            self.misses += 1
+        self.lookups.inc(result='miss')
+
+        encoded = base64.b64encode(self.preprocess(data)).decode('utf-8')
+        logger.info(f"Preprocessed {path}: {len(data)} bytes -> {len(encoded)} base64 chars")
+        with self._lock:
+            self._remember(self._by_digest, digest, encoded)
+            self._remember(self._by_stat, stat_key, digest)
+        return encoded
+
+    def preprocess(self, data):
+        """Decode ``data`` once and return JPEG bytes no larger than ``max_side``."""
+        try:
+            img = Image.open(io.BytesIO(data))
+            # Lets the JPEG decoder skip detail the thumbnail would throw away.
+            img.draft('RGB', (self.max_side, self.max_side))
+            img = ImageOps.exif_transpose(img)
+            img.thumbnail((self.max_side, self.max_side), Image.LANCZOS, reducing_gap=3.0)
+        except Exception as e:
+            raise InvalidImageError(str(e)) from e
+
+        if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
+            img = img.convert('RGBA')
+            background = Image.new('RGB', img.size, (255, 255, 255))
+            background.paste(img, mask=img.getchannel('A'))
+            img = background
+        elif img.mode != 'RGB':
+            img = img.convert('RGB')
+
+        out = io.BytesIO()
+        img.save(out, format='JPEG', quality=self.quality)
+        return out.getvalue()
+
+    def _hit(self):
+        # Called with the lock held.
+        self.hits += 1
+        self.lookups.inc(result='hit')
+
+    def _lookup(self, digest):
+        encoded = self._by_digest.get(digest)
+        if encoded:
+            self._by_digest.move_to_end(digest)
+        return encoded
+
+    def _remember(self, entries, key, value):
+        entries[key] = value
+        entries.move_to_end(key)
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._by_digest),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
@@ -0,0 +1,66 @@
+import queue
+import logging
+
+from app.utils.background import LazyThreads
+from app.utils.metrics import current_trace_id, trace
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at its depth limit."""
+
+
+class JobQueue:
+    """Bounded in-process queue drained by a fixed pool of worker threads.
+
+    Job *state* lives in the ``ChatJob`` table so any gunicorn worker can
+    answer a poll; this class only owns execution. Each callable is run
+    inside an application context of the app passed to :meth:`init_app`.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.max_workers = 2
+        self.max_depth = 16
+        self._queue = None
+        self._workers = LazyThreads(self._run, 'job-worker', setup=self._create_queue)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.max_workers = app.config.get('JOB_WORKERS', self.max_workers)
+        self.max_depth = app.config.get('JOB_QUEUE_MAX_DEPTH', self.max_depth)
+        app.extensions['job_queue'] = self
+
+    @property
+    def depth(self):
+        return self._queue.qsize() if self._queue else 0
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue ``fn(*args, **kwargs)`` or raise :class:`QueueFullError`."""
+        self._workers.start(self.max_workers)
+        try:
+            self._queue.put_nowait((current_trace_id(), fn, args, kwargs))
+        except queue.Full:
+            raise QueueFullError(f"Job queue is full ({self.max_depth} pending)")
+        logger.info(f"Queued {fn.__name__} (depth {self.depth}/{self.max_depth})")
+
+    def _create_queue(self):
+        self._queue = queue.Queue(maxsize=self.max_depth)
+
+    def _run(self):
+        while True:
+            trace_id, fn, args, kwargs = self._queue.get()
+            try:
+                # Log lines of the job carry the id of the request that queued it.
+                with trace(trace_id), self.app.app_context():
+                    fn(*args, **kwargs)
+            except Exception as e:
+                logger.error(f"Job {fn.__name__} crashed: {e}")
+            finally:
+                self._queue.task_done()
+
+
+job_queue = JobQueue()
@@ -1,112 +1,141 @@
 import os
+import time
 import logging
-from ollama import Client
-from PIL import Image
-import base64
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+
+from app.utils import prompts
+from app.utils.blob_store import digest_of
+from app.utils.image_preprocess import ImagePreprocessor, InvalidImageError
+from app.utils.llm_router import OllamaRouter
+from app.utils.metrics import metrics, record_ollama, stage
+from app.utils.ollama_client import OllamaConnection
+from app.utils.response_cache import ResponseCache
+from app.utils.services import llm_service
 
 logger = logging.getLogger(__name__)
 
 class LocalLLM:
-    def __init__(self, host='http://localhost:11434'):
-        self.client = Client(host=host)
+    def __init__(self, host='http://localhost:11434', response_cache=None, connection=None, keep_alive='30m',
+                 image_preprocessor=None):
+        # ``connection`` may be an OllamaConnection or an OllamaRouter over several hosts.
+        self.connection = connection or OllamaConnection(host)
         self.model_name = 'llava:7b'
         self.host = host
-        
-    @retry(
-        stop=stop_after_attempt(3),  # Retry up to 3 times
-        wait=wait_exponential(multiplier=1, min=2, max=10),  # Exponential backoff: 2s, 4s, 8s
-        retry=retry_if_exception_type(Exception),  # Retry on any exception
-        before_sleep=lambda retry_state: logger.warning(
-            f"Retrying connection to Ollama (attempt {retry_state.attempt_number}/3)..."
-        )
-    )
+        self.response_cache = response_cache
+        # Keeping the model loaded also keeps its KV cache, which is what lets
+        # the stable prompt prefix be reused between turns.
+        self.keep_alive = keep_alive
+        self.image_preprocessor = image_preprocessor or ImagePreprocessor()
+        self.prefill = {'requests': 0, 'prompt_tokens': 0, 'evaluated_tokens': 0}
+
+    def embed(self, text, model):
+        """Return the embedding vector of ``text`` from an Ollama embedding model."""
+        return self.connection.request('embeddings', model=model, prompt=text)['embedding']
+
     def _chat_with_ollama(self, messages):
-        """Helper method to handle Ollama chat with retry logic."""
+        """Send a chat request; transient failures are retried by the connection."""
         try:
-            logger.info(f"Attempting to connect to Ollama at {self.host}")
-            response = self.client.chat(model=self.model_name, messages=messages)
+            logger.info(f"Sending chat request to Ollama at {self.host} (~{prompts.estimate_tokens(messages)} tokens)")
+            with stage('ollama'):
+                response = self.connection.chat(model=self.model_name, messages=messages, keep_alive=self.keep_alive)
+            self._record_prefill(messages, response)
+            record_ollama(self.model_name, response)
             return response
         except Exception as e:
-            logger.error(f"Failed to connect to Ollama at {self.host}: {str(e)}")
+            logger.error(f"Ollama chat at {self.host} failed: {str(e)}")
             raise
 
+    def _stream_with_ollama(self, messages):
+        """Yield response content chunks as Ollama generates them."""
+        logger.info(f"Streaming from Ollama at {self.host} (~{prompts.estimate_tokens(messages)} tokens)")
+        started = time.perf_counter()
+        for chunk in self.connection.chat_stream(model=self.model_name, messages=messages, keep_alive=self.keep_alive):
+            if chunk.get('done'):
+                # The response headers are gone by now, so this only reaches the histogram.
+                metrics.observe_stage('ollama', time.perf_counter() - started)
+                self._record_prefill(messages, chunk)
+                record_ollama(self.model_name, chunk)
+            content = chunk['message']['content']
+            if content:
+                yield content
+
+    def _record_prefill(self, messages, response):
+        """Log how much of the prompt Ollama actually had to evaluate.
+
+        ``prompt_eval_count`` only counts tokens that missed the server's
+        prompt cache, so the gap to the full prompt size is the prefill
+        saved by reusing the stable prefix.
+        """
+        evaluated = response.get('prompt_eval_count')
+        if evaluated is None:
+            return
+        total = prompts.estimate_tokens(messages)
+        self.prefill['requests'] += 1
+        self.prefill['prompt_tokens'] += total
+        self.prefill['evaluated_tokens'] += evaluated
+        saved = max(total - evaluated, 0)
+        logger.info(
+            f"Prefill: evaluated {evaluated} of ~{total} prompt tokens "
+            f"(~{saved} reused, {response.get('prompt_eval_duration', 0) / 1e6:.0f} ms)"
+        )
+
+    def prefill_stats(self):
+        stats = dict(self.prefill)
+        total = stats['prompt_tokens']
+        stats['saved_ratio'] = round(max(total - stats['evaluated_tokens'], 0) / total, 4) if total else 0.0
+        return stats
+
+    @staticmethod
+    def clean_response(text):
+        """Strip any echoed prompt so only the doctor's reply remains."""
+        return text.split("Dr. Jhatka:")[-1].strip()
+
+    def _load_image_base64(self, image_data):
+        """Return ``(image_base64, error_message)`` for an image path."""
+        if not (isinstance(image_data, str) and os.path.exists(image_data)):
+            logger.warning(f"Invalid image path: {image_data}")
+            return None, "Invalid image format or path."
+        try:
+            with stage('image_preprocess'):
+                return self.image_preprocessor.encode(image_data, digest_of(image_data)), None
+        except InvalidImageError as e:
+            logger.error(f"Invalid image file {image_data}: {str(e)}")
+            return None, "The uploaded file is not a valid image. Please upload a valid image file (e.g., PNG, JPG)."
+
+    def summarize(self, summary, new_messages, max_words=200):
+        """Fold ``new_messages`` into the running conversation ``summary``.
+
+        Errors propagate so the caller can keep the previous summary.
+        """
+        messages = prompts.summary_messages(summary, new_messages, max_words)
+        response = self.connection.chat(
+            model=self.model_name,
+            messages=messages,
+            keep_alive=self.keep_alive,
+            options={'num_predict': max_words * 2, 'temperature': 0.2}
+        )
+        record_ollama(self.model_name, response)
+        return response['message']['content'].strip()
+
     def process_text_only(self, prompt, user_info=None, language="en"):
+        if self.response_cache:
+            cached = self.response_cache.get(prompt, user_info)
+            if cached:
+                logger.info("Serving text reply from response cache")
+                return cached
+
         try:
-            if user_info:
-                user_context = ""
-                if user_info.get('username'):
-                    user_context += f"The patient's username is {user_info['username']}. "
-                if user_info.get('age'):
-                    user_context += f"The patient is {user_info['age']} years old. "
-                if user_info.get('gender'):
-                    user_context += f"The patient's gender is {user_info['gender']}. "
-                if user_info.get('medical_history'):
-                    user_context += f"The patient's medical history includes: {user_info['medical_history']} "
-                else:
-                    user_context += "The patient has no recorded medical history. "
-                # Add previous conversation to the context
-                previous_conversation = user_info.get('previous_conversation', [])
-                conversation_context = "Previous conversation:\n"
-                if previous_conversation:
-                    for message in previous_conversation:
-                        sender = "User" if message['sender'] == 'user' else "Doctor"
-                        text_content = message['text'] or ""
-                        image_info = f" (with image: {message['image_path']})" if message['image_path'] else ""
-                        conversation_context += f"{sender} at {message['timestamp']}: {text_content}{image_info}\n"
-                else:
-                    conversation_context += "No previous conversation available.\n"
-                user_context += conversation_context
-
-                system_prompt = f"""You are Dr. Jhatka, a professional medical assistant. {user_context}
-                Your goal is to make the user feel they are chatting with a real doctor who knows their background. Respond in a professional, empathetic, and conversational tone, as if you are chatting with the patient. Follow this exact response pattern:
-
-                Hello [Username]! I’m Dr. Jhatka, and I’m here to assist you with your health concerns. I see that you are a [age]-year-old [gender]. Based on your medical history, I note that [medical_history]. Let me also recap our previous conversation: [summarize previous conversation, if any, in a concise sentence, e.g., "you mentioned having a cough last time"].
-
-                I understand that [rephrase the user's query to show empathy, e.g., "you’re experiencing a cough, which must be quite uncomfortable"]. Let’s address this concern:
-
-                - [Provide actionable advice tailored to the user’s age, gender, medical history, and previous conversation. Consider local healthcare practices and resources in Bangladesh.]
-                - [Additional advice, ensuring it’s relevant and practical.]
-                - [More advice if needed, with references to local resources like Upazila Health Complexes or pharmacies in Bangladesh.]
-
-                Please take care, [Username]. How are you feeling now, or do you have any other concerns I can help with?
-
-                Additional instructions:
-                - Tailor suggestions for Bangladesh, considering local healthcare practices and resources.
-                - Do not hallucinate. If unsure, suggest consulting a local doctor.
-                - Use a professional yet approachable tone, avoiding overly technical jargon.
-                - Ensure the advice is safe and considers the user’s medical history (e.g., allergies)."""
-            else:
-                system_prompt = """You are Dr. Jhatka, a professional medical assistant.
-                Your goal is to make the user feel they are chatting with a real doctor. Respond in a professional, empathetic, and conversational tone, as if you are chatting with the patient. Follow this exact response pattern:
-
-                Hello! I’m Dr. Jhatka, and I’m here to assist you with your health concerns. I don’t have your personal details, so my advice will be general.
-
-                I understand that [rephrase the user's query to show empathy]. Let’s address this concern:
-
-                - [Provide general actionable advice, considering local healthcare practices in Bangladesh.]
-                - [Additional advice, ensuring it’s practical.]
-                - [More advice if needed, with references to local resources.]
-
-                Please take care. How are you feeling now, or do you have any other concerns I can help with?
-
-                Additional instructions:
-                - Tailor suggestions for Bangladesh, considering local healthcare practices and resources.
-                - Do not hallucinate. If unsure, suggest consulting a local doctor.
-                - Use a professional yet approachable tone, avoiding overly technical jargon."""
+            messages = prompts.build_messages(prompt, user_info)
+            logger.debug(f"Sending prompt to LLaVA-7B: {prompt}")
             
-            full_prompt = f"{system_prompt}\n\nPatient: {prompt}\n\nDr. Jhatka:"
-            logger.info(f"Sending prompt to LLaVA-7B: {full_prompt}")
-            
-            response = self._chat_with_ollama(messages=[
-                {'role': 'user', 'content': full_prompt}
-            ])
-            response_text = response['message']['content'].split("Dr. Jhatka:")[-1].strip()
-            logger.info(f"Received response: {response_text}")
+            response = self._chat_with_ollama(messages=messages)
+            response_text = self.clean_response(response['message']['content'])
+            logger.debug(f"Received response: {response_text}")
             
             if not response_text or response_text.strip() == "":
                 logger.warning("LLaVA-7B returned an empty response")
                 return "I'm sorry, I couldn't process your request. Please try again or consult a local doctor."
+            if self.response_cache:
+                self.response_cache.put(prompt, user_info, response_text)
             return response_text
         except Exception as e:
             logger.error(f"Error processing text query with Ollama: {str(e)}")
@@ -114,98 +143,16 @@ class LocalLLM:
 
     def process_image_query(self, image_data, prompt, user_info=None, language="en"):
         try:
-            # Validate image file
-            if isinstance(image_data, str) and os.path.exists(image_data):
-                # Check if the file is a valid image
-                try:
-                    with Image.open(image_data) as img:
-                        img.verify()  # Verify that it's a valid image
-                except Exception as e:
-                    logger.error(f"Invalid image file {image_data}: {str(e)}")
-                    return "The uploaded file is not a valid image. Please upload a valid image file (e.g., PNG, JPG)."
-                
-                with open(image_data, 'rb') as f:
-                    image_bytes = f.read()
-                image_base64 = base64.b64encode(image_bytes).decode('utf-8')
-            else:
-                logger.warning(f"Invalid image path: {image_data}")
-                return "Invalid image format or path."
-
-            if user_info:
-                user_context = ""
-                if user_info.get('username'):
-                    user_context += f"The patient's username is {user_info['username']}. "
-                if user_info.get('age'):
-                    user_context += f"The patient is {user_info['age']} years old. "
-                if user_info.get('gender'):
-                    user_context += f"The patient's gender is {user_info['gender']}. "
-                if user_info.get('medical_history'):
-                    user_context += f"The patient's medical history includes: {user_info['medical_history']} "
-                else:
-                    user_context += "The patient has no recorded medical history. "
-                # Add previous conversation to the context
-                previous_conversation = user_info.get('previous_conversation', [])
-                conversation_context = "Previous conversation:\n"
-                if previous_conversation:
-                    for message in previous_conversation:
-                        sender = "User" if message['sender'] == 'user' else "Doctor"
-                        text_content = message['text'] or ""
-                        image_info = f" (with image: {message['image_path']})" if message['image_path'] else ""
-                        conversation_context += f"{sender} at {message['timestamp']}: {text_content}{image_info}\n"
-                else:
-                    conversation_context += "No previous conversation available.\n"
-                user_context += conversation_context
-
-                system_prompt = f"""You are Dr. Jhatka, a professional medical assistant. {user_context}
-                Your goal is to make the user feel they are chatting with a real doctor who knows their background. Respond in a professional, empathetic, and conversational tone, as if you are chatting with the patient. Follow this exact response pattern:
-
-                Hello [Username]! I’m Dr. Jhatka, and I’m here to assist you with your health concerns. I see that you are a [age]-year-old [gender]. Based on your medical history, I note that [medical_history]. Let me also recap our previous conversation: [summarize previous conversation, if any, in a concise sentence, e.g., "you mentioned having a cough last time"].
-
-                I understand that [rephrase the user's query to show empathy, e.g., "you’ve shared an image of a rash, which might be concerning for you"]. Let’s address this concern based on the image:
-
-                - [Provide actionable advice based on the image, tailored to the user’s age, gender, medical history, and previous conversation. Consider local healthcare practices in Bangladesh.]
-                - [Additional advice, ensuring it’s relevant and practical. Verify the image aligns with the user’s age and gender; if not, ask for clarification.]
-                - [More advice if needed, with references to local resources like Upazila Health Complexes or pharmacies in Bangladesh.]
-
-                Please take care, [Username]. How are you feeling now, or do you have any other concerns I can help with?
-
-                Additional instructions:
-                - Verify that the image aligns with the patient’s age and gender. If there are dissimilarities, ask for clarification before proceeding (e.g., "The image appears to show a child’s skin, but you are a 35-year-old male. Can you confirm if this image is of your skin?").
-                - Tailor suggestions for Bangladesh, considering local healthcare practices and resources.
-                - Do not hallucinate. If unsure, suggest consulting a local doctor.
-                - Use a professional yet approachable tone, avoiding overly technical jargon.
-                - Ensure the advice is safe and considers the user’s medical history (e.g., allergies)."""
-            else:
-                system_prompt = """You are Dr. Jhatka, a professional medical assistant.
-                Your goal is to make the user feel they are chatting with a real doctor. Respond in a professional, empathetic, and conversational tone, as if you are chatting with the patient. Follow this exact response pattern:
-
-                Hello! I’m Dr. Jhatka, and I’m here to assist you with your health concerns. I don’t have your personal details, so my advice will be general.
-
-                I understand that [rephrase the user's query to show empathy]. Let’s address this concern based on the image:
-
-                - [Provide general actionable advice based on the image, considering local healthcare practices in Bangladesh.]
-                - [Additional advice, ensuring it’s practical.]
-                - [More advice if needed, with references to local resources.]
-
-                Please take care. How are you feeling now, or do you have any other concerns I can help with?
-
-                Additional instructions:
-                - Tailor suggestions for Bangladesh, considering local healthcare practices and resources.
-                - Do not hallucinate. If unsure, suggest consulting a local doctor.
-                - Use a professional yet approachable tone, avoiding overly technical jargon."""
-            
-            full_prompt = f"{system_prompt}\n\nPatient's question: {prompt}\n\nDr. Jhatka:"
-            logger.info(f"Sending image prompt to LLaVA-7B: {full_prompt}")
+            image_base64, error = self._load_image_base64(image_data)
+            if error:
+                return error
+
+            messages = prompts.build_messages(prompt, user_info, image_base64)
+            logger.debug(f"Sending image prompt to LLaVA-7B: {prompt}")
             
-            response = self._chat_with_ollama(messages=[
-                {
-                    'role': 'user',
-                    'content': full_prompt,
-                    'images': [image_base64]
-                }
-            ])
-            response_text = response['message']['content'].split("Dr. Jhatka:")[-1].strip()
-            logger.info(f"Received image response: {response_text}")
+            response = self._chat_with_ollama(messages=messages)
+            response_text = self.clean_response(response['message']['content'])
+            logger.debug(f"Received image response: {response_text}")
             
             if not response_text or response_text.strip() == "":
                 logger.warning("LLaVA-7B returned an empty response for image query")
@@ -215,4 +162,86 @@ class LocalLLM:
             logger.error(f"Error processing image query with Ollama: {str(e)}")
             return "I'm sorry, I encountered an issue analyzing the image."
 
-llm_service = LocalLLM(host=os.environ.get('OLLAMA_HOST', 'http://localhost:11434'))
\ No newline at end of file
+    def stream_text_only(self, prompt, user_info=None, language="en"):
+        """Yield the reply to a text query chunk by chunk.
+
+        Unlike :meth:`process_text_only` errors are not swallowed, so the
+        caller can report them to a client that is already receiving tokens.
+        A response cache hit is yielded as a single chunk.
+        """
+        if self.response_cache:
+            cached = self.response_cache.get(prompt, user_info)
+            if cached:
+                logger.info("Serving streamed text reply from response cache")
+                yield cached
+                return
+
+        messages = prompts.build_messages(prompt, user_info)
+        logger.debug(f"Streaming prompt to LLaVA-7B: {prompt}")
+        parts = []
+        for chunk in self._stream_with_ollama(messages=messages):
+            parts.append(chunk)
+            yield chunk
+
+        response_text = self.clean_response(''.join(parts))
+        if self.response_cache and response_text:
+            self.response_cache.put(prompt, user_info, response_text)
+
+    def stream_image_query(self, image_data, prompt, user_info=None, language="en"):
+        """Yield the reply to an image query chunk by chunk."""
+        image_base64, error = self._load_image_base64(image_data)
+        if error:
+            yield error
+            return
+
+        messages = prompts.build_messages(prompt, user_info, image_base64)
+        logger.debug(f"Streaming image prompt to LLaVA-7B: {prompt}")
+        yield from self._stream_with_ollama(messages=messages)
+
+def _build_response_cache(config):
+    if not config['RESPONSE_CACHE_ENABLED']:
+        return None
+    embed_model = config['OLLAMA_EMBED_MODEL']  # Unset means exact matches only
+    return ResponseCache(
+        max_entries=config['RESPONSE_CACHE_MAX_ENTRIES'],
+        ttl=config['RESPONSE_CACHE_TTL'],
+        similarity=config['RESPONSE_CACHE_SIMILARITY'],
+        embed=(lambda text: llm_service.embed(text, embed_model)) if embed_model else None
+    )
+
+def _build_connection(host, config):
+    return OllamaConnection(
+        host,
+        connect_timeout=config['OLLAMA_CONNECT_TIMEOUT'],
+        read_timeout=config['OLLAMA_READ_TIMEOUT'],
+        max_connections=config['OLLAMA_MAX_CONNECTIONS'],
+        max_attempts=config['OLLAMA_RETRY_ATTEMPTS'],
+        failure_threshold=config['OLLAMA_BREAKER_THRESHOLD'],
+        reset_timeout=config['OLLAMA_BREAKER_RESET']
+    )
+
+def _build_router(config):
+    # OLLAMA_HOSTS takes a comma-separated list; OLLAMA_HOST remains the single-host default.
+    hosts = [h.strip() for h in config['OLLAMA_HOSTS'].split(',') if h.strip()] or [config['OLLAMA_HOST']]
+    return OllamaRouter.from_hosts(
+        hosts,
+        connection_factory=lambda host: _build_connection(host, config),
+        max_concurrency=config['OLLAMA_HOST_MAX_CONCURRENCY'],
+        strategy=config['OLLAMA_ROUTING'],
+        health_interval=config['OLLAMA_HEALTH_INTERVAL']
+    )
+
+def build_llm_service(config):
+    """Build the process's LocalLLM from the app ``config``; called once, by the service registry."""
+    router = _build_router(config)
+    return LocalLLM(
+        host=router.host,
+        response_cache=_build_response_cache(config),
+        connection=router,
+        keep_alive=config['OLLAMA_KEEP_ALIVE'],
+        image_preprocessor=ImagePreprocessor(
+            max_side=config['IMAGE_MAX_SIDE'],
+            quality=config['IMAGE_JPEG_QUALITY'],
+            max_entries=config['IMAGE_CACHE_ENTRIES']
+        )
+    )
@@ -0,0 +1,210 @@
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+from app.utils.background import LazyThreads
+from app.utils.ollama_client import OllamaConnection, CircuitOpenError, is_transient
+
+logger = logging.getLogger(__name__)
+
+
+class NoBackendAvailable(Exception):
+    """Raised when every Ollama host is busy or down."""
+
+
+class Backend:
+    """One Ollama host plus the bookkeeping the router schedules on."""
+
+    def __init__(self, connection, max_concurrency):
+        self.connection = connection
+        self.host = connection.host
+        self.max_concurrency = max_concurrency
+        self.outstanding = 0
+        self.latency = None  # EWMA of seconds to first byte
+        self.healthy = True
+        self.last_error = None
+        self.requests = 0
+        self.failures = 0
+
+    @property
+    def available(self):
+        return self.healthy and self.connection.breaker.state != 'open'
+
+    def score(self, strategy):
+        if strategy == 'latency':
+            # Unknown latency scores 0 so new or recovered hosts get probed.
+            return (self.latency or 0.0) * (self.outstanding + 1), self.outstanding
+        return self.outstanding, self.latency or 0.0
+
+    def observe(self, seconds, alpha=0.3):
+        self.latency = seconds if self.latency is None else alpha * seconds + (1 - alpha) * self.latency
+
+    def stats(self):
+        return {
+            'host': self.host,
+            'healthy': self.healthy,
+            'circuit': self.connection.breaker.state,
+            'outstanding': self.outstanding,
+            'max_concurrency': self.max_concurrency,
+            'latency_ms': round(self.latency * 1000, 1) if self.latency is not None else None,
+            'requests': self.requests,
+            'failures': self.failures,
+            'last_error': self.last_error
+        }
+
+
+class OllamaRouter:
+    """Spreads requests across several Ollama hosts.
+
+    Exposes the same ``request``/``chat``/``chat_stream`` interface as
+    :class:`OllamaConnection`, so :class:`LocalLLM` can use either. Each
+    call goes to the available host with the fewest requests in flight
+    (or, with ``strategy='latency'``, the lowest expected wait), never
+    exceeding a host's ``max_concurrency``. Transient failures mark the
+    host unhealthy and the call fails over to the next one; a successful
+    call or the background probe every ``health_interval`` seconds marks
+    it healthy again.
+    """
+
+    def __init__(self, connections, max_concurrency=2, strategy='least_outstanding',
+                 health_interval=15, acquire_timeout=60):
+        if not connections:
+            raise ValueError("OllamaRouter needs at least one connection")
+        self.backends = [Backend(c, max_concurrency) for c in connections]
+        self.strategy = strategy
+        self.health_interval = health_interval
+        self.acquire_timeout = acquire_timeout
+        self.host = ', '.join(b.host for b in self.backends)
+        self._cond = threading.Condition()
+        self._health_thread = LazyThreads(self._health_loop, 'ollama-health')
+
+    @classmethod
+    def from_hosts(cls, hosts, connection_factory=OllamaConnection, **kwargs):
+        return cls([connection_factory(host) for host in hosts], **kwargs)
+
+    @property
+    def queue_depth(self):
+        return sum(b.outstanding for b in self.backends)
+
+    def _pick(self, exclude):
+        candidates = [b for b in self.backends if b not in exclude and b.available]
+        if not candidates:
+            # Nothing known-good: let the circuit breakers decide rather than refusing outright.
+            candidates = [b for b in self.backends if b not in exclude]
+        with_capacity = [b for b in candidates if b.outstanding < b.max_concurrency]
+        if with_capacity:
+            return min(with_capacity, key=lambda b: b.score(self.strategy)), bool(candidates)
+        return None, bool(candidates)
+
+    @contextmanager
+    def _slot(self, exclude):
+        self._ensure_health_checks()
+        deadline = time.monotonic() + self.acquire_timeout
+        with self._cond:
+            while True:
+                backend, any_left = self._pick(exclude)
+                if backend or not any_left:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise NoBackendAvailable("All Ollama hosts are at their concurrency limit")
+                self._cond.wait(remaining)
+            if not backend:
+                raise NoBackendAvailable("No Ollama host left to try")
+            backend.outstanding += 1
+            backend.requests += 1
+        try:
+            yield backend
+        finally:
+            with self._cond:
+                backend.outstanding -= 1
+                self._cond.notify()
+
+    def _record_failure(self, backend, error):
+        backend.failures += 1
+        backend.last_error = str(error)[:200]
+        if is_transient(error) or isinstance(error, CircuitOpenError):
+            backend.healthy = False
+            logger.warning(f"Ollama host {backend.host} failed, failing over: {error}")
+            return True
+        return False
+
+    def _record_success(self, backend, seconds):
+        backend.observe(seconds)
+        if not backend.healthy:
+            logger.info(f"Ollama host {backend.host} is healthy again")
+        backend.healthy = True
+        backend.last_error = None
+
+    def request(self, method, **kwargs):
+        tried = []
+        while True:
+            with self._slot(tried) as backend:
+                tried.append(backend)
+                started = time.perf_counter()
+                try:
+                    result = backend.connection.request(method, **kwargs)
+                except Exception as e:
+                    if not self._record_failure(backend, e) or len(tried) == len(self.backends):
+                        raise
+                    continue
+                self._record_success(backend, time.perf_counter() - started)
+                return result
+
+    def chat(self, **kwargs):
+        return self.request('chat', **kwargs)
+
+    def chat_stream(self, **kwargs):
+        """Stream from the best host; fails over only until the first chunk arrives."""
+        tried = []
+        while True:
+            with self._slot(tried) as backend:
+                tried.append(backend)
+                started = time.perf_counter()
+                stream = backend.connection.chat_stream(**kwargs)
+                try:
+                    first = next(stream, None)
+                except Exception as e:
+                    if not self._record_failure(backend, e) or len(tried) == len(self.backends):
+                        raise
+                    continue
+                self._record_success(backend, time.perf_counter() - started)
+                if first is None:
+                    return
+                yield first
+                yield from stream
+                return
+
+    def _ensure_health_checks(self):
+        if self.health_interval > 0:
+            self._health_thread.start()
+
+    def _health_loop(self):
+        while True:
+            time.sleep(self.health_interval)
+            self.check_health()
+
+    def check_health(self):
+        for backend in self.backends:
+            try:
+                backend.connection.client.list()
+            except Exception as e:
+                if backend.healthy:
+                    logger.warning(f"Ollama host {backend.host} failed health check: {e}")
+                backend.healthy = False
+                backend.last_error = str(e)[:200]
+            else:
+                if not backend.healthy:
+                    logger.info(f"Ollama host {backend.host} is healthy again")
+                backend.healthy = True
+                backend.last_error = None
+        with self._cond:
+            self._cond.notify_all()
+
+    def stats(self):
+        return {
+            'strategy': self.strategy,
+            'queue_depth': self.queue_depth,
+            'hosts': [b.stats() for b in self.backends]
+        }
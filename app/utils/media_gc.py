@@ -0,0 +1,346 @@
+"""Background garbage collection of uploaded and generated media.
+
+A sweep runs every ``MEDIA_GC_INTERVAL`` seconds in each process, and
+soon after a conversation or account is deleted, always outside the
+request that asked for it:
+
+1. With ``MEDIA_RETENTION_DAYS`` set, uploads attached to messages older
+   than that are detached from their messages.
+2. ``Message.image_path``/``audio_path`` are read in batches of
+   ``MEDIA_GC_BATCH`` and ``Blob.ref_count`` is corrected where it
+   drifted. A count is only overwritten if no turn changed it during the
+   sweep, so a sweep never loses a reference made while it ran.
+3. Blobs nobody references are deleted once their file is older than
+   ``MEDIA_GC_GRACE`` seconds, as are stale temp files and unreferenced
+   files the app itself left directly in ``UPLOAD_FOLDER`` (recordings
+   and their STT ``.wav`` copies, old ``response_*.mp3`` replies; see
+   ``GENERATED_NAMES``). Anything else there, such as sample or operator
+   files, is never touched.
+4. The TTS cache is trimmed to ``TTS_CACHE_MAX_BYTES``.
+
+Each sweep logs and returns how many bytes it reclaimed; the totals are
+exported as ``media_gc_reclaimed_bytes_total``. ``flask media-gc`` runs a
+sweep by hand. Sweeps in different processes may overlap; every step
+tolerates files and rows that another sweep already removed.
+"""
+import os
+import re
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import delete, or_, update
+from sqlalchemy.exc import IntegrityError
+
+from app.utils.background import LazyThreads
+from app.utils.blob_store import blob_store, digest_of, PUBLIC_PREFIX
+from app.utils.jobs import job_queue, QueueFullError
+from app.utils.metrics import metrics, trace
+
+logger = logging.getLogger(__name__)
+
+# Files the app writes directly in UPLOAD_FOLDER: recordings (``{user}_{id}_recording.webm``,
+# older ``{time}_recording.*``), their STT ``.wav``/``_temp.wav`` copies and pre-cache TTS replies.
+GENERATED_NAMES = re.compile(r'^(?:[\w-]+_recording(?:_temp)?\.(?:webm|wav|mp3|ogg)|response_\d+\.mp3)$')
+
+
+class MediaCollector:
+    """Reclaims disk from media that no message references any more."""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.interval = 3600
+        self.grace = 3600
+        self.batch = 500
+        self.retention_days = 0
+        self.last_report = None
+        self.reclaimed = metrics.counter(
+            'media_gc_reclaimed_bytes_total', 'Bytes of media deleted by the collector, by kind.', ('kind',)
+        )
+        self._pending = False
+        self._thread = LazyThreads(self._run, 'media-gc')
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.interval = app.config.get('MEDIA_GC_INTERVAL', self.interval)
+        self.grace = app.config.get('MEDIA_GC_GRACE', self.grace)
+        self.batch = app.config.get('MEDIA_GC_BATCH', self.batch)
+        self.retention_days = app.config.get('MEDIA_RETENTION_DAYS', self.retention_days)
+        app.before_request(self._ensure_started)
+        app.cli.add_command(media_gc_command)
+        app.extensions['media_gc'] = self
+
+    def _ensure_started(self):
+        if self.interval:
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                with trace('media-gc'), self.app.app_context():
+                    self.sweep()
+            except Exception as e:
+                logger.error(f"Media sweep failed: {e}")
+
+    def schedule(self):
+        """Queue a sweep, e.g. after a delete; a full queue leaves it to the periodic one."""
+        with self._lock:
+            if self._pending:
+                return
+            self._pending = True
+        try:
+            job_queue.submit(self._scheduled_sweep)
+        except QueueFullError:
+            with self._lock:
+                self._pending = False
+            logger.info("Job queue full, leaving media cleanup to the next periodic sweep")
+
+    def _scheduled_sweep(self):
+        with self._lock:
+            self._pending = False
+        self.sweep()
+
+    def sweep(self):
+        """Run one collection pass and return what it reclaimed."""
+        started = time.perf_counter()
+        report = {'detached': 0, 'recounted': 0, 'blobs': 0, 'files': 0, 'bytes': 0}
+        if self.retention_days:
+            report['detached'] = self._apply_retention()
+        counts = self._blob_counts()
+        blob_refs, loose_refs = self._scan_references()
+        report['recounted'] = self._reconcile(counts, blob_refs)
+        self._collect_blobs(report)
+        self._collect_loose_files(loose_refs, report)
+        self._trim_tts_cache(report)
+        report['seconds'] = round(time.perf_counter() - started, 3)
+        self.last_report = dict(report, finished_at=datetime.utcnow().isoformat())
+        logger.info(
+            f"Media sweep reclaimed {report['bytes']} bytes ({report['blobs']} blobs, {report['files']} files), "
+            f"recounted {report['recounted']} blobs, detached {report['detached']} messages "
+            f"in {report['seconds']}s"
+        )
+        return report
+
+    def _reclaim(self, report, kind, size):
+        report['bytes'] += size
+        self.reclaimed.inc(size, kind=kind)
+
+    def _apply_retention(self):
+        """Detach uploads from messages older than ``retention_days``."""
+        from app import db
+        from app.models import Message
+        from app.utils.tts_pool import tts_pool
+
+        cutoff = datetime.utcnow() - timedelta(days=self.retention_days)
+        detached, last_id = 0, 0
+        while True:
+            messages = Message.query.filter(
+                Message.id > last_id,
+                Message.timestamp < cutoff,
+                or_(Message.image_path.isnot(None), Message.audio_path.isnot(None))
+            ).order_by(Message.id).limit(self.batch).all()
+            if not messages:
+                return detached
+            for message in messages:
+                # Synthesized replies stay; the TTS cache expires them on its own
+                # and the audio route synthesizes them again when asked.
+                uploads = [attr for attr in ('image_path', 'audio_path')
+                           if getattr(message, attr) and not getattr(message, attr).startswith(tts_pool.public_prefix)]
+                if uploads:
+                    blob_store.release(*(getattr(message, attr) for attr in uploads))
+                    for attr in uploads:
+                        setattr(message, attr, None)
+                    detached += 1
+            last_id = messages[-1].id
+            db.session.commit()
+
+    def _blob_counts(self):
+        """Snapshot ``{digest: ref_count}``, taken before messages are scanned."""
+        from app import db
+        from app.models import Blob
+
+        counts, last = {}, ''
+        while True:
+            rows = db.session.query(Blob.digest, Blob.ref_count).filter(
+                Blob.digest > last).order_by(Blob.digest).limit(self.batch).all()
+            db.session.commit()  # End the read so later batches see new commits
+            if not rows:
+                return counts
+            counts.update(rows)
+            last = rows[-1][0]
+
+    def _scan_references(self):
+        """Return ``({digest: [count, url]}, {file names})`` referenced by messages."""
+        from app import db
+        from app.models import Message
+
+        blob_refs, loose_refs, last_id = {}, set(), 0
+        while True:
+            rows = db.session.query(Message.id, Message.image_path, Message.audio_path).filter(
+                Message.id > last_id).order_by(Message.id).limit(self.batch).all()
+            db.session.commit()
+            if not rows:
+                return blob_refs, loose_refs
+            for _, *urls in rows:
+                for url in filter(None, urls):
+                    digest = digest_of(url) if url.startswith(PUBLIC_PREFIX) else None
+                    if digest:
+                        blob_refs.setdefault(digest, [0, url])[0] += 1
+                    else:
+                        loose_refs.add(os.path.basename(url))
+            last_id = rows[-1][0]
+
+    def _reconcile(self, counts, blob_refs):
+        """Correct drifted ref counts and return how many were changed."""
+        from app import db
+        from app.models import Blob
+
+        changed = 0
+        for digest, seen in counts.items():
+            actual = blob_refs.pop(digest, [0])[0]
+            if actual == seen:
+                continue
+            # Compare-and-set: a turn or delete since the snapshot wins, and the next sweep looks again.
+            result = db.session.execute(
+                update(Blob).where(Blob.digest == digest, Blob.ref_count == seen).values(ref_count=actual)
+            )
+            changed += result.rowcount
+        db.session.commit()
+
+        # Referenced blobs whose row is gone (a delete raced a re-upload): restore the row.
+        for digest, (count, url) in blob_refs.items():
+            path = blob_store.resolve(url)
+            if not path or not os.path.exists(path):
+                continue
+            db.session.add(Blob(digest=digest, extension=url.rsplit('.', 1)[1], size=os.path.getsize(path),
+                                ref_count=count))
+            try:
+                db.session.commit()
+                changed += 1
+            except IntegrityError:
+                db.session.rollback()
+        return changed
+
+    def _collect_blobs(self, report):
+        from app import db
+        from app.models import Blob
+
+        cutoff = datetime.utcnow() - timedelta(seconds=self.grace)
+        last = ''
+        while True:
+            candidates = db.session.query(Blob.digest, Blob.extension).filter(
+                Blob.digest > last, Blob.ref_count == 0, Blob.created_at < cutoff
+            ).order_by(Blob.digest).limit(self.batch).all()
+            db.session.commit()
+            if not candidates:
+                return
+            for digest, extension in candidates:
+                path = os.path.join(blob_store.root, *blob_store.relative(digest, extension).split('/'))
+                size = self._collect_blob(digest, path)
+                if size is not None:
+                    report['blobs'] += 1
+                    self._reclaim(report, 'blob', size)
+            last = candidates[-1][0]
+
+    def _collect_blob(self, digest, path):
+        """Delete one unreferenced blob; return its size, or None if it was kept."""
+        from app import db
+        from app.models import Blob
+
+        # Moved aside first: an upload arriving meanwhile finds no file and
+        # links its own copy, so removing ours can never take its file.
+        tombstone = os.path.join(blob_store.tmp_dir, f"{digest}.collect")
+        try:
+            os.rename(path, tombstone)
+            stat = os.stat(tombstone)
+        except FileNotFoundError:
+            tombstone, stat = None, None
+        if stat and time.time() - stat.st_mtime < self.grace:
+            self._restore(tombstone, path)  # Uploaded again recently
+            return None
+
+        result = db.session.execute(delete(Blob).where(Blob.digest == digest, Blob.ref_count == 0))
+        db.session.commit()
+        if not result.rowcount:
+            if tombstone:
+                self._restore(tombstone, path)  # Referenced again since it was listed
+            return None
+        if tombstone:
+            self._remove(tombstone)
+        return stat.st_size if stat else 0
+
+    @staticmethod
+    def _restore(tombstone, path):
+        try:
+            os.link(tombstone, path)
+        except FileExistsError:
+            pass  # Stored again meanwhile; same content
+        except FileNotFoundError:
+            return
+        MediaCollector._remove(tombstone)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            return size
+        except FileNotFoundError:
+            return 0  # Another sweep got there first
+
+    def _collect_loose_files(self, loose_refs, report):
+        """Delete stale temp files and unreferenced generated files directly in ``UPLOAD_FOLDER``."""
+        cutoff = time.time() - self.grace
+        upload_folder = os.path.dirname(blob_store.root)
+        directories = [
+            (upload_folder, lambda name: GENERATED_NAMES.match(name) and name not in loose_refs),
+            (os.path.join(blob_store.root, '.tmp'), lambda name: True),
+            (os.path.join(upload_folder, 'tts'), lambda name: name.startswith('.tmp_')),
+        ]
+        for directory, collectable in directories:
+            try:
+                entries = list(os.scandir(directory))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                # A tombstone keeps its blob's old mtime but was renamed (ctime) just now.
+                changed = stat.st_ctime if entry.name.endswith('.collect') else stat.st_mtime
+                stale = entry.is_file() and changed < cutoff
+                if stale and collectable(entry.name):
+                    size = self._remove(entry.path)
+                    if size:
+                        report['files'] += 1
+                        self._reclaim(report, 'file', size)
+
+    def _trim_tts_cache(self, report):
+        from app.utils.tts_cache import TTSCache
+        from app.utils.tts_pool import tts_pool
+
+        if not tts_pool.cache_dir or not os.path.isdir(tts_pool.cache_dir):
+            return
+        freed = TTSCache(tts_pool.cache_dir, tts_pool.cache_max_bytes).evict()
+        if freed:
+            self._reclaim(report, 'tts', freed)
+
+
+media_collector = MediaCollector()
+
+
+@click.command('media-gc')
+@with_appcontext
+def media_gc_command():
+    """Run one media garbage collection sweep and print what it reclaimed."""
+    report = media_collector.sweep()
+    click.echo(f"Reclaimed {report['bytes']} bytes: {report['blobs']} blobs, {report['files']} files; "
+               f"recounted {report['recounted']} blobs, detached {report['detached']} messages")
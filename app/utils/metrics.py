@@ -0,0 +1,251 @@
+"""Request tracing and Prometheus-style metrics.
+
+Every request gets a trace id, either the incoming ``X-Request-ID`` or a
+new one. The id is added to each log line written while the request is
+handled, including by the chat jobs it queues, and is sent back in the
+``X-Request-ID`` header. The stages of a chat turn (upload save, audio
+decode, STT, context assembly, Ollama, DB commit, TTS) are timed with
+:func:`stage` into the ``chat_stage_seconds`` histogram. Stages timed
+during a request are also listed in its ``Server-Timing`` header.
+Ollama's own counters (``eval_count``, ``eval_duration`` and so on) are
+recorded by :func:`record_ollama`.
+
+``GET /metrics`` serves everything in the Prometheus text format. Values
+are kept per process, so scrape each gunicorn worker (or run one).
+"""
+import time
+import uuid
+import logging
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from flask import g, has_request_context, request
+
+logger = logging.getLogger(__name__)
+
+# Seconds; chat turns span milliseconds (DB) to minutes (cold model loads).
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+LOG_FORMAT = '%(asctime)s %(levelname)s [%(trace_id)s] %(name)s: %(message)s'
+
+_trace_id = ContextVar('trace_id', default='-')
+
+
+def current_trace_id():
+    return _trace_id.get()
+
+
+@contextmanager
+def trace(trace_id):
+    """Attribute log lines in this block to ``trace_id`` (e.g. in a background job)."""
+    token = _trace_id.set(trace_id)
+    try:
+        yield
+    finally:
+        _trace_id.reset(token)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{value}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name + _labels(self.labelnames, key), value) for key, value in sorted(self._values.items())]
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                samples.append((f"{self.name}_bucket" + _labels(self.labelnames, key, [('le', bound)]), cumulative))
+            samples.append((f"{self.name}_sum" + _labels(self.labelnames, key), round(total, 6)))
+            samples.append((f"{self.name}_count" + _labels(self.labelnames, key), cumulative))
+        return samples
+
+
+class Metrics:
+    """Registry of the process's metrics and the per-request tracing hooks."""
+
+    def __init__(self, app=None):
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self.requests = self.histogram(
+            'http_request_duration_seconds', 'Time to produce a response, by endpoint.',
+            ('endpoint', 'method', 'status')
+        )
+        self.stages = self.histogram('chat_stage_seconds', 'Time spent in each stage of a chat turn.', ('stage',))
+        self.ollama_tokens = self.counter(
+            'ollama_tokens_total', 'Tokens Ollama evaluated, by phase (prompt or generation).', ('model', 'phase')
+        )
+        self.ollama_seconds = self.histogram(
+            'ollama_phase_seconds', "Ollama's own timings per request, by phase (load, prompt or generation).",
+            ('model', 'phase')
+        )
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        _install_log_records()
+        logging.basicConfig(level=logging.INFO, format=app.config.get('LOG_FORMAT', LOG_FORMAT))
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        app.extensions['metrics'] = self
+
+    def _register(self, cls, name, *args):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = cls(name, *args)
+            return self._metrics[name]
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, documentation, labelnames, buckets)
+
+    def _before_request(self):
+        incoming = request.headers.get('X-Request-ID', '')
+        trace_id = incoming[:64] if incoming.isprintable() and incoming else uuid.uuid4().hex[:16]
+        _trace_id.set(trace_id)
+        g.trace_id = trace_id
+        g.request_started = time.perf_counter()
+        g.server_timing = []
+
+    def _after_request(self, response):
+        started = g.get('request_started')
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        if endpoint != '/metrics':
+            self.requests.observe(elapsed, endpoint=endpoint, method=request.method, status=response.status_code)
+        response.headers['X-Request-ID'] = g.trace_id
+        timings = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in g.get('server_timing', [])]
+        timings.append(f"total;dur={elapsed * 1000:.1f}")
+        response.headers['Server-Timing'] = ', '.join(timings)
+        return response
+
+    def _teardown_request(self, error=None):
+        _trace_id.set('-')
+
+    def observe_stage(self, name, seconds):
+        self.stages.observe(seconds, stage=name)
+        if has_request_context() and 'server_timing' in g:
+            g.server_timing.append((name, seconds))
+
+    def render(self):
+        lines = []
+        with self._lock:
+            registered = list(self._metrics.values())
+        for metric in registered:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(f"{name} {value}" for name, value in metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+_record_factory_lock = threading.Lock()
+_record_factory_installed = False
+
+
+def _install_log_records():
+    """Give every log record a ``trace_id`` attribute, whichever handler formats it."""
+    global _record_factory_installed
+    with _record_factory_lock:
+        if _record_factory_installed:
+            return
+        factory = logging.getLogRecordFactory()
+
+        def record_with_trace_id(*args, **kwargs):
+            record = factory(*args, **kwargs)
+            record.trace_id = _trace_id.get()
+            return record
+
+        logging.setLogRecordFactory(record_with_trace_id)
+        _record_factory_installed = True
+
+
+metrics = Metrics()
+
+
+@contextmanager
+def stage(name):
+    """Time the enclosed block as chat stage ``name``, even if it raises."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.observe_stage(name, time.perf_counter() - started)
+
+
+def record_ollama(model, response):
+    """Record the token counts and timings Ollama reports on a finished request.
+
+    Durations arrive in nanoseconds and are missing from cached or
+    failed responses, in which case nothing is recorded for them.
+    """
+    phases = (
+        ('load', None, 'load_duration'),
+        ('prompt', 'prompt_eval_count', 'prompt_eval_duration'),
+        ('generation', 'eval_count', 'eval_duration'),
+    )
+    for phase, count_key, duration_key in phases:
+        if count_key and response.get(count_key) is not None:
+            metrics.ollama_tokens.inc(response[count_key], model=model, phase=phase)
+        if response.get(duration_key) is not None:
+            metrics.ollama_seconds.observe(response[duration_key] / 1e9, model=model, phase=phase)
+
+    generated, duration = response.get('eval_count'), response.get('eval_duration')
+    if generated and duration:
+        logger.info(
+            f"Ollama generated {generated} tokens in {duration / 1e9:.2f}s "
+            f"({generated / (duration / 1e9):.1f} tokens/s), prompt {response.get('prompt_eval_count', 0)} tokens "
+            f"in {response.get('prompt_eval_duration', 0) / 1e9:.2f}s"
+        )
@@ -0,0 +1,173 @@
+"""Keeps the Ollama models loaded and reports whether they are.
+
+Loading llava:7b into RAM on a CPU-only host takes seconds, and Ollama
+unloads a model once its ``keep_alive`` runs out, so the first turn
+after a quiet spell used to pay for a full load. With ``MODEL_PRELOAD``
+on, each worker loads ``MODEL_PRELOAD_MODELS`` (by default the chat
+model and ``OLLAMA_EMBED_MODEL``) on every Ollama host as soon as it
+serves its first request, which is normally the load balancer's first
+``GET /ready``. Every ``MODEL_CHECK_INTERVAL`` seconds it then asks each
+host what it has loaded (``/api/ps``) and re-sends the load request for
+models that are gone or expire before the next check. That refreshes
+their ``keep_alive`` (``OLLAMA_KEEP_ALIVE``; ``-1`` keeps them loaded
+for good).
+
+``GET /ready`` answers 200 once every model is loaded on at least one
+available host, and 503 until then. Point the load balancer's health
+check at it so traffic only reaches warm instances.
+"""
+import time
+import logging
+import threading
+from datetime import datetime, timezone
+
+from app.utils.background import LazyThreads
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def _full_name(model):
+    # Ollama reports "llava" as "llava:latest".
+    return model if ':' in model else f"{model}:latest"
+
+
+class ModelManager:
+    """Preloads Ollama models on every host and tracks their load state."""
+
+    def __init__(self, app=None):
+        self.enabled = True
+        self.check_interval = 60
+        self._models = []
+        self.embed_model = None
+        self._states = {}  # (host, model) -> state dict, see stats()
+        self._lock = threading.Lock()
+        self._thread = LazyThreads(self._run, 'model-manager')
+        self.load_seconds = metrics.histogram(
+            'ollama_model_load_seconds', 'Time to load a model on an Ollama host, by model.', ('model',)
+        )
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('MODEL_PRELOAD', self.enabled)
+        self.check_interval = app.config.get('MODEL_CHECK_INTERVAL', self.check_interval)
+        self._models = [m.strip() for m in app.config.get('MODEL_PRELOAD_MODELS', '').split(',') if m.strip()]
+        self.embed_model = app.config.get('OLLAMA_EMBED_MODEL') or None
+        app.before_request(self._ensure_started)
+        app.extensions['model_manager'] = self
+
+    @property
+    def models(self):
+        """``[(model, kind)]`` to keep loaded; ``kind`` is ``'chat'`` or ``'embed'``."""
+        from app.utils.services import llm_service
+
+        names = self._models or [llm_service.model_name] + ([self.embed_model] if self.embed_model else [])
+        return [(name, 'embed' if name == self.embed_model else 'chat') for name in names]
+
+    def _hosts(self):
+        from app.utils.services import llm_service
+
+        connection = llm_service.connection
+        if hasattr(connection, 'backends'):
+            return [(backend.host, backend.connection, backend.available) for backend in connection.backends]
+        return [(connection.host, connection, connection.breaker.state != 'open')]
+
+    def _ensure_started(self):
+        if self.enabled:
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Model check failed: {e}")
+            time.sleep(self.check_interval)
+
+    def preload(self):
+        """Load every model on every host now; the warm-up hook of the LLM service."""
+        self.refresh(force=True)
+
+    def refresh(self, force=False):
+        """Check what each host has loaded and (re)load what is missing or about to expire."""
+        from app.utils.services import llm_service
+
+        for host, connection, available in self._hosts():
+            if not (available or force):
+                continue  # Loaded on the first check after the router's health checks bring it back
+            running = None if force else self._running(host, connection)
+            for model, kind in self.models:
+                expires_at = (running or {}).get(_full_name(model))
+                if expires_at is not None:
+                    self._set(host, model, 'loaded', expires_at=expires_at.isoformat())
+                    if (expires_at - datetime.now(timezone.utc)).total_seconds() > 2 * self.check_interval:
+                        continue
+                elif running is not None and self._state(host, model) == 'loaded':
+                    logger.info(f"Model {model} was unloaded from {host}")
+                    self._set(host, model, 'unloaded')
+                self._load(host, connection, model, kind, llm_service.keep_alive)
+
+    def _running(self, host, connection):
+        """``{model: expires_at}`` loaded on ``host``, or None if it could not be asked."""
+        try:
+            response = connection.client.ps()
+        except Exception as e:
+            logger.warning(f"Could not list loaded models on {host}: {e}")
+            return None
+        running = {}
+        for entry in response['models']:
+            expires_at = entry.get('expires_at')
+            if isinstance(expires_at, str):
+                expires_at = datetime.fromisoformat(expires_at.replace('Z', '+00:00'))
+            running[entry.get('model') or entry.get('name')] = expires_at or datetime.max.replace(tzinfo=timezone.utc)
+        return running
+
+    def _load(self, host, connection, model, kind, keep_alive):
+        if self._state(host, model) != 'loaded':
+            self._set(host, model, 'loading')
+        started = time.perf_counter()
+        try:
+            # An empty prompt loads the model (or just resets its keep_alive) without generating.
+            if kind == 'embed':
+                connection.request('embeddings', model=model, prompt='', keep_alive=keep_alive)
+            else:
+                connection.request('generate', model=model, prompt='', keep_alive=keep_alive)
+        except Exception as e:
+            logger.warning(f"Loading {model} on {host} failed: {e}")
+            self._set(host, model, 'failed', error=str(e)[:200])
+            return
+        seconds = time.perf_counter() - started
+        if self._state(host, model) == 'loaded':
+            return  # Only its keep_alive was refreshed
+        self.load_seconds.observe(seconds, model=model)
+        self._set(host, model, 'loaded', load_seconds=round(seconds, 3), error=None)
+        logger.info(f"Loaded {model} on {host} in {seconds:.2f}s (keep_alive {keep_alive})")
+
+    def _state(self, host, model):
+        return self._states.get((host, model), {}).get('state')
+
+    def _set(self, host, model, state, **fields):
+        with self._lock:
+            entry = self._states.setdefault((host, model), {'host': host, 'model': model})
+            if entry.get('state') != state:
+                entry['since'] = datetime.utcnow().isoformat()
+            entry['state'] = state
+            entry.update(fields)
+
+    def ready(self):
+        """True when preloading is off or every model is loaded on at least one available host."""
+        if not self.enabled:
+            return True
+        available = {host for host, _, up in self._hosts() if up}
+        return all(
+            any(self._state(host, model) == 'loaded' for host in available)
+            for model, _ in self.models
+        )
+
+    def stats(self):
+        with self._lock:
+            return [dict(entry) for entry in self._states.values()]
+
+
+model_manager = ModelManager()
@@ -0,0 +1,141 @@
+import time
+import logging
+import threading
+
+import httpx
+from ollama import Client, ResponseError
+from tenacity import Retrying, stop_after_attempt, wait_exponential, retry_if_exception
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """Raised without contacting Ollama while the host's circuit is open."""
+
+
+def is_transient(exc):
+    """True for failures worth retrying: connection problems, timeouts, 5xx and 429.
+
+    Permanent errors such as a missing model (404) or a bad request (400)
+    are raised straight away instead of burning the retry budget.
+    """
+    if isinstance(exc, CircuitOpenError):
+        return False
+    if isinstance(exc, (ConnectionError, httpx.TransportError)):
+        return True
+    if isinstance(exc, ResponseError):
+        return exc.status_code >= 500 or exc.status_code == 429
+    return False
+
+
+class CircuitBreaker:
+    """Opens after ``failure_threshold`` consecutive transient failures.
+
+    While open every call fails fast with :class:`CircuitOpenError`; after
+    ``reset_timeout`` seconds a single trial call is let through and its
+    outcome decides whether the circuit closes again.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.state = 'closed'
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == 'open':
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    raise CircuitOpenError("Ollama circuit is open; failing fast")
+                self.state = 'half_open'
+            elif self.state == 'half_open':
+                raise CircuitOpenError("Ollama circuit is half-open; trial call in progress")
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.state = 'closed'
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                if self.state != 'open':
+                    logger.warning(f"Opening Ollama circuit after {self.failures} failures")
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+
+class OllamaConnection:
+    """Keep-alive connection pool to one Ollama host with retries and a circuit breaker.
+
+    The underlying httpx client is created once and reused across
+    threads, with explicit connect/read timeouts so a hung model load can
+    not pin a worker indefinitely.
+    """
+
+    def __init__(self, host, connect_timeout=5.0, read_timeout=180.0, max_connections=10,
+                 max_attempts=3, failure_threshold=5, reset_timeout=30):
+        self.host = host
+        self.max_attempts = max_attempts
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=60
+        )
+        self.client = Client(host=host, timeout=httpx.Timeout(read_timeout, connect=connect_timeout), limits=limits)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+
+    def _retry_kwargs(self):
+        return dict(
+            stop=stop_after_attempt(self.max_attempts),
+            wait=wait_exponential(multiplier=0.5, min=0.5, max=4),
+            retry=retry_if_exception(is_transient),
+            reraise=True,
+            before_sleep=lambda retry_state: logger.warning(
+                f"Retrying Ollama at {self.host} "
+                f"(attempt {retry_state.attempt_number}/{self.max_attempts}): {retry_state.outcome.exception()}"
+            )
+        )
+
+    def _call(self, fn, *args, **kwargs):
+        self.breaker.before_call()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            if is_transient(e):
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()  # The host answered; it is up.
+            raise
+        self.breaker.record_success()
+        return result
+
+    def request(self, method, **kwargs):
+        """Call ``Client.<method>`` with the retry policy and circuit breaker."""
+        for attempt in Retrying(**self._retry_kwargs()):
+            with attempt:
+                return self._call(getattr(self.client, method), **kwargs)
+
+    def chat(self, **kwargs):
+        return self.request('chat', **kwargs)
+
+    def chat_stream(self, **kwargs):
+        """Yield streamed chat chunks.
+
+        Only opening the stream (up to the first chunk) is retried; once
+        tokens have been handed to the caller a failure is raised as-is.
+        """
+        def first_chunk():
+            stream = self.client.chat(stream=True, **kwargs)
+            return stream, next(stream, None)
+
+        for attempt in Retrying(**self._retry_kwargs()):
+            with attempt:
+                stream, chunk = self._call(first_chunk)
+        if chunk is None:
+            return
+        yield chunk
+        yield from stream
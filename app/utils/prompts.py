@@ -0,0 +1,124 @@
+"""Chat message assembly for Dr. Jhatka.
+
+Prompts are sent as a list of role-tagged messages ordered from most to
+least stable: the fixed instructions (identical for every patient), the
+patient's profile, the earlier turns of the conversation, and finally the
+new question. Ollama keeps the evaluated prompt in its KV cache while the
+model stays loaded, so every turn only needs to prefill whatever follows
+the longest prefix it shares with the previous request.
+"""
+
+PERSONALIZED_INSTRUCTIONS = """You are Dr. Jhatka, a professional medical assistant. The patient's profile and your earlier conversation with them are given in the messages that follow.
+Your goal is to make the user feel they are chatting with a real doctor who knows their background. Respond in a professional, empathetic, and conversational tone, as if you are chatting with the patient. Follow this exact response pattern:
+
+Hello [Username]! I’m Dr. Jhatka, and I’m here to assist you with your health concerns. I see that you are a [age]-year-old [gender]. Based on your medical history, I note that [medical_history]. Let me also recap our previous conversation: [summarize previous conversation, if any, in a concise sentence, e.g., "you mentioned having a cough last time"].
+
+I understand that [rephrase the user's query to show empathy, e.g., "you’re experiencing a cough, which must be quite uncomfortable" or "you’ve shared an image of a rash, which might be concerning for you"]. Let’s address this concern:
+
+- [Provide actionable advice tailored to the user’s age, gender, medical history, and previous conversation (and to the image, if one is attached). Consider local healthcare practices and resources in Bangladesh.]
+- [Additional advice, ensuring it’s relevant and practical.]
+- [More advice if needed, with references to local resources like Upazila Health Complexes or pharmacies in Bangladesh.]
+
+Please take care, [Username]. How are you feeling now, or do you have any other concerns I can help with?
+
+Additional instructions:
+- If an image is attached, verify that it aligns with the patient’s age and gender. If there are dissimilarities, ask for clarification before proceeding (e.g., "The image appears to show a child’s skin, but you are a 35-year-old male. Can you confirm if this image is of your skin?").
+- Tailor suggestions for Bangladesh, considering local healthcare practices and resources.
+- Do not hallucinate. If unsure, suggest consulting a local doctor.
+- Use a professional yet approachable tone, avoiding overly technical jargon.
+- Ensure the advice is safe and considers the user’s medical history (e.g., allergies)."""
+
+GENERAL_INSTRUCTIONS = """You are Dr. Jhatka, a professional medical assistant.
+Your goal is to make the user feel they are chatting with a real doctor. Respond in a professional, empathetic, and conversational tone, as if you are chatting with the patient. Follow this exact response pattern:
+
+Hello! I’m Dr. Jhatka, and I’m here to assist you with your health concerns. I don’t have your personal details, so my advice will be general.
+
+I understand that [rephrase the user's query to show empathy]. Let’s address this concern:
+
+- [Provide general actionable advice (based on the image, if one is attached), considering local healthcare practices in Bangladesh.]
+- [Additional advice, ensuring it’s practical.]
+- [More advice if needed, with references to local resources.]
+
+Please take care. How are you feeling now, or do you have any other concerns I can help with?
+
+Additional instructions:
+- Tailor suggestions for Bangladesh, considering local healthcare practices and resources.
+- Do not hallucinate. If unsure, suggest consulting a local doctor.
+- Use a professional yet approachable tone, avoiding overly technical jargon."""
+
+
+SUMMARY_INSTRUCTIONS = """You maintain a running summary of a conversation between a patient and Dr. Jhatka, a medical assistant.
+Merge the new messages into the existing summary. Keep symptoms, their timeline, medications, advice already given and open questions. Drop greetings and repetition.
+Write plain prose in the third person, at most {max_words} words. Reply with the summary only."""
+
+
+def profile_message(user_info):
+    lines = ["Patient profile:"]
+    if user_info.get('username'):
+        lines.append(f"- Username: {user_info['username']}")
+    if user_info.get('age'):
+        lines.append(f"- Age: {user_info['age']}")
+    if user_info.get('gender'):
+        lines.append(f"- Gender: {user_info['gender']}")
+    lines.append(f"- Medical history: {user_info.get('medical_history') or 'None recorded.'}")
+    return '\n'.join(lines)
+
+
+def history_messages(previous_conversation):
+    """Map stored conversation turns onto chat roles, oldest first."""
+    messages = []
+    for message in previous_conversation or []:
+        content = message['text'] or ""
+        if message.get('image_path'):
+            content = f"{content} (with image: {message['image_path']})".strip()
+        if not content:
+            continue
+        role = 'user' if message['sender'] == 'user' else 'assistant'
+        messages.append({'role': role, 'content': content})
+    return messages
+
+
+def build_messages(prompt, user_info=None, image_base64=None):
+    """Assemble the chat messages for one turn, stable prefix first."""
+    if user_info:
+        messages = [
+            {'role': 'system', 'content': PERSONALIZED_INSTRUCTIONS},
+            {'role': 'system', 'content': user_info.get('profile_message') or profile_message(user_info)},
+        ]
+        if user_info.get('summary'):
+            messages.append({
+                'role': 'system',
+                'content': f"Summary of the earlier conversation: {user_info['summary']}"
+            })
+        # ``history`` is the pre-rendered ``previous_conversation`` when the
+        # context came from the context cache; it is shared, so copy it.
+        history = list(user_info.get('history') or history_messages(user_info.get('previous_conversation')))
+        # The stored history may already end with this very question.
+        if history and history[-1] == {'role': 'user', 'content': prompt}:
+            history.pop()
+        messages.extend(history)
+    else:
+        messages = [{'role': 'system', 'content': GENERAL_INSTRUCTIONS}]
+
+    question = {'role': 'user', 'content': prompt or "Please analyze this image."}
+    if image_base64:
+        question['images'] = [image_base64]
+    messages.append(question)
+    return messages
+
+
+def summary_messages(summary, new_messages, max_words=200):
+    """Messages asking the model to fold ``new_messages`` into ``summary``."""
+    transcript = '\n'.join(
+        f"{'Patient' if m['role'] == 'user' else 'Doctor'}: {m['content']}"
+        for m in history_messages(new_messages)
+    )
+    return [
+        {'role': 'system', 'content': SUMMARY_INSTRUCTIONS.format(max_words=max_words)},
+        {'role': 'user', 'content': f"Existing summary:\n{summary or 'None yet.'}\n\nNew messages:\n{transcript}"}
+    ]
+
+
+def estimate_tokens(messages):
+    """Rough token count (about four characters per token) for logging."""
+    return sum(len(m['content']) for m in messages) // 4
@@ -0,0 +1,160 @@
+import re
+import math
+import time
+import logging
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Stands in for the patient's username inside cached replies so one answer
+# can be served to everyone in the same profile bucket.
+USERNAME_PLACEHOLDER = '\x00username\x00'
+
+
+def normalize_prompt(prompt):
+    prompt = re.sub(r'[^\w\s]', ' ', (prompt or '').lower())
+    return ' '.join(prompt.split())
+
+
+def _digest(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+
+
+def profile_bucket(user_info):
+    """Profile key: exact age, gender, history and context hashes.
+
+    Two patients only share cached answers when everything the prompt
+    personalizes on, apart from the username, matches. The age is not
+    banded because replies often state it.
+    """
+    if not user_info:
+        return 'anonymous'
+    previous = user_info.get('previous_conversation') or []
+    context = user_info.get('summary') or ''
+    context += '\n'.join(f"{m['sender']}:{m['text'] or ''}:{m['image_path'] or ''}" for m in previous)
+    return '|'.join([
+        str(user_info.get('age')),
+        (user_info.get('gender') or 'unknown').lower(),
+        _digest((user_info.get('medical_history') or '').strip().lower()),
+        _digest(context)
+    ])
+
+
+def cosine_similarity(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class ResponseCache:
+    """TTL + LRU cache of doctor replies to text-only questions.
+
+    Lookups try the exact normalized prompt first and, when an ``embed``
+    callable is given, fall back to the most similar cached prompt in the
+    same profile bucket whose cosine similarity clears ``similarity``.
+    """
+
+    def __init__(self, max_entries=512, ttl=86400, similarity=0.92, embed=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity = similarity
+        self._embed = lru_cache(maxsize=256)(embed) if embed else None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.lookups = metrics.counter(
+            'response_cache_lookups_total', 'Response cache lookups, by result (hit, semantic_hit or miss).', ('result',)
+        )
+
+    def _key(self, prompt, user_info):
+        return profile_bucket(user_info), normalize_prompt(prompt)
+
+    def _embedding(self, normalized):
+        if not self._embed or not normalized:
+            return None
+        try:
+            return tuple(self._embed(normalized))
+        except Exception as e:
+            logger.warning(f"Embedding lookup failed, using exact matching only: {e}")
+            return None
+
+    def get(self, prompt, user_info=None):
+        bucket, normalized = self._key(prompt, user_info)
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._entries.get((bucket, normalized))
+            if entry:
+                self._entries.move_to_end((bucket, normalized))
+                self.hits += 1
+                self.lookups.inc(result='hit')
+                return self._personalize(entry['response'], user_info)
+            candidates = [(key, entry) for key, entry in self._entries.items()
+                          if key[0] == bucket and entry['embedding']]
+
+        embedding = self._embedding(normalized) if candidates else None
+        if embedding:
+            best_key, best_score = None, self.similarity
+            for key, entry in candidates:
+                score = cosine_similarity(embedding, entry['embedding'])
+                if score >= best_score:
+                    best_key, best_score = key, score
+            if best_key:
+                with self._lock:
+                    entry = self._entries.get(best_key)
+                    if entry:
+                        self._entries.move_to_end(best_key)
+                        self.hits += 1
+                        self.semantic_hits += 1
+                        self.lookups.inc(result='semantic_hit')
+                        logger.info(f"Semantic cache hit (similarity {best_score:.3f})")
+                        return self._personalize(entry['response'], user_info)
+
+        with self._lock:
+            self.misses += 1
+        self.lookups.inc(result='miss')
+        return None
+
+    def put(self, prompt, user_info, response):
+        bucket, normalized = self._key(prompt, user_info)
+        username = (user_info or {}).get('username')
+        if username:
+            response = re.sub(rf'\b{re.escape(username)}\b', USERNAME_PLACEHOLDER, response)
+        entry = {
+            'response': response,
+            'embedding': self._embedding(normalized),
+            'expires': time.monotonic() + self.ttl
+        }
+        with self._lock:
+            self._entries[(bucket, normalized)] = entry
+            self._entries.move_to_end((bucket, normalized))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _expire(self, now):
+        expired = [key for key, entry in self._entries.items() if entry['expires'] <= now]
+        for key in expired:
+            del self._entries[key]
+
+    @staticmethod
+    def _personalize(response, user_info):
+        username = (user_info or {}).get('username') or 'there'
+        return response.replace(USERNAME_PLACEHOLDER, username)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'semantic_hits': self.semantic_hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
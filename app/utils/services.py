@@ -0,0 +1,163 @@
+"""Heavy process-wide services, built on first use.
+
+The LLM client (Ollama router, health checks, response cache) and the
+speech service (STT backend, pyttsx3 engine) used to be constructed when
+their modules were imported, so every gunicorn worker, every ``flask db``
+command and every script importing the app paid for them, and crashed
+without an audio driver. They are now registered here and built the
+first time anything touches them::
+
+    from app.utils.services import llm_service   # a proxy, nothing built yet
+    llm_service.process_text_only(...)           # builds it, once, thread-safely
+
+Warm-up is explicit: ``SERVICES_WARM_UP`` (e.g. ``llm,speech``) builds
+and warms the named services in a background thread when the app starts,
+and :meth:`ServiceRegistry.warm_up` can be called from a gunicorn
+``post_worker_init`` hook to do it before the worker takes requests.
+"""
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceRegistry:
+    """Named, lazily built singletons with optional warm-up hooks."""
+
+    def __init__(self):
+        self.config = None
+        self._factories = {}
+        self._warmers = {}
+        self._instances = {}
+        self._locks = {}
+        self._timings = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        # Services are built from this app's config; any built for an earlier app are dropped.
+        with self._lock:
+            self.config = app.config
+            self._instances.clear()
+        names = [n.strip() for n in app.config.get('SERVICES_WARM_UP', '').split(',') if n.strip()]
+        unknown = [n for n in names if n not in self._factories]
+        if unknown:
+            raise ValueError(f"Unknown SERVICES_WARM_UP entries {unknown} (expected {sorted(self._factories)})")
+        if names:
+            threading.Thread(target=self._warm_up_quietly, args=names, name='service-warm-up', daemon=True).start()
+        app.extensions['services'] = self
+
+    def register(self, name, factory, warm_up=None):
+        """Register ``factory(config)`` as the builder of ``name``.
+
+        ``config`` is the config of the app passed to :meth:`init_app`, or
+        the defaults in ``config.Config`` in processes without an app (TTS
+        workers, scripts).
+
+        ``warm_up(instance)``, if given, does whatever makes the first real
+        call fast (loading models, opening connections) and only runs from
+        :meth:`warm_up`.
+        """
+        with self._lock:
+            self._factories[name] = factory
+            self._locks[name] = threading.Lock()
+            if warm_up:
+                self._warmers[name] = warm_up
+
+    def get(self, name):
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        with self._locks[name]:
+            instance = self._instances.get(name)
+            if instance is None:
+                started = time.perf_counter()
+                instance = self._factories[name](self.config if self.config is not None else _default_config())
+                self._timings[name] = time.perf_counter() - started
+                self._instances[name] = instance
+                logger.info(f"Initialized service {name} in {self._timings[name]:.2f}s")
+        return instance
+
+    def is_loaded(self, name):
+        return name in self._instances
+
+    def proxy(self, name):
+        return LazyService(self, name)
+
+    def warm_up(self, *names):
+        """Build and warm ``names`` (all registered services by default) now."""
+        for name in names or list(self._factories):
+            instance = self.get(name)
+            warmer = self._warmers.get(name)
+            if warmer:
+                started = time.perf_counter()
+                warmer(instance)
+                logger.info(f"Warmed up service {name} in {time.perf_counter() - started:.2f}s")
+
+    def _warm_up_quietly(self, *names):
+        for name in names:
+            try:
+                self.warm_up(name)
+            except Exception as e:
+                # The service is built again on first use, where the error surfaces to the caller.
+                logger.error(f"Warm-up of service {name} failed: {e}")
+
+    def stats(self):
+        return {
+            name: {'loaded': name in self._instances, 'init_seconds': round(self._timings.get(name, 0), 3)}
+            for name in self._factories
+        }
+
+
+class LazyService:
+    """Stand-in for a registered service; attribute access builds and forwards to it."""
+
+    __slots__ = ('_registry', '_name')
+
+    def __init__(self, registry, name):
+        object.__setattr__(self, '_registry', registry)
+        object.__setattr__(self, '_name', name)
+
+    def __getattr__(self, attr):
+        return getattr(self._registry.get(self._name), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._registry.get(self._name), attr, value)
+
+    def __repr__(self):
+        state = 'loaded' if self._registry.is_loaded(self._name) else 'not loaded'
+        return f"<LazyService {self._name} ({state})>"
+
+
+def _default_config():
+    from config import Config
+    return {key: getattr(Config, key) for key in dir(Config) if key.isupper()}
+
+
+def _build_llm(config):
+    from app.utils.llm_local import build_llm_service
+    return build_llm_service(config)
+
+
+def _warm_llm(llm):
+    from app.utils.model_manager import model_manager
+    model_manager.preload()
+
+
+def _build_speech(config):
+    from app.utils.speech import SpeechService
+    from app.utils.stt import build_stt_backend
+    return SpeechService(stt=build_stt_backend(config))
+
+
+def _warm_speech(speech):
+    # Only STT runs in the web process; TTS workers build their own engine.
+    speech.stt.warm_up()
+
+
+services = ServiceRegistry()
+services.register('llm', _build_llm, warm_up=_warm_llm)
+services.register('speech', _build_speech, warm_up=_warm_speech)
+
+llm_service = services.proxy('llm')
+speech_service = services.proxy('speech')
@@ -1,17 +1,37 @@
 import os
 import logging
+import threading
 import speech_recognition as sr
-import pyttsx3
-from pydub import AudioSegment
+
+from app.utils import vad
+from app.utils.metrics import stage
+from app.utils.audio_decode import SAMPLE_RATE, StreamDecoder, decode_audio, AudioDecodeError
 
 logger = logging.getLogger(__name__)
 
 class SpeechService:
-    def __init__(self):
-        self.recognizer = sr.Recognizer()
-        self.tts_engine = pyttsx3.init()
-        self.tts_engine.setProperty('rate', 150)  # Speed of speech
-        self.tts_engine.setProperty('volume', 0.9)  # Volume (0.0 to 1.0)
+    stream_keep_frames = 3000 // vad.FRAME_MS  # Silence kept while streaming, for the VAD threshold
+
+    def __init__(self, stt, segment_min_seconds=15):
+        self.stt = stt
+        # Recordings longer than this are split on silences and the pieces transcribed together.
+        self.segment_min_seconds = segment_min_seconds
+        self._tts_engine = None
+        self._tts_lock = threading.Lock()
+
+    @property
+    def tts_engine(self):
+        # Loaded on first use: only TTS workers synthesize, and pyttsx3.init()
+        # loads the platform speech driver (and fails if there is none).
+        if self._tts_engine is None:
+            with self._tts_lock:
+                if self._tts_engine is None:
+                    import pyttsx3
+                    engine = pyttsx3.init()
+                    engine.setProperty('rate', 150)  # Speed of speech
+                    engine.setProperty('volume', 0.9)  # Volume (0.0 to 1.0)
+                    self._tts_engine = engine
+        return self._tts_engine
     
     def speech_to_text(self, audio_file_path, language="en-US"):
         try:
@@ -23,45 +43,88 @@ class SpeechService:
                 logger.error(f"Audio file is too small or empty: {audio_file_path}")
                 return "Audio file is too small or empty. Please record a longer message."
 
-            # Convert to WAV if necessary
-            if audio_file_path.endswith(('.mp3', '.webm')):
-                try:
-                    if audio_file_path.endswith('.mp3'):
-                        sound = AudioSegment.from_mp3(audio_file_path)
-                    elif audio_file_path.endswith('.webm'):
-                        sound = AudioSegment.from_file(audio_file_path, format="webm")
-                    wav_path = audio_file_path.rsplit('.', 1)[0] + '.wav'
-                    sound.export(wav_path, format="wav")
-                    audio_file_path = wav_path
-                except Exception as e:
-                    logger.error(f"Error converting audio file to WAV: {e}")
-                    return f"Failed to process audio file: {str(e)}"
+            # Decode straight to 16 kHz mono PCM in memory; no .wav twin is written.
+            try:
+                with stage('audio_decode'):
+                    audio = decode_audio(audio_file_path)
+            except AudioDecodeError as e:
+                logger.error(f"Error decoding audio file {audio_file_path}: {e}")
+                return f"Failed to process audio file: {str(e)}"
 
-            # Use speech_recognition to transcribe
-            with sr.AudioFile(audio_file_path) as source:
-                audio = self.recognizer.record(source)
-                transcription = self.recognizer.recognize_google(audio, language=language)
+            with stage('stt'):
+                transcription = self.transcribe_audio(audio, language=language)
 
-            logger.info(f"Transcribed text: {transcription} (language: {language})")
-            if audio_file_path.endswith('.wav') and 'temp' in audio_file_path:
-                os.remove(audio_file_path)
+            logger.info(f"Transcribed {len(transcription or '')} characters (language: {language}, backend: {self.stt.name})")
+            logger.debug(f"Transcribed text: {transcription}")
             return transcription if transcription else "Speech transcription failed."
         except Exception as e:
             logger.error(f"Error in speech-to-text: {e}")
             return f"Speech transcription failed: {str(e)}"
     
+    def transcribe_audio(self, audio, language="en-US"):
+        pcm = audio.get_raw_data(convert_rate=SAMPLE_RATE, convert_width=2)
+        if len(pcm) < self.segment_min_seconds * SAMPLE_RATE * 2:
+            return self.stt.transcribe(audio, language=language)
+        segments = vad.split(pcm, SAMPLE_RATE)
+        if len(segments) <= 1:
+            return self.stt.transcribe(audio, language=language)
+        logger.info(f"Transcribing {len(segments)} speech segments in parallel")
+        texts = self.stt.transcribe_batch(
+            [sr.AudioData(pcm[seg.start:seg.end], SAMPLE_RATE, 2) for seg in segments], language
+        )
+        return ' '.join(text for text in texts if text)
+
+    def transcribe_stream(self, audio_file_path, state, language="en-US", final=False):
+        """Transcribe a recording that is still being uploaded.
+
+        ``state`` is kept per recording between calls. It holds the
+        recording's :class:`StreamDecoder`, which is only fed the bytes
+        appended since the last call, the decoded PCM that is not
+        transcribed yet with its frame energies, ``offset`` (PCM bytes
+        already dealt with) and the ``texts`` so far. Only speech segments
+        followed by silence are transcribed until ``final``, so each is
+        transcribed once. Returns the transcript so far.
+        """
+        if 'decoder' not in state:
+            state.update(decoder=StreamDecoder(), pcm=bytearray(), energies=[])
+        with stage('audio_decode'):
+            state['decoder'].feed(audio_file_path)
+            state['pcm'] += state['decoder'].finish() if final else state['decoder'].take()
+
+        # Only frames completed by the new audio are analysed.
+        frame_bytes = vad.frame_samples(SAMPLE_RATE) * 2
+        energies = state['energies']
+        energies += vad.frame_energies(bytes(state['pcm'][len(energies) * frame_bytes:]), SAMPLE_RATE)[0]
+        tail = bytes(state['pcm'])
+        segments = vad.split(tail, SAMPLE_RATE, energies=energies)
+        ready = segments if final else [seg for seg in segments if seg.closed]
+        done = 0
+        if ready:
+            with stage('stt'):
+                texts = self.stt.transcribe_batch(
+                    [sr.AudioData(tail[seg.start:seg.end], SAMPLE_RATE, 2) for seg in ready], language
+                )
+            state['texts'].extend(text for text in texts if text)
+            done = ready[-1].end
+        elif not segments:
+            # Nothing but silence yet: keep a few seconds for the threshold and the next word's onset.
+            done = max(0, len(energies) - self.stream_keep_frames) * frame_bytes
+        done -= done % frame_bytes
+        del state['pcm'][:done]
+        del energies[:done // frame_bytes]
+        state['offset'] += done
+        return ' '.join(state['texts'])
+
     def detect_language(self, audio_file_path, language_hint="en"):
         # Since we're only supporting English, always return "en"
         return "en"
     
     def text_to_speech(self, text, output_path, language="en"):
         try:
-            logger.info(f"Generating speech for text: {text} (language: {language})")
+            logger.info(f"Generating speech for {len(text)} characters (language: {language})")
             self.tts_engine.save_to_file(text, output_path)
             self.tts_engine.runAndWait()
             return output_path
         except Exception as e:
             logger.error(f"Error in text-to-speech: {e}")
-            return None
-
-speech_service = SpeechService()
\ No newline at end of file
+            return None
\ No newline at end of file
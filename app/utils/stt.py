@@ -0,0 +1,190 @@
+"""Speech-to-text backends.
+
+``SpeechService`` hands a ``speech_recognition.AudioData`` to whichever
+backend ``STT_BACKEND`` selects:
+
+* ``whisper`` (default when transformers is installed): a local Whisper
+  model run on CPU through the transformers ASR pipeline, loaded once per
+  process, optionally int8 dynamically quantized, with concurrent
+  requests micro-batched into a single forward pass.
+* ``google``: the free Google Web Speech API via ``recognize_google``.
+"""
+import queue
+import logging
+import threading
+import importlib.util
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import speech_recognition as sr
+
+from app.utils.audio_decode import SAMPLE_RATE
+
+logger = logging.getLogger(__name__)
+
+
+class STTBackend(ABC):
+    name = 'base'
+
+    @abstractmethod
+    def transcribe(self, audio, language="en-US"):
+        """Return the transcript of ``audio`` (an ``sr.AudioData``), or '' if none was heard."""
+
+    def transcribe_batch(self, audios, language="en-US"):
+        return [self.transcribe(audio, language) for audio in audios]
+
+    def warm_up(self):
+        """Load models ahead of the first request. A no-op for remote backends."""
+
+
+class GoogleSTT(STTBackend):
+    name = 'google'
+
+    def __init__(self):
+        self.recognizer = sr.Recognizer()
+
+    def transcribe(self, audio, language="en-US"):
+        try:
+            return self.recognizer.recognize_google(audio, language=language)
+        except sr.UnknownValueError:
+            return ''
+
+    def transcribe_batch(self, audios, language="en-US"):
+        # Network-bound, so segments are sent concurrently.
+        if len(audios) <= 1:
+            return [self.transcribe(audio, language) for audio in audios]
+        with ThreadPoolExecutor(max_workers=min(len(audios), 4)) as pool:
+            return list(pool.map(lambda audio: self.transcribe(audio, language), audios))
+
+
+class WhisperSTT(STTBackend):
+    """Local Whisper on CPU.
+
+    The pipeline is built on first use (or by :meth:`warm_up`) and shared
+    by every thread in the process. With ``batch_size > 1`` callers are
+    queued, segments of a batch included, and a single worker thread runs
+    whatever arrives within ``batch_window`` seconds as one batch.
+    """
+    name = 'whisper'
+
+    def __init__(self, model='openai/whisper-base.en', quantize=True, threads=0,
+                 batch_size=4, batch_window=0.02):
+        self.model = model
+        self.quantize = quantize
+        self.threads = threads
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self._pipe = None
+        self._load_lock = threading.Lock()
+        self._queue = None
+        self._batch_lock = threading.Lock()
+
+    @property
+    def pipe(self):
+        if self._pipe is None:
+            with self._load_lock:
+                if self._pipe is None:
+                    self._pipe = self._load()
+        return self._pipe
+
+    def _load(self):
+        import torch
+        from transformers import pipeline
+
+        if self.threads:
+            torch.set_num_threads(self.threads)
+        pipe = pipeline('automatic-speech-recognition', model=self.model, device='cpu', torch_dtype=torch.float32)
+        if self.quantize:
+            # int8 weights for the Linear layers, which dominate Whisper's CPU time.
+            pipe.model = torch.quantization.quantize_dynamic(pipe.model, {torch.nn.Linear}, dtype=torch.qint8)
+        pipe.model.eval()
+        logger.info(f"Loaded Whisper model {self.model} (quantized: {self.quantize})")
+        return pipe
+
+    def warm_up(self):
+        import numpy as np
+        self._run([np.zeros(SAMPLE_RATE, dtype=np.float32)], "en-US")
+
+    @staticmethod
+    def _to_array(audio):
+        import numpy as np
+        raw = audio.get_raw_data(convert_rate=SAMPLE_RATE, convert_width=2)
+        return np.frombuffer(raw, dtype=np.int16).astype(np.float32) / 32768.0
+
+    def _generate_kwargs(self, language):
+        if self.model.endswith('.en'):
+            return {}
+        return {'language': language.split('-')[0], 'task': 'transcribe'}
+
+    def _run(self, arrays, language):
+        import torch
+        inputs = [{'raw': array, 'sampling_rate': SAMPLE_RATE} for array in arrays]
+        with torch.inference_mode():
+            results = self.pipe(inputs, batch_size=len(inputs), generate_kwargs=self._generate_kwargs(language))
+        return [r['text'].strip() for r in results]
+
+    def transcribe(self, audio, language="en-US"):
+        array = self._to_array(audio)
+        if self.batch_size <= 1:
+            return self._run([array], language)[0]
+        return self._submit(array, language).result()
+
+    def transcribe_batch(self, audios, language="en-US"):
+        arrays = [self._to_array(audio) for audio in audios]
+        if self.batch_size <= 1:
+            return [self._run([array], language)[0] for array in arrays]
+        # Queued like single requests, so the pipeline only ever runs on the batcher thread.
+        futures = [self._submit(array, language) for array in arrays]
+        return [future.result() for future in futures]
+
+    def _submit(self, array, language):
+        future = Future()
+        self._ensure_batcher()
+        self._queue.put((array, language, future))
+        return future
+
+    def _ensure_batcher(self):
+        with self._batch_lock:
+            if self._queue is None:
+                self._queue = queue.Queue()
+                threading.Thread(target=self._batch_loop, name='whisper-batcher', daemon=True).start()
+
+    def _batch_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=self.batch_window))
+                except queue.Empty:
+                    break
+            # Whisper decodes one language per call; group requests by it.
+            by_language = {}
+            for item in batch:
+                by_language.setdefault(item[1], []).append(item)
+            for language, items in by_language.items():
+                try:
+                    texts = self._run([item[0] for item in items], language)
+                except Exception as e:
+                    for item in items:
+                        item[2].set_exception(e)
+                    continue
+                for item, text in zip(items, texts):
+                    item[2].set_result(text)
+
+
+def build_stt_backend(config):
+    """Create the backend named by ``STT_BACKEND`` in the app ``config``."""
+    name = (config['STT_BACKEND'] or '').lower()
+    if not name:
+        name = 'whisper' if importlib.util.find_spec('transformers') else 'google'
+    if name == 'google':
+        return GoogleSTT()
+    if name == 'whisper':
+        return WhisperSTT(
+            model=config['STT_MODEL'],
+            quantize=config['STT_QUANTIZE'],
+            threads=config['STT_THREADS'],
+            batch_size=config['STT_BATCH_SIZE'],
+            batch_window=config['STT_BATCH_WINDOW_MS'] / 1000
+        )
+    raise ValueError(f"Unknown STT_BACKEND '{name}' (expected 'whisper' or 'google')")
@@ -0,0 +1,98 @@
+import logging
+import threading
+
+from app.utils.jobs import job_queue, QueueFullError
+
+logger = logging.getLogger(__name__)
+
+
+class ConversationSummarizer:
+    """Keeps a running summary per conversation so prompts stay bounded.
+
+    The LLM sees ``Conversation.summary`` plus the messages after
+    ``summarized_until``. Once more than ``recent_messages + batch``
+    messages are waiting, the oldest are folded into the summary by a
+    background job, leaving the latest ``recent_messages`` verbatim.
+    Folding in batches rather than every turn keeps the history prefix
+    unchanged between folds, so Ollama's prompt cache still applies.
+    """
+
+    def __init__(self, app=None):
+        self.recent_messages = 6
+        self.batch = 4
+        self.max_words = 200
+        self._pending = set()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.recent_messages = app.config.get('SUMMARY_RECENT_MESSAGES', self.recent_messages)
+        self.batch = app.config.get('SUMMARY_BATCH', self.batch)
+        self.max_words = app.config.get('SUMMARY_MAX_WORDS', self.max_words)
+        app.extensions['summarizer'] = self
+
+    @property
+    def window(self):
+        """Most unsummarized messages ever sent to the LLM verbatim."""
+        return self.recent_messages + self.batch
+
+    def schedule(self, conversation_id):
+        """Queue a summary update; a full queue just defers it to the next reply."""
+        with self._lock:
+            if conversation_id in self._pending:
+                return
+            self._pending.add(conversation_id)
+        try:
+            job_queue.submit(self.summarize, conversation_id)
+        except QueueFullError:
+            with self._lock:
+                self._pending.discard(conversation_id)
+            logger.info(f"Job queue full, deferring summary of conversation {conversation_id}")
+
+    def summarize(self, conversation_id):
+        try:
+            self._summarize(conversation_id)
+        finally:
+            with self._lock:
+                self._pending.discard(conversation_id)
+
+    def _summarize(self, conversation_id):
+        from app import db
+        from app.models import Conversation, Message
+        from app.utils.services import llm_service
+
+        conversation = Conversation.query.get(conversation_id)
+        if not conversation:
+            return
+        query = Message.query.filter(Message.conversation_id == conversation_id)
+        if conversation.summarized_until:
+            query = query.filter(Message.id > conversation.summarized_until)
+        unsummarized = query.order_by(Message.id.asc()).all()
+        if len(unsummarized) <= self.window:
+            return
+
+        fold = unsummarized[:-self.recent_messages]
+        try:
+            summary = llm_service.summarize(conversation.summary, [{
+                'sender': m.sender,
+                'text': m.text_content,
+                'image_path': m.image_path
+            } for m in fold], self.max_words)
+        except Exception as e:
+            logger.warning(f"Summarizing conversation {conversation_id} failed, keeping the old summary: {e}")
+            return
+        if not summary:
+            return
+
+        conversation.summary = summary
+        conversation.summarized_until = fold[-1].id
+        try:
+            db.session.commit()
+            logger.info(f"Folded {len(fold)} messages into the summary of conversation {conversation_id}")
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Failed to save summary of conversation {conversation_id}: {e}")
+
+
+summarizer = ConversationSummarizer()
@@ -0,0 +1,159 @@
+import os
+import re
+import logging
+import hashlib
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+|\n+')
+
+# TTS_AUDIO_FORMAT -> (file extension, extra pydub export arguments)
+AUDIO_FORMATS = {
+    'mp3': ('mp3', {}),
+    'opus': ('ogg', {'codec': 'libopus'}),
+}
+
+
+def split_sentences(text):
+    return [s.strip() for s in _SENTENCE_END.split(text) if s.strip()]
+
+
+class TTSCache:
+    """Content-addressed store of synthesized speech with LRU eviction.
+
+    Files are named after a hash of ``(text, voice, rate, language)`` so
+    the same reply, or the same sentence, is only ever synthesized once.
+    Recency is tracked through file mtimes, which keeps the cache usable
+    from every TTS worker process without shared state.
+    """
+
+    extension = '.wav'  # pyttsx3 writes WAV on both the eSpeak and SAPI drivers
+
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(text, voice, rate, language):
+        raw = '\x1f'.join([text.strip(), str(voice), str(rate), language])
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + self.extension)
+
+    def get(self, key):
+        """Return the cached file for ``key`` and mark it recently used."""
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def temp_path(self, extension=None):
+        fd, path = tempfile.mkstemp(suffix=extension or self.extension, dir=self.directory, prefix='.tmp_')
+        os.close(fd)
+        return path
+
+    def put(self, key, temp_path):
+        """Move a finished temp file into place and enforce the size bound."""
+        path = self.path(key)
+        os.replace(temp_path, path)  # Atomic, so readers never see a partial file
+        self.evict()
+        return path
+
+    def compressed(self, path, audio_format, bitrate):
+        """Return a compressed copy of the cached WAV at ``path``, transcoding it if missing.
+
+        The copy sits next to the WAV under the same key, so replies and
+        sentences keep being joined from WAV while clients download the
+        much smaller file. Needs ffmpeg (through pydub).
+        """
+        extension, options = AUDIO_FORMATS[audio_format]
+        target = os.path.splitext(path)[0] + '.' + extension
+        try:
+            os.utime(target)
+            return target
+        except FileNotFoundError:
+            pass
+
+        from pydub import AudioSegment
+
+        temp_path = self.temp_path('.' + extension)
+        try:
+            speech = AudioSegment.from_file(path, format='wav').set_channels(1)
+            speech.export(temp_path, format=extension, bitrate=bitrate, **options)
+        except Exception:
+            os.remove(temp_path)
+            raise
+        logger.info(f"Transcoded {os.path.basename(path)} to {audio_format} at {bitrate}: "
+                    f"{os.path.getsize(path)} -> {os.path.getsize(temp_path)} bytes")
+        os.replace(temp_path, target)
+        self.evict()
+        return target
+
+    def evict(self):
+        entries = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if not entry.is_file() or entry.name.startswith('.tmp_'):
+                continue
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+        if total <= self.max_bytes:
+            return 0
+
+        freed = 0
+        for _, size, path in sorted(entries):
+            try:
+                os.remove(path)
+            except FileNotFoundError:  # Another worker got there first
+                continue
+            freed += size
+            if total - freed <= self.max_bytes:
+                break
+        logger.info(f"Evicted {freed} bytes from TTS cache")
+        return freed
+
+
+def synthesize_cached(cache, text, voice, rate, language, synthesize):
+    """Return a cached audio file for ``text``, synthesizing only what is missing.
+
+    ``synthesize(text, path)`` renders one piece of text to ``path``. A
+    whole-reply hit is served directly; otherwise each sentence is looked
+    up on its own and only new sentences are rendered before the pieces
+    are joined with pydub.
+    """
+    key = cache.key(text, voice, rate, language)
+    hit = cache.get(key)
+    if hit:
+        logger.info(f"TTS cache hit for reply {key[:12]}")
+        return hit
+
+    sentences = split_sentences(text)
+    if len(sentences) <= 1:
+        temp_path = cache.temp_path()
+        synthesize(text, temp_path)
+        return cache.put(key, temp_path)
+
+    from pydub import AudioSegment
+
+    combined = AudioSegment.empty()
+    misses = 0
+    for sentence in sentences:
+        sentence_key = cache.key(sentence, voice, rate, language)
+        path = cache.get(sentence_key)
+        if not path:
+            misses += 1
+            temp_path = cache.temp_path()
+            synthesize(sentence, temp_path)
+            path = cache.put(sentence_key, temp_path)
+        combined += AudioSegment.from_file(path, format='wav')
+    logger.info(f"TTS cache: synthesized {misses} of {len(sentences)} sentences")
+
+    temp_path = cache.temp_path()
+    combined.export(temp_path, format='wav')
+    return cache.put(key, temp_path)
@@ -0,0 +1,155 @@
+import os
+import time
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from app.utils.metrics import metrics
+from app.utils.tts_cache import AUDIO_FORMATS, TTSCache, synthesize_cached
+
+logger = logging.getLogger(__name__)
+
+
+def available_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # Not available on Windows/macOS
+        return os.cpu_count() or 1
+
+
+_cache = None
+_audio = ('wav', None)
+
+
+def _init_worker(cache_dir, cache_max_bytes, audio_format='wav', bitrate=None):
+    global _cache, _audio
+    # Each worker loads its own pyttsx3 engine up front instead of on its
+    # first reply, and never shares it with another process.
+    from app.utils.services import speech_service
+    speech_service.tts_engine
+    _cache = TTSCache(cache_dir, cache_max_bytes)
+    _audio = (audio_format, bitrate)
+
+
+def _synthesize(text, language="en"):
+    from app.utils.services import speech_service
+
+    def render(piece, output_path):
+        if not speech_service.text_to_speech(piece, output_path, language=language):
+            raise RuntimeError(f"Speech synthesis failed for {output_path}")
+
+    engine = speech_service.tts_engine
+    path = synthesize_cached(
+        _cache, text, engine.getProperty('voice'), engine.getProperty('rate'), language, render
+    )
+    audio_format, bitrate = _audio
+    if audio_format != 'wav':
+        try:
+            path = _cache.compressed(path, audio_format, bitrate)
+        except Exception as e:
+            # Still playable, just larger; most likely ffmpeg is missing.
+            logger.warning(f"Could not transcode speech to {audio_format}, serving WAV: {e}")
+    return os.path.basename(path)
+
+
+class TTSPool:
+    """Runs text-to-speech in worker processes, off the request path.
+
+    Submitting returns immediately; when synthesis finishes the doctor
+    message's ``audio_path``/``audio_status`` columns are updated so the
+    client can pick the audio up via ``/chat/messages/<id>/audio``. Audio
+    is written to a shared :class:`TTSCache` under ``UPLOAD_FOLDER/tts``
+    and, unless ``TTS_AUDIO_FORMAT`` is ``wav``, transcoded there to a
+    compact ``TTS_AUDIO_BITRATE`` MP3 or Opus file before it is published.
+    The cache is bounded, so a reply's file can be evicted later; the
+    audio route then submits it again, which recreates it under the same
+    name since cache keys hash the text.
+    """
+
+    public_prefix = '/static/uploads/tts/'
+
+    def __init__(self, app=None):
+        self.app = None
+        self.max_workers = available_cores()
+        self.cache_dir = None
+        self.cache_max_bytes = None
+        self.audio_format = 'mp3'
+        self.bitrate = '32k'
+        self._executor = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.max_workers = app.config.get('TTS_WORKERS') or available_cores()
+        self.cache_dir = os.path.join(app.config['UPLOAD_FOLDER'], 'tts')
+        self.cache_max_bytes = app.config.get('TTS_CACHE_MAX_BYTES', 256 * 1024 * 1024)
+        self.audio_format = app.config.get('TTS_AUDIO_FORMAT', self.audio_format).lower()
+        self.bitrate = app.config.get('TTS_AUDIO_BITRATE', self.bitrate)
+        if self.audio_format != 'wav' and self.audio_format not in AUDIO_FORMATS:
+            raise ValueError(f"Unknown TTS_AUDIO_FORMAT '{self.audio_format}' (expected 'mp3', 'opus' or 'wav')")
+        app.extensions['tts_pool'] = self
+
+    def is_missing(self, audio_path):
+        """Whether ``audio_path`` is a synthesized reply the cache has since evicted."""
+        if not audio_path or not self.cache_dir or not audio_path.startswith(self.public_prefix):
+            return False
+        return not os.path.exists(os.path.join(self.cache_dir, audio_path[len(self.public_prefix):]))
+
+    def submit(self, message_id, text, language="en"):
+        submitted = time.perf_counter()
+        try:
+            future = self._get_executor().submit(_synthesize, text, language)
+        except BrokenProcessPool:
+            # A worker died (e.g. the audio driver crashed); start a fresh pool.
+            logger.warning("TTS pool is broken, restarting it")
+            with self._lock:
+                self._executor = None
+            future = self._get_executor().submit(_synthesize, text, language)
+        future.add_done_callback(lambda f: self._on_done(message_id, f, submitted))
+        return future
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # 'spawn' keeps the audio driver and DB connections of the
+                # (possibly threaded) parent out of the workers.
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                    initargs=(self.cache_dir, self.cache_max_bytes, self.audio_format, self.bitrate)
+                )
+                logger.info(f"Started TTS pool with {self.max_workers} processes")
+            return self._executor
+
+    def _on_done(self, message_id, future, submitted):
+        from app import db
+        from app.models import Message
+
+        # Synthesis runs in another process, so it is timed from here, queueing included.
+        metrics.observe_stage('tts', time.perf_counter() - submitted)
+        error = future.exception()
+        if error:
+            logger.warning(f"Speech generation failed for message {message_id}: {error}")
+
+        with self.app.app_context():
+            message = Message.query.get(message_id)
+            if not message:
+                return
+            if error:
+                message.audio_status = 'failed'
+            else:
+                message.audio_path = self.public_prefix + future.result()
+                message.audio_status = 'ready'
+            try:
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Failed to record audio for message {message_id}: {e}")
+
+
+tts_pool = TTSPool()
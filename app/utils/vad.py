@@ -0,0 +1,82 @@
+"""Energy-based voice activity detection over 16-bit mono PCM."""
+from collections import namedtuple
+
+import numpy as np
+
+FRAME_MS = 30
+
+# Byte offsets into the PCM buffer. ``closed`` segments are followed by
+# enough silence that more audio can not extend them.
+Segment = namedtuple('Segment', 'start end closed')
+
+
+def frame_samples(sample_rate, frame_ms=FRAME_MS):
+    return max(1, sample_rate * frame_ms // 1000)
+
+
+def frame_energies(pcm, sample_rate, frame_ms=FRAME_MS):
+    """Return the RMS energy of each whole frame of ``pcm`` and the frame size in samples."""
+    size = frame_samples(sample_rate, frame_ms)
+    samples = np.frombuffer(pcm, dtype='<i2', count=len(pcm) // 2)
+    frames = samples[:len(samples) // size * size].reshape(-1, size).astype(np.float64)
+    return np.sqrt(np.square(frames).mean(axis=1)).tolist(), size
+
+
+def split(pcm, sample_rate=16000, frame_ms=FRAME_MS, min_silence_ms=600, min_speech_ms=250,
+          max_segment_s=25, pad_ms=150, min_threshold=300.0, energies=None):
+    """Split ``pcm`` into speech segments separated by silence.
+
+    The speech threshold adapts to the recording: three times its quiet
+    (20th percentile) frame energy, capped at half its loud (90th
+    percentile) energy for recordings with little silence, and never
+    below ``min_threshold``.
+    Segments longer than ``max_segment_s`` are cut at their quietest
+    frame so each one fits comfortably in a single STT call. Callers that
+    analyse a growing buffer can pass the ``energies`` of its frames kept
+    from earlier calls instead of having them recomputed.
+    """
+    if energies is None:
+        energies, size = frame_energies(pcm, sample_rate, frame_ms)
+    else:
+        size = frame_samples(sample_rate, frame_ms)
+    if not energies:
+        return []
+    ordered = sorted(energies)
+    floor, peak = ordered[len(ordered) // 5], ordered[len(ordered) * 9 // 10]
+    threshold = max(min(floor * 3, peak / 2), min_threshold)
+
+    min_silence = max(1, min_silence_ms // frame_ms)
+    min_speech = max(1, min_speech_ms // frame_ms)
+    max_frames = max(1, int(max_segment_s * 1000 // frame_ms))
+
+    spans, start, silence = [], None, 0
+    for i, energy in enumerate(energies):
+        if energy >= threshold:
+            if start is None:
+                start = i
+            silence = 0
+        elif start is not None:
+            silence += 1
+            if silence >= min_silence:
+                spans.append((start, i - silence + 1, True))
+                start, silence = None, 0
+    if start is not None:
+        spans.append((start, len(energies) - silence, False))
+
+    frames = []
+    for first, last, closed in spans:
+        if last - first < min_speech:
+            continue
+        while last - first > max_frames:
+            window = energies[first + max_frames // 2:first + max_frames]
+            cut = first + max_frames // 2 + window.index(min(window))
+            frames.append((first, cut, True))
+            first = cut
+        frames.append((first, last, closed))
+
+    pad = pad_ms // frame_ms
+    frame_bytes = size * 2
+    return [
+        Segment(max(0, (first - pad) * frame_bytes), min(len(pcm), (last + pad) * frame_bytes), closed)
+        for first, last, closed in frames
+    ]
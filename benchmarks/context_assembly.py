@@ -0,0 +1,85 @@
+"""CPU time and queries spent assembling a turn's prompt context.
+
+Times ``get_user_info`` plus ``prompts.build_messages`` for a seeded
+conversation with the context cache disabled (every turn rebuilds the
+profile and re-queries the history) and enabled (turns after the first
+reuse the cached context)::
+
+    python -m benchmarks.context_assembly --turns 500
+"""
+import os
+import time
+import argparse
+import tempfile
+import statistics
+
+from sqlalchemy import event
+
+from app import db
+from app.models import Conversation, Message
+from app.routes.chat import get_user_info
+from app.utils import prompts
+from app.utils.context_cache import context_cache
+from benchmarks.turn_queries import make_app
+
+HISTORY = [
+    "I have had a dry cough for three days.",
+    "Dr. Jhatka: Hello! Please drink warm fluids and rest. Do you have a fever?",
+    "It gets worse at night. Should I use my inhaler?",
+    "Dr. Jhatka: Yes, use your reliever inhaler as prescribed and keep your bedroom air moist.",
+    "I also have a low fever now, around 100 F.",
+    "Dr. Jhatka: Paracetamol is safe with your asthma medicines. Visit the Upazila Health Complex if it lasts.",
+]
+
+
+def seed():
+    from app.models import User
+    user = User.query.first()
+    user.medical_history = "Mild asthma since childhood. Allergic to penicillin. Uses a salbutamol inhaler."
+    conversation = Conversation(user_id=user.id)
+    db.session.add(conversation)
+    for i, text in enumerate(HISTORY):
+        db.session.add(Message(conversation=conversation, sender='user' if i % 2 == 0 else 'doctor', text_content=text))
+    db.session.commit()
+    return user, conversation
+
+
+def measure(user, conversation, turns):
+    statements = [0]
+
+    def count(*args):
+        statements[0] += 1
+
+    event.listen(db.engine, 'before_cursor_execute', count)
+    samples = []
+    try:
+        for _ in range(turns):
+            started = time.thread_time()
+            user_info = get_user_info(conversation, user=user)
+            prompts.build_messages("What should I eat while I recover?", user_info)
+            samples.append((time.thread_time() - started) * 1e6)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+    return samples, statements[0] / turns
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--turns', type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = make_app(os.path.join(tmp, 'context.db'))
+        with app.app_context():
+            user, conversation = seed()
+            print(f"{'context cache':<14} {'p50 us':>8} {'p95 us':>8} {'queries':>8}")
+            for label, entries in (('disabled', 0), ('enabled', 1024)):
+                context_cache.max_entries = entries
+                samples, queries = measure(user, conversation, args.turns)
+                samples.sort()
+                print(f"{label:<14} {statistics.median(samples):>8.0f} "
+                      f"{samples[int(len(samples) * 0.95)]:>8.0f} {queries:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+"""Concurrent chat-turn write throughput for each database engine profile.
+
+Each worker thread repeatedly performs a chat turn against a file-backed
+database: read the user's latest conversation, insert a user and a doctor
+message, bump ``last_updated`` and commit. Profiles:
+
+* ``legacy``: the old configuration, one StaticPool connection shared by
+  every thread, default rollback journal.
+* ``pooled``: a connection per thread from a queue pool, rollback journal.
+* ``tuned``: ``pooled`` plus the ``SQLITE_PRAGMAS`` from config (WAL,
+  ``synchronous=normal``, busy timeout, page cache).
+* ``server``: the server-database profile for ``--database-url``.
+
+Each profile runs in its own process, because sharing one SQLite
+connection across threads can crash the interpreter outright.
+
+::
+
+    python -m benchmarks.db_write_load --threads 8 --turns 200
+    python -m benchmarks.db_write_load --profiles server --database-url postgresql://...
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import tempfile
+import threading
+from datetime import datetime
+
+from flask import Flask
+from sqlalchemy import event
+from sqlalchemy.pool import StaticPool
+
+from app import db
+from app.models import User, Conversation, Message
+from app.utils.db_engine import sqlite_pragma_listener
+from config import Config, engine_options
+
+
+def make_app(profile, uri, pool_size):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = uri
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    if profile == 'legacy':
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            "connect_args": {"check_same_thread": False},
+            "poolclass": StaticPool
+        }
+    else:
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(uri, pool_size=pool_size, max_overflow=0)
+    db.init_app(app)
+    if profile == 'tuned':
+        with app.app_context():
+            event.listen(db.engine, 'connect', sqlite_pragma_listener(Config.SQLITE_PRAGMAS))
+    return app
+
+
+def setup(app, users):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        for u in range(1, users + 1):
+            user = User(id=u, username=f"load{u}", email=f"load{u}@example.com")
+            db.session.add(user)
+            db.session.add(Conversation(user_id=u))
+        db.session.commit()
+
+
+def chat_turn(user_id, i):
+    conversation = (
+        Conversation.query.filter_by(user_id=user_id)
+        .order_by(Conversation.start_time.desc()).first()
+    )
+    db.session.add(Message(conversation_id=conversation.id, sender='user', text_content=f"question {i}"))
+    db.session.add(Message(conversation_id=conversation.id, sender='doctor', text_content=f"answer {i}"))
+    conversation.last_updated = datetime.utcnow()
+    db.session.commit()
+
+
+def run(app, threads, turns):
+    errors, done = [], [0]
+    lock = threading.Lock()
+
+    def worker(user_id):
+        with app.app_context():
+            for i in range(turns):
+                try:
+                    chat_turn(user_id, i)
+                    with lock:
+                        done[0] += 1
+                except Exception as e:
+                    db.session.rollback()
+                    with lock:
+                        errors.append(type(e).__name__ + ': ' + str(e).splitlines()[0][:60])
+            db.session.remove()
+
+    workers = [threading.Thread(target=worker, args=(t + 1,)) for t in range(threads)]
+    started = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - started
+    with app.app_context():
+        stored = Message.query.count()
+        db.engine.dispose()
+    return done[0], errors, elapsed, stored
+
+
+def run_profile(profile, uri, threads, turns):
+    app = make_app(profile, uri, pool_size=threads)
+    setup(app, threads)
+    ok, errors, elapsed, stored = run(app, threads, turns)
+    print(json.dumps({'ok': ok, 'errors': errors, 'elapsed': elapsed, 'stored': stored}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--profiles', default='legacy,pooled,tuned')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--turns', type=int, default=200, help='per thread')
+    parser.add_argument('--database-url', help='server database for the server profile')
+    parser.add_argument('--run-profile', nargs=2, metavar=('PROFILE', 'URI'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_profile:
+        run_profile(*args.run_profile, args.threads, args.turns)
+        return
+
+    print(f"{args.threads} threads x {args.turns} turns")
+    print(f"{'profile':<8} {'turns/s':>8} {'ok':>6} {'errors':>7} {'rows':>6}  first error")
+    with tempfile.TemporaryDirectory() as tmp:
+        for profile in args.profiles.split(','):
+            if profile == 'server':
+                if not args.database_url:
+                    print(f"{profile:<8} skipped: pass --database-url")
+                    continue
+                uri = args.database_url
+            else:
+                uri = f"sqlite:///{os.path.join(tmp, profile + '.db')}"
+            proc = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.db_write_load', '--run-profile', profile, uri,
+                 '--threads', str(args.threads), '--turns', str(args.turns)],
+                capture_output=True, text=True
+            )
+            lines = proc.stdout.strip().splitlines()
+            if proc.returncode != 0 or not lines:
+                print(f"{profile:<8} failed (exit code {proc.returncode})")
+                continue
+            result = json.loads(lines[-1])
+            ok, errors = result['ok'], result['errors']
+            print(f"{profile:<8} {ok / result['elapsed']:>8.0f} {ok:>6} {len(errors):>7} {result['stored']:>6}  "
+                  f"{errors[0] if errors else ''}")
+
+
+if __name__ == '__main__':
+    main()
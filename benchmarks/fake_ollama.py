@@ -0,0 +1,292 @@
+"""A small stand-in for the Ollama HTTP API.
+
+Speaks enough of ``/api/chat``, ``/api/generate``, ``/api/embeddings``,
+``/api/tags`` and ``/api/ps`` for the ollama Python client, with tunable
+latency, token rate and failure modes, so the app's Ollama layer can be
+exercised without a model server. With ``load_time`` set, models start
+unloaded: the first request for a model waits that long to "load" it,
+and it stays loaded for the request's ``keep_alive`` (5 minutes by
+default), as ``/api/ps`` reports::
+
+    python -m benchmarks.fake_ollama --port 11500 --tokens-per-second 30
+
+or from Python::
+
+    server = FakeOllama(tokens_per_second=30).start()
+    ...  # point OLLAMA_HOST at server.url
+    server.stop()
+"""
+import re
+import json
+import time
+import hashlib
+import argparse
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+DEFAULT_REPLY = (
+    "Dr. Jhatka: Hello! I understand you are not feeling well. "
+    "Drink plenty of fluids and rest. If symptoms persist, visit your nearest Upazila Health Complex."
+)
+_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+
+
+def keep_alive_seconds(value, default=300.0):
+    """Seconds a ``keep_alive`` value ("30m", "1h", 90, -1, ...) keeps a model loaded; None is forever."""
+    if value is None:
+        return default
+    if isinstance(value, (int, float)) or re.fullmatch(r'-?\d+(\.\d+)?', str(value)):
+        seconds = float(value)
+    else:
+        seconds = sum(float(n) * _UNITS[u] for n, u in re.findall(r'(-?\d+(?:\.\d+)?)(ms|s|m|h)', str(value)))
+    return None if seconds < 0 else seconds
+
+
+class FakeOllama:
+    def __init__(self, host='127.0.0.1', port=0, reply=DEFAULT_REPLY, tokens_per_second=50.0,
+                 latency=0.0, fail_status=None, hang=False, models=('llava:7b',), prefix_cache=True, load_time=0.0):
+        self.reply = reply
+        self.tokens_per_second = tokens_per_second
+        self.latency = latency          # Seconds of simulated prompt prefill before the first token
+        self.fail_status = fail_status  # Answer every API call with this HTTP status
+        self.hang = hang                # Accept connections but never answer
+        self.models = list(models)
+        self.prefix_cache = prefix_cache  # Only count prompt tokens past the prefix shared with the last request
+        self.load_time = load_time      # Seconds to load an unloaded model; 0 means always loaded
+        self.loads = 0
+        self._loaded = {}               # model -> monotonic expiry, None for never
+        self._load_locks = {}
+        self.requests = 0
+        self._last_prompt = ''
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def unload(self, model=None):
+        """Evict ``model`` (or every model), as Ollama does when keep_alive runs out."""
+        with self._lock:
+            if model:
+                self._loaded.pop(model, None)
+            else:
+                self._loaded.clear()
+
+    def _is_loaded(self, model):
+        if not self.load_time:
+            return True
+        expiry = self._loaded.get(model, 0)
+        return expiry is None or expiry > time.monotonic()
+
+    def _load(self, model, keep_alive):
+        """Load ``model`` if needed and return the nanoseconds spent loading it."""
+        if not self.load_time or not model:
+            return 0
+        with self._lock:
+            lock = self._load_locks.setdefault(model, threading.Lock())
+        started = time.perf_counter()
+        with lock:
+            if not self._is_loaded(model):
+                time.sleep(self.load_time)
+                with self._lock:
+                    self.loads += 1
+            seconds = keep_alive_seconds(keep_alive)
+            with self._lock:
+                self._loaded[model] = None if seconds is None else time.monotonic() + seconds
+        return int((time.perf_counter() - started) * 1e9)
+
+    def _running(self):
+        models = []
+        for model in self.models:
+            if not self._is_loaded(model):
+                continue
+            expiry = self._loaded.get(model) if self.load_time else None
+            remaining = timedelta(days=365 * 100) if expiry is None else timedelta(seconds=expiry - time.monotonic())
+            models.append({'name': model, 'model': model,
+                           'expires_at': (datetime.now(timezone.utc) + remaining).isoformat()})
+        return models
+
+    def _count(self):
+        with self._lock:
+            self.requests += 1
+
+    def _prefill_tokens(self, prompt):
+        """Prompt tokens to evaluate, approximating Ollama's KV-cache prefix reuse."""
+        with self._lock:
+            shared = 0
+            if self.prefix_cache:
+                for a, b in zip(prompt, self._last_prompt):
+                    if a != b:
+                        break
+                    shared += 1
+            self._last_prompt = prompt
+        return max(1, (len(prompt) - shared) // 4)
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, payload, status=200):
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _read_json(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                return json.loads(self.rfile.read(length) or b'{}')
+
+            def _guard(self):
+                fake._count()
+                if fake.hang:
+                    time.sleep(3600)
+                if fake.fail_status:
+                    self._send_json({'error': 'simulated failure'}, fake.fail_status)
+                    return False
+                return True
+
+            def do_GET(self):
+                if self.path == '/':
+                    body = b'Ollama is running'
+                    self.send_response(200)
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                elif self.path == '/api/tags':
+                    if self._guard():
+                        self._send_json({'models': [{'name': m, 'model': m} for m in fake.models]})
+                elif self.path == '/api/ps':
+                    if self._guard():
+                        self._send_json({'models': fake._running()})
+                else:
+                    self._send_json({'error': 'not found'}, 404)
+
+            def do_POST(self):
+                request = self._read_json()  # Drain the body first to keep the connection reusable
+                if not self._guard():
+                    return
+                if request.get('model') and request['model'] not in fake.models \
+                        and self.path not in ('/api/embeddings', '/api/embed'):
+                    self._send_json({'error': f"model '{request['model']}' not found"}, 404)
+                elif self.path == '/api/chat':
+                    self._generate(request, chat=True)
+                elif self.path == '/api/generate':
+                    self._generate(request, chat=False)
+                elif self.path in ('/api/embeddings', '/api/embed'):
+                    fake._load(request.get('model'), request.get('keep_alive'))
+                    text = request.get('prompt') or request.get('input') or ''
+                    digest = hashlib.sha256(str(text).encode('utf-8')).digest()
+                    vector = [b / 255.0 for b in digest]
+                    if self.path == '/api/embed':
+                        self._send_json({'model': request.get('model'), 'embeddings': [vector]})
+                    else:
+                        self._send_json({'embedding': vector})
+                else:
+                    self._send_json({'error': 'not found'}, 404)
+
+            def _generate(self, request, chat):
+                started = time.perf_counter()
+                if chat:
+                    prompt = ''.join(f"{m.get('role')}: {m.get('content')}\n" for m in request.get('messages') or [])
+                else:
+                    prompt = request.get('prompt') or ''
+                load_ns = fake._load(request.get('model'), request.get('keep_alive'))
+                started = time.perf_counter()
+                prompt_tokens = fake._prefill_tokens(prompt)
+                # An empty /api/generate prompt only loads the model, as in Ollama.
+                preload = not chat and not request.get('prompt')
+                tokens = [] if preload else [t + ' ' for t in fake.reply.split(' ')]
+                time.sleep(fake.latency)
+                prefill_ns = int((time.perf_counter() - started) * 1e9)
+
+                def chunk(text, done, eval_ns=0):
+                    payload = {
+                        'model': request.get('model'),
+                        'created_at': datetime.now(timezone.utc).isoformat(),
+                        'done': done
+                    }
+                    if chat:
+                        payload['message'] = {'role': 'assistant', 'content': text}
+                    else:
+                        payload['response'] = text
+                    if done:
+                        payload.update({
+                            'done_reason': 'stop',
+                            'total_duration': load_ns + prefill_ns + eval_ns,
+                            'load_duration': load_ns,
+                            'prompt_eval_count': prompt_tokens,
+                            'prompt_eval_duration': prefill_ns,
+                            'eval_count': len(tokens),
+                            'eval_duration': eval_ns
+                        })
+                    return payload
+
+                delay = 1.0 / fake.tokens_per_second if fake.tokens_per_second else 0
+                if request.get('stream', True):
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'application/x-ndjson')
+                    self.send_header('Transfer-Encoding', 'chunked')
+                    self.end_headers()
+                    eval_started = time.perf_counter()
+                    for token in tokens:
+                        time.sleep(delay)
+                        self._write_chunk(json.dumps(chunk(token, False)) + '\n')
+                    eval_ns = int((time.perf_counter() - eval_started) * 1e9)
+                    self._write_chunk(json.dumps(chunk('', True, eval_ns)) + '\n')
+                    self.wfile.write(b'0\r\n\r\n')
+                else:
+                    time.sleep(delay * len(tokens))
+                    self._send_json(chunk(''.join(tokens).strip(), True, int(delay * len(tokens) * 1e9)))
+
+            def _write_chunk(self, text):
+                data = text.encode('utf-8')
+                self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b'\r\n')
+                self.wfile.flush()
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=11500)
+    parser.add_argument('--tokens-per-second', type=float, default=50.0)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds before the first token')
+    parser.add_argument('--fail-status', type=int, help='answer every API call with this HTTP status')
+    parser.add_argument('--hang', action='store_true', help='accept requests but never answer')
+    parser.add_argument('--load-time', type=float, default=0.0, help='seconds to load an unloaded model')
+    args = parser.parse_args()
+
+    server = FakeOllama(args.host, args.port, tokens_per_second=args.tokens_per_second,
+                        latency=args.latency, fail_status=args.fail_status, hang=args.hang,
+                        load_time=args.load_time)
+    print(f"Fake Ollama listening on {server.url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
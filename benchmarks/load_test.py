@@ -0,0 +1,295 @@
+"""End-to-end chat load test against a fake Ollama server.
+
+Starts the real app with ``create_app`` on a temporary SQLite database,
+backed by a :class:`~benchmarks.fake_ollama.FakeOllama` server and stub
+speech backends:
+
+* STT returns a fixed transcript after ``--stt-delay``.
+* TTS "renders" for ``--tts-delay`` on a thread pool instead of in
+  pyttsx3 processes, so no speech driver is needed.
+
+Virtual users, each logged in as its own patient, run a mix of text,
+image and voice turns at every concurrency level::
+
+    python -m benchmarks.load_test --concurrency 1,4,8 --turns 10
+    python -m benchmarks.load_test --save-baseline   # write benchmarks/baselines/load_test.json
+    python -m benchmarks.load_test --compare         # exit 1 if a level regressed against it
+
+A turn covers every request the browser makes for it: the upload and then
+the message for image and voice turns, just the message for text turns.
+For each level the test reports turns/s, p50/p95/p99 turn latency,
+errors, and the mean time per chat stage taken from ``/metrics``.
+"""
+import io
+import os
+import re
+import sys
+import json
+import time
+import wave
+import random
+import argparse
+import platform
+import tempfile
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fake_ollama import FakeOllama
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines', 'load_test.json')
+TRANSCRIPT = "I have had a headache and a mild fever since yesterday."
+QUESTIONS = [
+    "I have had a dry cough for three days.",
+    "It gets worse at night. Should I use my inhaler?",
+    "Can I take paracetamol with my asthma medicine?",
+    "What should I eat while I recover?",
+]
+STAGE_LINE = re.compile(r'^chat_stage_seconds_(sum|count)\{stage="([^"]+)"\} (\S+)$')
+
+
+class FakeSpeechEngine:
+    """Stands in for the pyttsx3 engine SpeechService builds on import."""
+
+    def setProperty(self, name, value):
+        pass
+
+    def getProperty(self, name):
+        return {'rate': 150, 'voice': 'bench'}.get(name)
+
+
+def start_app(args, tmp):
+    """Start the fake Ollama server, then import and build the app against it."""
+    server = FakeOllama(tokens_per_second=args.tokens_per_second, latency=args.latency).start()
+    import pyttsx3
+    pyttsx3.init = lambda *a, **k: FakeSpeechEngine()
+
+    from app import create_app, db
+    from app.models import User
+    from app.utils import tts_pool as tts_pool_module
+    from app.utils.services import speech_service
+    from app.utils.stt import STTBackend
+    from config import Config
+
+    class StubSTT(STTBackend):
+        name = 'stub'
+
+        def transcribe(self, audio, language="en-US"):
+            time.sleep(args.stt_delay)
+            return TRANSCRIPT
+
+    def stub_synthesize(text, language="en"):
+        time.sleep(args.tts_delay)
+        return 'bench.wav'
+
+    class LoadTestConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(tmp, 'load.db')}"
+        UPLOAD_FOLDER = os.path.join(tmp, 'uploads')
+        OLLAMA_HOSTS = server.url
+        OLLAMA_HOST_MAX_CONCURRENCY = args.ollama_concurrency
+
+    app = create_app(LoadTestConfig)
+    speech_service.stt = StubSTT()
+    tts_pool_module._synthesize = stub_synthesize
+    tts_pool_module.tts_pool._executor = ThreadPoolExecutor(max_workers=tts_pool_module.tts_pool.max_workers)
+    with app.app_context():
+        db.create_all()
+        for i in range(max(args.levels)):
+            user = User(username=f"patient{i}", email=f"patient{i}@example.com",
+                        medical_history="Mild asthma. Allergic to penicillin.")
+            user.set_password('bench')
+            db.session.add(user)
+        db.session.commit()
+    return app, server
+
+
+def make_media():
+    from PIL import Image
+    image = io.BytesIO()
+    Image.new('RGB', (1600, 1200), (205, 150, 140)).save(image, 'JPEG', quality=90)
+
+    voice = io.BytesIO()
+    with wave.open(voice, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(16000)
+        w.writeframes(b'\x00\x10\x00\xf0' * 16000 * 3)
+    return {'image': image.getvalue(), 'voice': voice.getvalue()}
+
+
+class VirtualUser:
+    def __init__(self, app, index, media):
+        self.index = index
+        self.media = media
+        self.uploads = 0
+        self.conversation_id = None
+        self.client = app.test_client()
+        self.client.post('/auth/login', data={'username': f"patient{index}", 'password': 'bench'})
+
+    def _upload(self, kind):
+        self.uploads += 1
+        extension = 'jpg' if kind == 'image' else 'wav'
+        filename = f"p{self.index}_{self.uploads}.{extension}"
+        data = self.media[kind]
+        if kind == 'image':
+            # Bytes after the JPEG end marker are ignored by decoders but make
+            # every upload distinct, so the image cache does not hide the work.
+            data += filename.encode()
+        response = self.client.post('/chat/upload', data={'file': (io.BytesIO(data), filename)},
+                                    content_type='multipart/form-data')
+        if response.status_code != 200:
+            raise RuntimeError(f"upload returned {response.status_code}")
+        return response.get_json()
+
+    def turn(self, kind):
+        payload = {'text': random.choice(QUESTIONS), 'conversation_id': self.conversation_id}
+        if kind == 'image':
+            payload['image_path'] = self._upload('image')['file_path']
+        elif kind == 'voice':
+            payload['text'] = self._upload('voice')['transcription']
+        response = self.client.post('/chat/message', json=payload)
+        if response.status_code != 200:
+            raise RuntimeError(f"message returned {response.status_code}")
+        self.conversation_id = response.get_json()['conversation_id']
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def stage_totals(client):
+    totals = {}
+    for line in client.get('/metrics').get_data(as_text=True).splitlines():
+        match = STAGE_LINE.match(line)
+        if match:
+            kind, name, value = match.groups()
+            totals.setdefault(name, {'sum': 0.0, 'count': 0})[kind] = float(value)
+    return totals
+
+
+def run_level(app, media, concurrency, turns, mix):
+    users = [VirtualUser(app, i, media) for i in range(concurrency)]
+    kinds = [kind for kind, weight in mix.items() for _ in range(weight)]
+    scraper = app.test_client()
+    before = stage_totals(scraper)
+
+    def drive(user):
+        latencies, errors = [], []
+        for _ in range(turns):
+            started = time.perf_counter()
+            try:
+                user.turn(random.choice(kinds))
+                latencies.append(time.perf_counter() - started)
+            except Exception as e:
+                errors.append(str(e))
+        return latencies, errors
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(drive, users))
+    elapsed = time.perf_counter() - started
+
+    after = stage_totals(scraper)
+    stages = {}
+    for name, total in after.items():
+        count = total['count'] - before.get(name, {}).get('count', 0)
+        if count:
+            stages[name] = round((total['sum'] - before.get(name, {}).get('sum', 0.0)) / count * 1000, 1)
+
+    latencies = [latency for result in results for latency in result[0]]
+    errors = [error for result in results for error in result[1]]
+    return {
+        'turns': len(latencies),
+        'errors': len(errors),
+        'first_error': errors[0] if errors else None,
+        'turns_per_second': round(len(latencies) / elapsed, 2),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 1) if latencies else None,
+        'p95_ms': round(percentile(latencies, 95) * 1000, 1) if latencies else None,
+        'p99_ms': round(percentile(latencies, 99) * 1000, 1) if latencies else None,
+        'mean_ms': round(statistics.mean(latencies) * 1000, 1) if latencies else None,
+        'stages_ms': stages
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Print each level against the baseline and return the number of regressions."""
+    regressions = 0
+    for level, result in results.items():
+        base = baseline['levels'].get(level)
+        if not base or not result['turns']:
+            continue
+        slower = result['p95_ms'] > base['p95_ms'] * (1 + tolerance)
+        fewer = result['turns_per_second'] < base['turns_per_second'] * (1 - tolerance)
+        regressions += slower or fewer or result['errors'] > base['errors']
+        print(f"{level:>5} p95 {base['p95_ms']:.0f} -> {result['p95_ms']:.0f} ms, "
+              f"turns/s {base['turns_per_second']:.2f} -> {result['turns_per_second']:.2f}, "
+              f"errors {base['errors']} -> {result['errors']}"
+              f"{'  REGRESSION' if slower or fewer or result['errors'] > base['errors'] else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--concurrency', default='1,4,8', help='comma-separated virtual user counts')
+    parser.add_argument('--turns', type=int, default=10, help='turns per virtual user at each level')
+    parser.add_argument('--mix', default='text=6,image=2,voice=2', help='relative weights of turn kinds')
+    parser.add_argument('--tokens-per-second', type=float, default=50.0)
+    parser.add_argument('--latency', type=float, default=0.05, help='fake Ollama seconds before the first token')
+    parser.add_argument('--ollama-concurrency', type=int, default=2, help='OLLAMA_HOST_MAX_CONCURRENCY')
+    parser.add_argument('--stt-delay', type=float, default=0.2)
+    parser.add_argument('--tts-delay', type=float, default=0.3)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--compare', action='store_true', help='exit 1 if a level regressed against the baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed p95/throughput drift when comparing')
+    args = parser.parse_args()
+    args.levels = [int(c) for c in args.concurrency.split(',')]
+    mix = {kind: int(weight) for kind, weight in (part.split('=') for part in args.mix.split(','))}
+
+    random.seed(args.seed)
+    settings = {key: getattr(args, key) for key in (
+        'turns', 'mix', 'tokens_per_second', 'latency', 'ollama_concurrency', 'stt_delay', 'tts_delay'
+    )}
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        app, server = start_app(args, tmp)
+        media = make_media()
+        print(f"{'users':>5} {'turns':>6} {'turns/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        for level in args.levels:
+            result = run_level(app, media, level, args.turns, mix)
+            results[str(level)] = result
+            print(f"{level:>5} {result['turns']:>6} {result['turns_per_second']:>8.2f} {result['p50_ms'] or 0:>8.0f} "
+                  f"{result['p95_ms'] or 0:>8.0f} {result['p99_ms'] or 0:>8.0f} {result['errors']:>7}")
+            print('      stages (mean ms): ' + ', '.join(f"{k} {v}" for k, v in sorted(result['stages_ms'].items())))
+            if result['first_error']:
+                print(f"      first error: {result['first_error']}")
+        server.stop()
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump({
+                'settings': settings,
+                'machine': {'python': platform.python_version(), 'platform': platform.platform(),
+                            'cpus': os.cpu_count()},
+                'levels': results
+            }, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"\nBaseline written to {args.baseline}")
+
+    if args.compare:
+        if not os.path.exists(args.baseline):
+            print(f"\nNo baseline at {args.baseline}; run with --save-baseline first")
+            sys.exit(1)
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline['settings'] != settings:
+            print("\nWarning: baseline was recorded with different settings:", baseline['settings'])
+        print("\nAgainst baseline:")
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""First-turn latency with and without the model manager.
+
+Each profile runs in a fresh interpreter against a
+:class:`~benchmarks.fake_ollama.FakeOllama` server that takes
+``--load-time`` seconds to load a model. Models expire after
+``--keep-alive`` seconds:
+
+* ``cold``: ``MODEL_PRELOAD`` off. The first turn pays for the load, and so
+  does the first turn after the app sat idle past the keep_alive.
+* ``preload``: ``MODEL_PRELOAD`` on. ``GET /ready`` is polled the way a
+  load balancer would; that first request starts the manager. The table
+  reports how long until it answers 200, then runs the same two turns.
+
+Run it with::
+
+    python -m benchmarks.model_warmup --load-time 3 --keep-alive 4
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import tempfile
+
+from benchmarks.fake_ollama import FakeOllama
+
+
+def run_profile(profile, args):
+    server = FakeOllama(load_time=args.load_time, tokens_per_second=200).start()
+
+    from app import create_app
+    from app.utils.services import llm_service
+    from config import Config
+
+    class WarmupConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'warmup.db')}"
+        MODEL_PRELOAD = profile == 'preload'
+        MODEL_CHECK_INTERVAL = max(1, args.keep_alive // 4)
+        OLLAMA_HOSTS = server.url
+        OLLAMA_KEEP_ALIVE = f"{args.keep_alive}s"
+
+    app = create_app(WarmupConfig)
+    client = app.test_client()
+    result = {}
+
+    started = time.perf_counter()
+    while client.get('/ready').status_code != 200:
+        time.sleep(0.05)
+    result['ready'] = time.perf_counter() - started
+
+    def turn(question):
+        turn_started = time.perf_counter()
+        llm_service.process_text_only(question)
+        return time.perf_counter() - turn_started
+
+    result['first_turn'] = turn("I have had a dry cough for three days.")
+    time.sleep(args.keep_alive + 1)
+    result['after_idle'] = turn("It gets worse at night. Should I use my inhaler?")
+    result['loads'] = server.loads
+    server.stop()
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--profiles', default='cold,preload')
+    parser.add_argument('--load-time', type=float, default=3.0, help='seconds the fake server takes to load a model')
+    parser.add_argument('--keep-alive', type=int, default=4, help='seconds a loaded model stays loaded')
+    parser.add_argument('--run-profile', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_profile:
+        run_profile(args.run_profile, args)
+        return
+
+    print(f"{'profile':<8} {'ready ms':>9} {'first turn ms':>14} {'after idle ms':>14} {'loads':>6}")
+    for profile in args.profiles.split(','):
+        proc = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.model_warmup', '--run-profile', profile,
+             '--load-time', str(args.load_time), '--keep-alive', str(args.keep_alive)],
+            capture_output=True, text=True
+        )
+        lines = proc.stdout.strip().splitlines()
+        if proc.returncode != 0 or not lines:
+            print(f"{profile:<8} failed: {(proc.stderr.strip().splitlines() or ['no output'])[-1]}")
+            continue
+        run = json.loads(lines[-1])
+        print(f"{profile:<8} {run['ready'] * 1000:>9.0f} {run['first_turn'] * 1000:>14.0f} "
+              f"{run['after_idle'] * 1000:>14.0f} {run['loads']:>6}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""Compare prompt prefill per turn: legacy single-message packing vs structured chat messages.
+
+Replays a short multi-turn conversation twice against one Ollama host and
+prints ``prompt_eval_count`` (tokens the server actually had to evaluate)
+for each turn::
+
+    python -m benchmarks.prefill_savings --host http://localhost:11434
+    python -m benchmarks.prefill_savings            # built-in fake server
+
+The legacy layout interleaves the patient details into the opening
+sentence of a fresh mega-prompt, so nothing past the first few tokens is
+shared between turns; the structured layout keeps instructions, profile
+and earlier turns byte-identical so only the new turn is prefilled.
+"""
+import argparse
+
+from ollama import Client
+
+from app.utils import prompts
+from benchmarks.fake_ollama import FakeOllama
+
+USER_INFO = {
+    'username': 'rahim',
+    'age': 34,
+    'gender': 'male',
+    'medical_history': 'Mild asthma. Allergic to penicillin.'
+}
+
+QUESTIONS = [
+    "I have had a dry cough for three days.",
+    "It gets worse at night. Should I use my inhaler?",
+    "I also have a low fever now, around 100 F.",
+    "Can I take paracetamol with my asthma medicine?",
+    "What should I eat while I recover?",
+    "When should I go to the Upazila Health Complex?",
+]
+
+
+def legacy_messages(prompt, user_info, history):
+    """The pre-structured layout: everything packed into one user message."""
+    context = (
+        f"The patient's username is {user_info['username']}. "
+        f"The patient is {user_info['age']} years old. "
+        f"The patient's gender is {user_info['gender']}. "
+        f"The patient's medical history includes: {user_info['medical_history']} "
+        "Previous conversation:\n"
+    )
+    for message in history[-5:]:
+        sender = "User" if message['sender'] == 'user' else "Doctor"
+        context += f"{sender}: {message['text']}\n"
+    instructions = prompts.PERSONALIZED_INSTRUCTIONS.split('\n', 1)[1]
+    full_prompt = (
+        f"You are Dr. Jhatka, a professional medical assistant. {context}\n{instructions}"
+        f"\n\nPatient: {prompt}\n\nDr. Jhatka:"
+    )
+    return [{'role': 'user', 'content': full_prompt}]
+
+
+def structured_messages(prompt, user_info, history):
+    return prompts.build_messages(prompt, dict(user_info, previous_conversation=history))
+
+
+def replay(client, model, build, keep_alive):
+    history, counts = [], []
+    for question in QUESTIONS:
+        messages = build(question, USER_INFO, history)
+        response = client.chat(model=model, messages=messages, keep_alive=keep_alive)
+        counts.append((prompts.estimate_tokens(messages), response.get('prompt_eval_count') or 0))
+        history.append({'sender': 'user', 'text': question, 'image_path': None})
+        history.append({'sender': 'doctor', 'text': response['message']['content'], 'image_path': None})
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', help='Ollama host; defaults to a local fake server')
+    parser.add_argument('--model', default='llava:7b')
+    parser.add_argument('--keep-alive', default='30m')
+    args = parser.parse_args()
+
+    server = None
+    host = args.host
+    if not host:
+        server = FakeOllama(tokens_per_second=0, models=(args.model,)).start()
+        host = server.url
+    client = Client(host=host)
+
+    try:
+        results = {}
+        for name, build in (('legacy', legacy_messages), ('structured', structured_messages)):
+            results[name] = replay(client, args.model, build, args.keep_alive)
+    finally:
+        if server:
+            server.stop()
+
+    print(f"{'turn':>4} {'legacy prompt':>14} {'legacy eval':>12} {'struct prompt':>14} {'struct eval':>12}")
+    for turn, (legacy, structured) in enumerate(zip(results['legacy'], results['structured']), 1):
+        print(f"{turn:>4} {legacy[0]:>14} {legacy[1]:>12} {structured[0]:>14} {structured[1]:>12}")
+    # The first turn is a cold cache for both layouts.
+    legacy_eval = sum(c[1] for c in results['legacy'][1:])
+    structured_eval = sum(c[1] for c in results['structured'][1:])
+    if legacy_eval:
+        print(f"Prefill tokens after turn 1: legacy {legacy_eval}, structured {structured_eval} "
+              f"({100 * (1 - structured_eval / legacy_eval):.1f}% fewer)")
+
+
+if __name__ == '__main__':
+    main()
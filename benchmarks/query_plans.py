@@ -0,0 +1,158 @@
+"""Check that the hot chat queries are served by indexes.
+
+Seeds a synthetic SQLite database, runs each hot query and checks its
+``EXPLAIN QUERY PLAN`` names the expected index rather than scanning the
+table, and that no temporary B-tree is built to sort the rows. Exits
+non-zero when a plan regresses::
+
+    python -m benchmarks.query_plans --users 200 --conversations 20 --messages 12
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from types import SimpleNamespace
+from datetime import datetime, timedelta
+
+from flask import Flask
+from sqlalchemy import event, text
+
+from app import db
+from app.models import User, Conversation, Message, ChatJob
+from app.routes.chat import _recent_messages
+from app.utils.conversation_feed import conversation_page
+
+
+def make_app(path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{path}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def seed(users, conversations, messages):
+    started = datetime(2025, 1, 1)
+    conn = db.session.connection()
+    conn.execute(User.__table__.insert(), [
+        {'id': u, 'username': f"user{u}", 'email': f"user{u}@example.com"} for u in range(1, users + 1)
+    ])
+    conv_rows, message_rows, job_rows = [], [], []
+    conv_id = message_id = 0
+    for u in range(1, users + 1):
+        for c in range(conversations):
+            conv_id += 1
+            start = started + timedelta(minutes=random.randint(0, 500000))
+            conv_rows.append({'id': conv_id, 'user_id': u, 'start_time': start, 'last_updated': start})
+            for m in range(messages):
+                message_id += 1
+                message_rows.append({
+                    'id': message_id, 'conversation_id': conv_id,
+                    'sender': 'user' if m % 2 == 0 else 'doctor',
+                    'text_content': f"message {m}", 'timestamp': start + timedelta(seconds=30 * m)
+                })
+            job_rows.append({
+                'id': f"{conv_id:032x}", 'user_id': u, 'conversation_id': conv_id,
+                'status': 'done', 'created_at': start, 'finished_at': start + timedelta(seconds=20)
+            })
+    conn.execute(Conversation.__table__.insert(), conv_rows)
+    conn.execute(Message.__table__.insert(), message_rows)
+    conn.execute(ChatJob.__table__.insert(), job_rows)
+    db.session.commit()
+    db.session.execute(text('ANALYZE'))
+    return conv_id, message_id
+
+
+def capture(fn):
+    """Run ``fn`` and return the SQL statements (with parameters) it executed."""
+    statements = []
+
+    def listener(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        fn()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    return statements
+
+
+def hot_queries(users, conversations):
+    user_id = random.randint(1, users)
+    conversation_id = (user_id - 1) * conversations + 1
+    _, cursor = conversation_page(user_id, 5)
+    # As after a summary: only messages past summarized_until are loaded.
+    summarized = SimpleNamespace(id=conversation_id + 1, summarized_until=db.session.scalar(
+        db.select(db.func.min(Message.id)).where(Message.conversation_id == conversation_id + 1)))
+    return {
+        'feed conversations': (
+            lambda: conversation_page(user_id, 5, before=cursor), 0, 'ix_conversation_user_id_start_time'
+        ),
+        'feed messages': (
+            lambda: conversation_page(user_id, 5, before=cursor), 1, 'ix_message_conversation_id_timestamp'
+        ),
+        'context window': (
+            lambda: _recent_messages(summarized), 0, 'ix_message_conversation_id_timestamp'
+        ),
+        'conversation messages': (
+            lambda: db.session.get(Conversation, conversation_id).messages.all(),
+            1, 'ix_message_conversation_id_timestamp'
+        ),
+        'pending jobs': (
+            lambda: ChatJob.query.filter(ChatJob.user_id == user_id,
+                                         ChatJob.status.in_(['queued', 'running'])).count(),
+            0, 'ix_chat_job_user_id_status'
+        ),
+        'expired jobs': (
+            lambda: ChatJob.query.filter(ChatJob.finished_at < datetime(2025, 1, 2)).all(),
+            0, 'ix_chat_job_finished_at'
+        ),
+    }
+
+
+def check_plans(users, conversations):
+    """Yield ``(name, ok, milliseconds, plan steps)`` for each hot query."""
+    for name, (fn, index, expected) in hot_queries(users, conversations).items():
+        statement, parameters = capture(fn)[index]
+        plan = [row[-1] for row in db.session.connection().exec_driver_sql(
+            f"EXPLAIN QUERY PLAN {statement}", tuple(parameters))]
+        started = time.perf_counter()
+        fn()
+        elapsed = (time.perf_counter() - started) * 1000
+        ok = any(expected in step for step in plan) and not any('TEMP B-TREE' in step for step in plan)
+        yield name, ok, elapsed, plan
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--conversations', type=int, default=20, help='per user')
+    parser.add_argument('--messages', type=int, default=12, help='per conversation')
+    args = parser.parse_args()
+
+    random.seed(7)
+    with tempfile.TemporaryDirectory() as tmp:
+        app = make_app(os.path.join(tmp, 'plans.db'))
+        with app.app_context():
+            db.create_all()
+            started = time.perf_counter()
+            conversations, messages = seed(args.users, args.conversations, args.messages)
+            print(f"Seeded {conversations} conversations and {messages} messages "
+                  f"in {time.perf_counter() - started:.1f}s\n")
+
+            failures = 0
+            for name, ok, elapsed, plan in check_plans(args.users, args.conversations):
+                failures += not ok
+                print(f"{'ok ' if ok else 'FAIL'} {name:<22} {elapsed:6.2f} ms  {' / '.join(plan)}")
+            db.session.remove()
+
+    if failures:
+        print(f"\n{failures} hot queries are not using their index or sort in a temp B-tree")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""Cold-start time of ``create_app`` with lazy and eagerly built services.
+
+Each run happens in a fresh interpreter and times importing the app plus
+``create_app()``. Profiles:
+
+* ``lazy``: what a gunicorn worker or ``flask db`` command now pays;
+  the LLM and speech services are not built.
+* ``eager``: ``create_app()`` followed by building the LLM service and the
+  speech service with its pyttsx3 engine, which is what importing the
+  chat routes used to do.
+
+The ``lazy`` profile also reports how long the first use of each service
+takes afterwards. Use ``--fake-tts`` on hosts without eSpeak, where
+``pyttsx3.init()`` (and with it the ``eager`` profile) fails::
+
+    python -m benchmarks.startup --repeats 5
+    python -m benchmarks.startup --fake-tts
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import statistics
+import subprocess
+import tempfile
+
+
+class FakeSpeechEngine:
+    def setProperty(self, name, value):
+        pass
+
+    def getProperty(self, name):
+        return None
+
+
+def run_profile(profile, fake_tts):
+    started = time.perf_counter()
+    if fake_tts:
+        import pyttsx3
+        pyttsx3.init = lambda *a, **k: FakeSpeechEngine()
+
+    from app import create_app
+    from app.utils.services import services
+    from config import Config
+
+    class StartupConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'startup.db')}"
+
+    create_app(StartupConfig)
+    if profile == 'eager':
+        services.get('llm')
+        services.get('speech').tts_engine
+    result = {'seconds': time.perf_counter() - started, 'modules': len(sys.modules)}
+
+    if profile == 'lazy':
+        for name in ('llm', 'speech'):
+            first_use = time.perf_counter()
+            services.get(name)
+            result[f"first_{name}"] = time.perf_counter() - first_use
+    # ru_maxrss is in KiB on Linux
+    result['rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--profiles', default='lazy,eager')
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--fake-tts', action='store_true', help='replace pyttsx3.init with a no-op engine')
+    parser.add_argument('--run-profile', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_profile:
+        run_profile(args.run_profile, args.fake_tts)
+        return
+
+    print(f"{'profile':<8} {'startup ms':>11} {'RSS MB':>7} {'modules':>8}  first use")
+    for profile in args.profiles.split(','):
+        runs, error = [], None
+        for _ in range(args.repeats):
+            proc = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.startup', '--run-profile', profile]
+                + (['--fake-tts'] if args.fake_tts else []),
+                capture_output=True, text=True
+            )
+            lines = proc.stdout.strip().splitlines()
+            if proc.returncode != 0 or not lines:
+                error = (proc.stderr.strip().splitlines() or ['no output'])[-1]
+                break
+            runs.append(json.loads(lines[-1]))
+        if error:
+            print(f"{profile:<8} failed: {error}")
+            continue
+        first_use = ', '.join(
+            f"{name} {statistics.median(run[f'first_{name}'] for run in runs) * 1000:.0f} ms"
+            for name in ('llm', 'speech') if f"first_{name}" in runs[0]
+        )
+        print(f"{profile:<8} {statistics.median(run['seconds'] for run in runs) * 1000:>11.0f} "
+              f"{statistics.median(run['rss_mb'] for run in runs):>7.1f} "
+              f"{statistics.median(run['modules'] for run in runs):>8.0f}  {first_use or '-'}")
+
+
+if __name__ == '__main__':
+    main()
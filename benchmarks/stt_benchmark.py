@@ -0,0 +1,134 @@
+"""Latency and real-time factor of the speech-to-text backends.
+
+    python -m benchmarks.stt_benchmark recording1.webm recording2.wav \\
+        --backends google,whisper,whisper-fp32 --concurrency 4
+
+For each backend this reports model load time (cold start), per-file
+latency and real-time factor (processing seconds per second of audio;
+below 1.0 is faster than real time). ``--concurrency`` sends that many
+transcriptions at once to exercise Whisper's micro-batching.
+
+``--decode`` instead compares decoding the recordings the old way
+(pydub exporting a sibling .wav, read back with ``sr.AudioFile``) with
+the in-memory ffmpeg pipe, reporting latency and bytes written to disk.
+"""
+import os
+import tempfile
+import time
+import argparse
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+import speech_recognition as sr
+
+from app.utils.audio_decode import decode_audio
+from app.utils.stt import GoogleSTT, WhisperSTT
+
+
+def make_backend(name, model):
+    if name == 'google':
+        return GoogleSTT()
+    if name == 'whisper':
+        return WhisperSTT(model=model, quantize=True)
+    if name == 'whisper-fp32':
+        return WhisperSTT(model=model, quantize=False)
+    raise ValueError(f"Unknown backend {name}")
+
+
+def load_audio(path):
+    audio = decode_audio(path)
+    duration = len(audio.frame_data) / (audio.sample_rate * audio.sample_width)
+    return audio, duration
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run(backend, clips, repeat, concurrency):
+    started = time.perf_counter()
+    backend.warm_up()
+    load_seconds = time.perf_counter() - started
+
+    def one(clip):
+        audio, duration = clip
+        t = time.perf_counter()
+        text = backend.transcribe(audio)
+        return time.perf_counter() - t, duration, text
+
+    jobs = [clip for _ in range(repeat) for clip in clips]
+    wall = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, jobs))
+    wall = time.perf_counter() - wall
+
+    latencies = [r[0] for r in results]
+    audio_seconds = sum(r[1] for r in results)
+    return {
+        'load_s': load_seconds,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'rtf': statistics.mean(r[0] / r[1] for r in results if r[1]),
+        'throughput_rtf': wall / audio_seconds if audio_seconds else 0.0,
+        'sample': results[0][2]
+    }
+
+
+def legacy_decode(path, workdir):
+    """The pre-pipe path: pydub/ffmpeg writes a .wav that sr.AudioFile reads back."""
+    from pydub import AudioSegment
+    wav_path = os.path.join(workdir, os.path.basename(path).rsplit('.', 1)[0] + '.wav')
+    AudioSegment.from_file(path).export(wav_path, format='wav')
+    with sr.AudioFile(wav_path) as source:
+        audio = sr.Recognizer().record(source)
+    written = os.path.getsize(wav_path)
+    os.remove(wav_path)
+    return audio, written
+
+
+def compare_decoding(paths, repeat):
+    print(f"{'file':<28} {'legacy ms':>10} {'legacy disk KB':>15} {'pipe ms':>8} {'pipe disk KB':>13}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for path in paths:
+            legacy, pipe, written = [], [], 0
+            for _ in range(repeat):
+                t = time.perf_counter()
+                _, written = legacy_decode(path, workdir)
+                legacy.append(time.perf_counter() - t)
+                t = time.perf_counter()
+                decode_audio(path)
+                pipe.append(time.perf_counter() - t)
+            print(f"{os.path.basename(path)[:28]:<28} {statistics.median(legacy) * 1000:>10.1f} "
+                  f"{written / 1024:>15.0f} {statistics.median(pipe) * 1000:>8.1f} {0:>13}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('audio', nargs='+', help='recordings in any format ffmpeg can read')
+    parser.add_argument('--backends', default='google,whisper')
+    parser.add_argument('--model', default='openai/whisper-base.en')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--decode', action='store_true', help='compare audio decoding paths only')
+    args = parser.parse_args()
+
+    if args.decode:
+        compare_decoding(args.audio, args.repeat)
+        return
+
+    clips = [load_audio(path) for path in args.audio]
+    print(f"{len(clips)} clips, {sum(c[1] for c in clips):.1f}s of audio, concurrency {args.concurrency}")
+    print(f"{'backend':<14} {'load s':>7} {'p50 ms':>8} {'p95 ms':>8} {'RTF':>6} {'batch RTF':>9}  sample")
+    for name in args.backends.split(','):
+        try:
+            r = run(make_backend(name.strip(), args.model), clips, args.repeat, args.concurrency)
+        except Exception as e:
+            print(f"{name:<14} failed: {e}")
+            continue
+        print(f"{name:<14} {r['load_s']:>7.2f} {r['p50_ms']:>8.0f} {r['p95_ms']:>8.0f} "
+              f"{r['rtf']:>6.2f} {r['throughput_rtf']:>9.2f}  {r['sample'][:40]!r}")
+
+
+if __name__ == '__main__':
+    main()
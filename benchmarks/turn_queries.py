@@ -0,0 +1,111 @@
+"""Count commits and SQL statements per chat request.
+
+Drives the real chat routes through the Flask test client against a
+SQLite file, with the LLM, text-to-speech and summarizer stubbed out so
+only the database work of each request is measured::
+
+    python -m benchmarks.turn_queries --turns 20
+"""
+import os
+import argparse
+import tempfile
+import statistics
+from collections import Counter
+
+from sqlalchemy import event
+
+from app import create_app, db
+from app.models import User
+from app.utils.jobs import job_queue
+from app.utils.services import llm_service
+from app.utils.summarizer import summarizer
+from app.utils.tts_pool import tts_pool
+from config import Config
+
+REPLY = "Dr. Jhatka: Drink plenty of water and rest. See a doctor if the fever lasts more than three days."
+
+
+def make_app(path):
+    class BenchConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{path}"
+        UPLOAD_FOLDER = os.path.join(os.path.dirname(path), 'uploads')
+
+    app = create_app(BenchConfig)
+    llm_service.process_text_only = lambda text, user_info: REPLY
+    llm_service.stream_text_only = lambda text, user_info: iter(REPLY.split(' '))
+    tts_pool.submit = lambda *args, **kwargs: None
+    summarizer.schedule = lambda conversation_id: None
+    job_queue.submit = lambda *args, **kwargs: None
+    with app.app_context():
+        db.create_all()
+        user = User(username='bench', email='bench@example.com', medical_history='Mild asthma.')
+        user.set_password('bench')
+        db.session.add(user)
+        db.session.commit()
+    return app
+
+
+class Recorder:
+    """Counts statements by kind and commits on the app's engine."""
+
+    def __init__(self, engine):
+        self.counts = Counter()
+        event.listen(engine, 'before_cursor_execute', self.on_execute)
+        event.listen(engine, 'commit', self.on_commit)
+
+    def on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.counts[statement.split(None, 1)[0].upper()] += 1
+
+    def on_commit(self, conn):
+        self.counts['COMMIT'] += 1
+
+    def measure(self, fn):
+        self.counts.clear()
+        response = fn()
+        assert response.status_code < 400, response.get_data(as_text=True)
+        return dict(self.counts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--turns', type=int, default=20, help='follow-up turns to average over')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = make_app(os.path.join(tmp, 'turns.db'))
+        client = app.test_client()
+        client.post('/auth/login', data={'username': 'bench', 'password': 'bench'})
+        with app.app_context():
+            recorder = Recorder(db.engine)
+
+        results = {'chat page, first visit': [recorder.measure(lambda: client.get('/chat/'))]}
+        results['chat page, returning'] = [recorder.measure(lambda: client.get('/chat/'))]
+        results['message, new conversation'] = [recorder.measure(
+            lambda: client.post('/chat/message', json={'text': 'I have a fever.'}))]
+        conversation_id = client.post('/chat/message', json={'text': 'Hello'}).get_json()['conversation_id']
+
+        turn = {'text': 'It is worse at night.', 'conversation_id': conversation_id}
+        results['message, follow-up'] = [
+            recorder.measure(lambda: client.post('/chat/message', json=turn)) for _ in range(args.turns)
+        ]
+
+        def stream():
+            response = client.post('/chat/message/stream', json=turn)
+            response.get_data()
+            return response
+        results['stream, follow-up'] = [recorder.measure(stream) for _ in range(args.turns)]
+        results['job submit, follow-up'] = [
+            recorder.measure(lambda: client.post('/chat/jobs', json=turn)) for _ in range(3)
+        ]
+
+    kinds = ['COMMIT', 'SELECT', 'INSERT', 'UPDATE', 'DELETE']
+    print(f"{'request':<28}" + ''.join(f"{kind.lower():>8}" for kind in kinds))
+    for name, runs in results.items():
+        print(f"{name:<28}" + ''.join(
+            f"{statistics.mean(run.get(kind, 0) for run in runs):>8.1f}" for kind in kinds
+        ))
+
+
+if __name__ == '__main__':
+    main()
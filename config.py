@@ -4,6 +4,36 @@ from sqlalchemy.pool import StaticPool
 
 load_dotenv()
 
+def engine_options(uri, pool_size=10, max_overflow=10, pool_timeout=30, pool_recycle=1800, busy_timeout=5000):
+    """SQLAlchemy engine options for the database behind ``uri``.
+
+    An in-memory SQLite database only exists on a single connection, so it
+    is shared through StaticPool. A SQLite file gets a connection per
+    thread from a queue pool (WAL and the other pragmas are applied on
+    connect by app.utils.db_engine). Server databases get a sized pool
+    that pings connections before use and recycles them before the server
+    times them out.
+    """
+    if uri in ('sqlite://', 'sqlite:///:memory:'):
+        return {
+            "connect_args": {"check_same_thread": False},
+            "poolclass": StaticPool
+        }
+    if uri.startswith('sqlite'):
+        return {
+            "connect_args": {"check_same_thread": False, "timeout": busy_timeout / 1000},
+            "pool_size": pool_size,
+            "max_overflow": max_overflow,
+            "pool_timeout": pool_timeout
+        }
+    return {
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": pool_timeout,
+        "pool_recycle": pool_recycle,
+        "pool_pre_ping": True
+    }
+
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY', 'dev-key-change-in-production')
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///app.db')
@@ -11,8 +41,94 @@ class Config:
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static/uploads')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # Max upload size of 16MB
     OLLAMA_HOST = os.environ.get('OLLAMA_HOST', 'http://127.0.0.1:11434')
+
+    # Ollama client and routing (see app/utils/llm_local.py and app/utils/llm_router.py)
+    OLLAMA_HOSTS = os.environ.get('OLLAMA_HOSTS', '')  # Comma-separated; overrides OLLAMA_HOST
+    OLLAMA_HOST_MAX_CONCURRENCY = int(os.environ.get('OLLAMA_HOST_MAX_CONCURRENCY', 2))  # Requests in flight per host
+    OLLAMA_ROUTING = os.environ.get('OLLAMA_ROUTING', 'least_outstanding')  # or 'latency'
+    OLLAMA_HEALTH_INTERVAL = float(os.environ.get('OLLAMA_HEALTH_INTERVAL', 15))  # Seconds between host probes
+    OLLAMA_CONNECT_TIMEOUT = float(os.environ.get('OLLAMA_CONNECT_TIMEOUT', 5))
+    OLLAMA_READ_TIMEOUT = float(os.environ.get('OLLAMA_READ_TIMEOUT', 180))
+    OLLAMA_MAX_CONNECTIONS = int(os.environ.get('OLLAMA_MAX_CONNECTIONS', 10))  # Pooled connections per host
+    OLLAMA_RETRY_ATTEMPTS = int(os.environ.get('OLLAMA_RETRY_ATTEMPTS', 3))  # Transient failures only
+    OLLAMA_BREAKER_THRESHOLD = int(os.environ.get('OLLAMA_BREAKER_THRESHOLD', 5))  # Failures before a circuit opens
+    OLLAMA_BREAKER_RESET = float(os.environ.get('OLLAMA_BREAKER_RESET', 30))  # Seconds before a trial call
+    OLLAMA_KEEP_ALIVE = os.environ.get('OLLAMA_KEEP_ALIVE', '30m')  # How long Ollama keeps the model loaded
+    OLLAMA_EMBED_MODEL = os.environ.get('OLLAMA_EMBED_MODEL', '')  # e.g. nomic-embed-text, for semantic cache hits
+
+    # Cached replies to text-only questions (see app/utils/response_cache.py)
+    RESPONSE_CACHE_ENABLED = os.environ.get('RESPONSE_CACHE_ENABLED', '0').lower() in ('1', 'true', 'yes')
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 512))
+    RESPONSE_CACHE_TTL = int(os.environ.get('RESPONSE_CACHE_TTL', 86400))  # Seconds
+    RESPONSE_CACHE_SIMILARITY = float(os.environ.get('RESPONSE_CACHE_SIMILARITY', 0.92))  # Min cosine similarity
+
+    # Images sent to LLaVA (see app/utils/image_preprocess.py)
+    IMAGE_MAX_SIDE = int(os.environ.get('IMAGE_MAX_SIDE', 672))  # Pixels
+    IMAGE_JPEG_QUALITY = int(os.environ.get('IMAGE_JPEG_QUALITY', 85))
+    IMAGE_CACHE_ENTRIES = int(os.environ.get('IMAGE_CACHE_ENTRIES', 64))  # Encoded images kept per process
+
+    # Speech-to-text (see app/utils/stt.py); empty STT_BACKEND means whisper if transformers is installed
+    STT_BACKEND = os.environ.get('STT_BACKEND', '')  # 'whisper' or 'google'
+    STT_MODEL = os.environ.get('STT_MODEL', 'openai/whisper-base.en')
+    STT_QUANTIZE = os.environ.get('STT_QUANTIZE', 'true').lower() in ('1', 'true', 'yes')  # int8 Linear layers
+    STT_THREADS = int(os.environ.get('STT_THREADS', 0))  # Torch CPU threads; 0 keeps torch's default
+    STT_BATCH_SIZE = int(os.environ.get('STT_BATCH_SIZE', 4))  # 1 disables micro-batching
+    STT_BATCH_WINDOW_MS = int(os.environ.get('STT_BATCH_WINDOW_MS', 20))
+
+    # Services built at startup instead of on first use, e.g. 'llm,speech' (see app/utils/services.py)
+    SERVICES_WARM_UP = os.environ.get('SERVICES_WARM_UP', '')
+
+    # Ollama model preloading and keep_alive refresh (see app/utils/model_manager.py)
+    MODEL_PRELOAD = os.environ.get('MODEL_PRELOAD', '1').lower() in ('1', 'true', 'yes')
+    MODEL_CHECK_INTERVAL = int(os.environ.get('MODEL_CHECK_INTERVAL', 60))  # Seconds between /api/ps checks
+    MODEL_PRELOAD_MODELS = os.environ.get('MODEL_PRELOAD_MODELS', '')  # Comma list; default chat + embed model
+
+    # Background chat jobs (see app/utils/jobs.py)
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+    JOB_QUEUE_MAX_DEPTH = int(os.environ.get('JOB_QUEUE_MAX_DEPTH', 16))
+    JOB_MAX_PENDING_PER_USER = int(os.environ.get('JOB_MAX_PENDING_PER_USER', 3))
+    JOB_RESULT_TTL = int(os.environ.get('JOB_RESULT_TTL', 3600))  # Seconds to keep finished jobs
+    JOB_TIMEOUT = int(os.environ.get('JOB_TIMEOUT', 0))  # Seconds before an unfinished job is failed; 0 derives it from the Ollama timeouts
+
+    # Text-to-speech worker processes; 0 means one per available core
+    TTS_WORKERS = int(os.environ.get('TTS_WORKERS', 0))
+    TTS_CACHE_MAX_BYTES = int(os.environ.get('TTS_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+    TTS_AUDIO_FORMAT = os.environ.get('TTS_AUDIO_FORMAT', 'mp3')  # 'mp3', 'opus' or 'wav' (no transcoding)
+    TTS_AUDIO_BITRATE = os.environ.get('TTS_AUDIO_BITRATE', '32k')
+
+    # Serving of /static/uploads (see app/routes/media.py). Flask's USE_X_SENDFILE also applies.
+    MEDIA_MAX_AGE = int(os.environ.get('MEDIA_MAX_AGE', 365 * 24 * 3600))  # Seconds browsers may cache media
+    MEDIA_ACCEL_REDIRECT = os.environ.get('MEDIA_ACCEL_REDIRECT', '')  # nginx internal location for UPLOAD_FOLDER
+
+    # Media garbage collection (see app/utils/media_gc.py)
+    MEDIA_GC_INTERVAL = int(os.environ.get('MEDIA_GC_INTERVAL', 3600))  # Seconds between sweeps; 0 disables them
+    MEDIA_GC_GRACE = int(os.environ.get('MEDIA_GC_GRACE', 3600))  # Seconds an unreferenced file is kept
+    MEDIA_GC_BATCH = int(os.environ.get('MEDIA_GC_BATCH', 500))  # Rows read per query during a sweep
+    MEDIA_RETENTION_DAYS = int(os.environ.get('MEDIA_RETENTION_DAYS', 0))  # Detach older uploads; 0 keeps them
+
+    # Conversations per page of the chat/history feed
+    CONVERSATIONS_PER_PAGE = int(os.environ.get('CONVERSATIONS_PER_PAGE', 10))
+
+    # Rolling conversation summaries (see app/utils/summarizer.py)
+    SUMMARY_RECENT_MESSAGES = int(os.environ.get('SUMMARY_RECENT_MESSAGES', 6))  # Kept verbatim after a fold
+    SUMMARY_BATCH = int(os.environ.get('SUMMARY_BATCH', 4))  # Extra messages allowed before folding again
+    SUMMARY_MAX_WORDS = int(os.environ.get('SUMMARY_MAX_WORDS', 200))
+
+    # Cached patient profiles and recent histories per process; 0 disables (see app/utils/context_cache.py)
+    CONTEXT_CACHE_ENTRIES = int(os.environ.get('CONTEXT_CACHE_ENTRIES', 1024))
     
-    SQLALCHEMY_ENGINE_OPTIONS = {
-        "connect_args": {"check_same_thread": False},
-        "poolclass": StaticPool
-    }
\ No newline at end of file
+    # Connection pooling, chosen by database type (see engine_options above)
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))  # Seconds to wait for a free connection
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))  # Seconds before a server connection is replaced
+    SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000))  # Milliseconds to wait on a locked database
+    SQLITE_PRAGMAS = {
+        'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'wal'),
+        'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'normal'),
+        'busy_timeout': SQLITE_BUSY_TIMEOUT,
+        'cache_size': -int(os.environ.get('SQLITE_CACHE_KB', 16000)),
+        'temp_store': 'memory'
+    }
+    # SQLALCHEMY_ENGINE_OPTIONS is derived from the final SQLALCHEMY_DATABASE_URI in create_app
+    # (see app/utils/db_engine.py); set it here only to override the pool entirely.
\ No newline at end of file
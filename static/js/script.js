@@ -15,7 +15,10 @@ document.addEventListener('DOMContentLoaded', () => {
     let uploadedFile = null;
     let recentFiles = JSON.parse(localStorage.getItem('recentFiles')) || [];
 
-    const addMessage = (sender, content, filePath = null, audioPath = null, isTyping = false) => {
+    // The conversation new messages are added to; set once the server replies.
+    let conversationId = messagesDiv.dataset.conversationId ? Number(messagesDiv.dataset.conversationId) : null;
+
+    const buildMessage = (sender, content, filePath = null, audioPath = null, messageId = null) => {
         const div = document.createElement('div');
         div.className = `message ${sender} fade-in`;
         let html = `
@@ -27,20 +30,27 @@ document.addEventListener('DOMContentLoaded', () => {
                     : filePath.endsWith('.pdf') 
                     ? `<a href="${filePath}" target="_blank">View PDF: ${filePath.split('/').pop()}</a>` 
                     : '') : ''}
-                ${audioPath ? `<audio controls src="${audioPath}"></audio>` : ''}
+                ${audioPath ? `<audio controls preload="none" src="${audioPath}"${messageId ? ` data-message-id="${messageId}"` : ''}></audio>` : ''}
             </div>
         `;
         div.innerHTML = html;
+        if (content) {
+            div.querySelector('p').textContent = content;
+        }
+        return div;
+    };
+
+    const addMessage = (sender, content, filePath = null, audioPath = null, isTyping = false) => {
+        const div = buildMessage(sender, content, filePath, audioPath);
         messagesDiv.appendChild(div);
 
         if (content && isTyping) {
             const p = div.querySelector('p');
             typeMessage(p, content);
-        } else if (content) {
-            div.querySelector('p').textContent = content;
         }
 
         messagesDiv.scrollTop = messagesDiv.scrollHeight;
+        return div;
     };
 
     const typeMessage = (element, text) => {
@@ -72,6 +82,145 @@ document.addEventListener('DOMContentLoaded', () => {
         if (thinkingDiv) thinkingDiv.remove();
     };
 
+    // Older messages load their audio only when played; the reply just
+    // received is buffered right away so pressing play starts at once.
+    const attachAudio = (container, audioPath) => {
+        const audio = document.createElement('audio');
+        audio.controls = true;
+        audio.preload = 'auto';
+        audio.src = audioPath;
+        container.appendChild(audio);
+    };
+
+    // Speech is synthesized in the background; poll until the reply's audio
+    // is ready (or has failed) and attach it to the message.
+    const waitForAudio = async (messageId, container, attempts = 60) => {
+        for (let i = 0; i < attempts; i++) {
+            await new Promise(resolve => setTimeout(resolve, 1000));
+            try {
+                const status = await fetch(`/chat/messages/${messageId}/audio`).then(res => res.json());
+                if (status.status === 'ready' && status.audio) {
+                    attachAudio(container, status.audio);
+                    return;
+                }
+                if (status.status !== 'pending') return;
+            } catch (error) {
+                console.error('Error checking audio status:', error);
+                return;
+            }
+        }
+    };
+
+    // The speech cache may have evicted an older reply's audio; asking for
+    // its status has the server synthesize it again, so swap the broken
+    // player for a fresh one once that is done.
+    messagesDiv.addEventListener('error', (e) => {
+        const audio = e.target;
+        if (audio.tagName !== 'AUDIO' || !audio.dataset.messageId) return;
+        const container = audio.parentElement;
+        audio.remove();
+        waitForAudio(audio.dataset.messageId, container);
+    }, true);
+
+    const parseEvent = (rawEvent) => {
+        let event = 'message';
+        let data = '';
+        rawEvent.split('\n').forEach(line => {
+            if (line.startsWith('event: ')) event = line.slice(7);
+            else if (line.startsWith('data: ')) data += line.slice(6);
+        });
+        return { event, data: data ? JSON.parse(data) : {} };
+    };
+
+    // Post a message to the streaming endpoint and render the doctor's reply
+    // token by token as it arrives.
+    const streamReply = async (messageData, thinkingDiv) => {
+        const response = await fetch('/chat/message/stream', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ ...messageData, conversation_id: conversationId })
+        });
+
+        if (!response.ok) {
+            throw new Error(`Failed to send message: ${response.statusText}`);
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let bubble = null;
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const { event, data } = parseEvent(buffer.slice(0, boundary));
+                buffer = buffer.slice(boundary + 2);
+
+                if (event === 'token') {
+                    if (!bubble) {
+                        removeThinking(thinkingDiv);
+                        bubble = addMessage('doctor', ' ').querySelector('p');
+                        bubble.textContent = '';
+                    }
+                    bubble.textContent += data.text;
+                    messagesDiv.scrollTop = messagesDiv.scrollHeight;
+                } else if (event === 'done') {
+                    removeThinking(thinkingDiv);
+                    conversationId = data.conversation_id;
+                    if (!bubble) {
+                        bubble = addMessage('doctor', data.response).querySelector('p');
+                    }
+                    bubble.textContent = data.response;
+                    if (data.audio) {
+                        attachAudio(bubble.parentElement, data.audio);
+                    } else if (data.audio_pending) {
+                        waitForAudio(data.message_id, bubble.parentElement);
+                    }
+                    return data;
+                } else if (event === 'error') {
+                    throw new Error(data.error);
+                }
+            }
+        }
+        throw new Error('Connection closed before the reply finished');
+    };
+
+    // Older conversations are fetched a page at a time and inserted above
+    // the ones already on screen, oldest first.
+    const loadEarlier = document.querySelector('.load-earlier');
+    if (loadEarlier) {
+        loadEarlier.addEventListener('click', async () => {
+            loadEarlier.disabled = true;
+            try {
+                const page = await fetch(`/chat/conversations?before=${encodeURIComponent(loadEarlier.dataset.cursor)}`)
+                    .then(res => res.json());
+                const anchor = loadEarlier.nextSibling;
+                (page.conversations || []).slice().reverse().forEach(conversation => {
+                    conversation.messages.forEach(message => {
+                        messagesDiv.insertBefore(
+                            buildMessage(message.sender, message.text_content, message.image_path, message.audio_path,
+                                         message.sender === 'doctor' ? message.id : null),
+                            anchor
+                        );
+                    });
+                });
+                if (page.next_cursor) {
+                    loadEarlier.dataset.cursor = page.next_cursor;
+                    loadEarlier.disabled = false;
+                } else {
+                    loadEarlier.remove();
+                }
+            } catch (error) {
+                console.error('Error loading earlier conversations:', error);
+                loadEarlier.disabled = false;
+            }
+        });
+    }
+
     const displayUploadedFile = (filename, filePath) => {
         const existingPreview = document.querySelector('.file-preview');
         if (existingPreview) existingPreview.remove();
@@ -148,21 +297,8 @@ document.addEventListener('DOMContentLoaded', () => {
         };
 
         try {
-            const response = await fetch('/chat/message', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify(messageData)
-            });
-
-            if (!response.ok) {
-                throw new Error(`Failed to send message: ${response.statusText}`);
-            }
-
-            const data = await response.json();
-
-            removeThinking(thinkingDiv);
             addMessage('user', text, filePath);
-            addMessage('doctor', data.response, null, data.audio, true);
+            await streamReply(messageData, thinkingDiv);
         } catch (error) {
             console.error('Error sending message:', error);
             removeThinking(thinkingDiv);
@@ -258,22 +394,10 @@ document.addEventListener('DOMContentLoaded', () => {
                 generate_speech: true
             };
 
+            addMessage('user', text, uploadResponse.file_path);
             const thinkingDiv = showThinking();
             try {
-                const response = await fetch('/chat/message', {
-                    method: 'POST',
-                    headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify(messageData)
-                });
-
-                if (!response.ok) {
-                    throw new Error(`Failed to send message: ${response.statusText}`);
-                }
-
-                const data = await response.json();
-                removeThinking(thinkingDiv);
-                addMessage('user', text, uploadResponse.file_path);
-                addMessage('doctor', data.response, null, data.audio, true);
+                await streamReply(messageData, thinkingDiv);
             } catch (error) {
                 console.error('Error sending image message:', error);
                 removeThinking(thinkingDiv);
@@ -298,13 +422,14 @@ document.addEventListener('DOMContentLoaded', () => {
                 audio_path: audioPath,
                 generate_speech: true
             };
-            const response = await fetch('/chat/message', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify(messageData)
-            }).then(res => res.json());
-
-            addMessage('doctor', response.response, null, response.audio, true);
+            const thinkingDiv = showThinking();
+            try {
+                await streamReply(messageData, thinkingDiv);
+            } catch (error) {
+                console.error('Error sending transcribed message:', error);
+                removeThinking(thinkingDiv);
+                addMessage('doctor', 'Error sending message: ' + error.message);
+            }
         }
     };
 
@@ -312,6 +437,67 @@ document.addEventListener('DOMContentLoaded', () => {
     let audioChunks = [];
     let startTime;
 
+    // Streaming upload: MediaRecorder timeslices are posted as they are
+    // recorded so the server can transcribe finished sentences while the
+    // user is still talking. Falls back to a single upload on failure.
+    const CHUNK_INTERVAL_MS = 1000;
+    let recordingId = null;
+    let chunkChain = Promise.resolve();
+    let liveDiv = null;
+    let recordingStopping = false;
+
+    const startStreamingRecording = async () => {
+        try {
+            const res = await fetch('/chat/recordings', { method: 'POST' });
+            if (!res.ok) return null;
+            return (await res.json()).recording_id;
+        } catch (e) {
+            console.warn('Streaming transcription unavailable:', e);
+            return null;
+        }
+    };
+
+    const showPartial = (text) => {
+        if (!text) return;
+        if (!liveDiv) {
+            liveDiv = addMessage('user', text);
+            liveDiv.classList.add('partial');
+        } else {
+            liveDiv.querySelector('p').textContent = text;
+        }
+        messagesDiv.scrollTop = messagesDiv.scrollHeight;
+    };
+
+    const postChunk = (blob, path) => {
+        return fetch(`/chat/recordings/${recordingId}/${path}`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'audio/webm' },
+            body: blob
+        }).then(res => res.json());
+    };
+
+    const uploadWholeRecording = async (audioBlob) => {
+        const formData = new FormData();
+        formData.append('file', audioBlob, 'recording.webm');
+        return fetch('/chat/upload', {
+            method: 'POST',
+            body: formData
+        }).then(res => res.json());
+    };
+
+    const finishRecording = async (audioBlob, lastChunk) => {
+        if (recordingId) {
+            try {
+                await chunkChain;
+                const result = await postChunk(lastChunk, 'finish');
+                if (!result.error) return result;
+            } catch (e) {
+                console.warn('Streaming upload failed, uploading the whole recording:', e);
+            }
+        }
+        return uploadWholeRecording(audioBlob);
+    };
+
     micIcon.addEventListener('click', async () => {
         if (micIcon.classList.contains('recording')) {
             const elapsedTime = Date.now() - startTime;
@@ -320,6 +506,7 @@ document.addEventListener('DOMContentLoaded', () => {
                 micIcon.classList.remove('recording');
                 return;
             }
+            recordingStopping = true;
             mediaRecorder.stop();
             micIcon.classList.remove('recording');
         } else {
@@ -328,9 +515,24 @@ document.addEventListener('DOMContentLoaded', () => {
                 mediaRecorder = new MediaRecorder(stream, { mimeType: 'audio/webm' });
                 audioChunks = [];
                 startTime = Date.now();
+                recordingId = await startStreamingRecording();
+                chunkChain = Promise.resolve();
+                liveDiv = null;
+                let lastChunk = new Blob([], { type: 'audio/webm' });
+                recordingStopping = false;
 
                 mediaRecorder.ondataavailable = (e) => {
                     audioChunks.push(e.data);
+                    if (!recordingId) return;
+                    if (recordingStopping) {
+                        // The final timeslice goes with the finish request.
+                        lastChunk = e.data;
+                        return;
+                    }
+                    chunkChain = chunkChain
+                        .then(() => postChunk(e.data, 'chunks'))
+                        .then(result => showPartial(result.partial))
+                        .catch(err => console.warn('Chunk upload failed:', err));
                 };
 
                 mediaRecorder.onstop = async () => {
@@ -339,17 +541,13 @@ document.addEventListener('DOMContentLoaded', () => {
 
                     const audioBlob = new Blob(audioChunks, { type: 'audio/webm' });
                     if (audioBlob.size < 100) {
+                        if (liveDiv) liveDiv.remove();
                         addMessage('doctor', 'Recording is empty or too small. Please try again.');
                         return;
                     }
 
-                    const formData = new FormData();
-                    formData.append('file', audioBlob, 'recording.webm');
-
-                    const uploadResponse = await fetch('/chat/upload', {
-                        method: 'POST',
-                        body: formData
-                    }).then(res => res.json());
+                    const uploadResponse = await finishRecording(audioBlob, lastChunk);
+                    if (liveDiv) liveDiv.remove();
 
                     if (uploadResponse.error) {
                         addMessage('doctor', uploadResponse.error);
@@ -374,19 +572,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
                     const thinkingDiv = showThinking();
                     try {
-                        const response = await fetch('/chat/message', {
-                            method: 'POST',
-                            headers: { 'Content-Type': 'application/json' },
-                            body: JSON.stringify(messageData)
-                        });
-
-                        if (!response.ok) {
-                            throw new Error(`Failed to send message: ${response.statusText}`);
-                        }
-
-                        const data = await response.json();
-                        removeThinking(thinkingDiv);
-                        addMessage('doctor', data.response, null, data.audio, true);
+                        await streamReply(messageData, thinkingDiv);
                     } catch (error) {
                         console.error('Error sending transcribed message:', error);
                         removeThinking(thinkingDiv);
@@ -394,7 +580,7 @@ document.addEventListener('DOMContentLoaded', () => {
                     }
                 };
 
-                mediaRecorder.start();
+                mediaRecorder.start(recordingId ? CHUNK_INTERVAL_MS : undefined);
                 micIcon.classList.add('recording');
             } catch (e) {
                 console.error('Error accessing microphone:', e);
@@ -0,0 +1,91 @@
+"""Shared fixtures.
+
+Each test gets the real app from ``create_app`` on a fresh SQLite file,
+talking to a :class:`~benchmarks.fake_ollama.FakeOllama` server. Speech
+synthesis runs on a thread with a stub renderer instead of in pyttsx3
+worker processes, so no audio driver is needed.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app import create_app, db
+from app.models import User
+from app.utils import tts_pool as tts_pool_module
+from benchmarks.fake_ollama import FakeOllama
+from config import Config
+
+
+@pytest.fixture
+def ollama():
+    server = FakeOllama(tokens_per_second=0).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def make_app(tmp_path, ollama, monkeypatch):
+    """Build an app; keyword arguments override the test config."""
+    def stub_synthesize(text, language="en"):
+        return 'stub.wav'
+
+    monkeypatch.setattr(tts_pool_module, '_synthesize', stub_synthesize)
+    monkeypatch.setattr(tts_pool_module.tts_pool, '_executor', ThreadPoolExecutor(max_workers=1))
+
+    def build(**overrides):
+        settings = dict(
+            TESTING=True,
+            SECRET_KEY='test',
+            SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'test.db'}",
+            UPLOAD_FOLDER=str(tmp_path / 'uploads'),
+            OLLAMA_HOSTS=ollama.url,
+            OLLAMA_HEALTH_INTERVAL=0,
+            OLLAMA_RETRY_ATTEMPTS=1,
+            MODEL_PRELOAD=False,
+            MEDIA_GC_INTERVAL=0,
+            TTS_AUDIO_FORMAT='wav',
+        )
+        settings.update(overrides)
+        app = create_app(type('TestConfig', (Config,), settings))
+        with app.app_context():
+            db.create_all()
+        return app
+
+    return build
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app()
+
+    @app.teardown_request
+    def end_transaction(exc):
+        # Requests share this test's app context, and so its session; end
+        # their transaction so the next one sees what worker threads commit.
+        db.session.rollback()
+
+    with app.app_context():
+        yield app
+        db.session.remove()
+
+
+def create_user(username='patient', password='secret123', **fields):
+    user = User(username=username, email=f"{username}@example.com", **fields)
+    user.set_password(password)
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+@pytest.fixture
+def user(app):
+    return create_user(medical_history='Mild asthma. Allergic to penicillin.')
+
+
+@pytest.fixture
+def client(app, user):
+    """A test client logged in as ``user``."""
+    client = app.test_client()
+    response = client.post('/auth/login', data={'username': 'patient', 'password': 'secret123'})
+    assert response.status_code == 302
+    return client
@@ -0,0 +1,69 @@
+import io
+import os
+
+import pytest
+from PIL import Image
+
+from app import db
+from app.models import Blob
+from app.utils.blob_store import PUBLIC_PREFIX, blob_store
+
+
+def png_bytes(color='red'):
+    out = io.BytesIO()
+    Image.new('RGB', (32, 32), color).save(out, format='PNG')
+    return out.getvalue()
+
+
+def upload(client, data, filename='scan.png'):
+    response = client.post('/chat/upload', data={'file': (io.BytesIO(data), filename)},
+                           content_type='multipart/form-data')
+    assert response.status_code == 200
+    return response.get_json()['file_path']
+
+
+def test_identical_uploads_are_stored_once(client):
+    first = upload(client, png_bytes())
+    second = upload(client, png_bytes(), filename='again.png')
+    other = upload(client, png_bytes('blue'))
+
+    assert first == second != other
+    assert first.startswith(PUBLIC_PREFIX)
+    assert Blob.query.count() == 2
+    assert os.path.exists(blob_store.resolve(first))
+    assert os.listdir(blob_store.tmp_dir) == []
+
+
+def test_messages_count_references(client):
+    url = upload(client, png_bytes())
+
+    for _ in range(2):
+        assert client.post('/chat/message', json={'text': 'Is this a rash?', 'image_path': url}).status_code == 200
+
+    assert db.session.get(Blob, os.path.basename(url).split('.')[0]).ref_count == 2
+
+
+@pytest.mark.parametrize('url, resolves', [
+    (PUBLIC_PREFIX + 'ab/cd/abcd' + '0' * 60 + '.png', True),
+    (PUBLIC_PREFIX + '../../../config.py', False),
+    (PUBLIC_PREFIX + 'ab/cd/ffff' + '0' * 60 + '.png', False),  # Shards do not match the digest
+])
+def test_resolve_only_accepts_well_formed_blob_names(app, url, resolves):
+    path = blob_store.resolve(url)
+
+    assert (path is not None) is resolves
+    if resolves:
+        assert path.startswith(blob_store.root)
+
+
+def test_legacy_uploads_resolve_inside_the_upload_folder(app):
+    assert blob_store.resolve('/static/uploads/../../etc/passwd') == os.path.join(
+        app.config['UPLOAD_FOLDER'], 'passwd'
+    )
+
+
+@pytest.mark.parametrize('field', ['image_path', 'audio_path', 'text'])
+def test_non_string_media_paths_are_rejected(client, field):
+    response = client.post('/chat/message', json={'text': 'Hello', field: 123})
+
+    assert response.status_code == 400
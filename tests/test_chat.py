@@ -0,0 +1,78 @@
+import logging
+from collections import OrderedDict
+from types import SimpleNamespace
+
+import pytest
+
+from app.routes import chat
+
+
+@pytest.fixture
+def failing_commit(monkeypatch):
+    def save(*args):
+        raise RuntimeError('database is locked')
+
+    monkeypatch.setattr(chat, '_save_doctor_reply', save)
+
+
+@pytest.fixture
+def decoders(monkeypatch):
+    """Stand-in decoders handed out by a fake ``transcribe_stream``, in creation order."""
+    created = []
+
+    def transcribe_stream(path, state, final=False):
+        if 'decoder' not in state:
+            state['decoder'] = SimpleNamespace(closed=False)
+            state['decoder'].close = lambda decoder=state['decoder']: setattr(decoder, 'closed', True)
+            created.append(state['decoder'])
+        return ''
+
+    monkeypatch.setattr(chat, '_recordings', OrderedDict())
+    monkeypatch.setattr(chat, 'speech_service', SimpleNamespace(transcribe_stream=transcribe_stream))
+    return created
+
+
+def send_chunk(client):
+    recording_id = client.post('/chat/recordings').get_json()['recording_id']
+    assert client.post(f'/chat/recordings/{recording_id}/chunks', data=b'webm').status_code == 200
+    return recording_id
+
+
+def test_message_gets_a_reply(client):
+    response = client.post('/chat/message', json={'text': 'I have a cough.'})
+
+    assert response.status_code == 200
+    assert response.get_json()['response']
+
+
+def test_failed_commit_is_logged(client, failing_commit, caplog):
+    with caplog.at_level(logging.ERROR, logger='app.routes.chat'):
+        response = client.post('/chat/message', json={'text': 'I have a cough.'})
+
+    assert response.status_code == 500
+    assert response.get_json() == {'error': 'Database commit failed'}
+    assert 'database is locked' in caplog.text
+
+
+def test_failed_commit_of_streamed_reply_is_logged(client, failing_commit, caplog):
+    with caplog.at_level(logging.ERROR, logger='app.routes.chat'):
+        response = client.post('/chat/message/stream', json={'text': 'I have a cough.'})
+
+    assert b'Database commit failed' in response.data
+    assert 'database is locked' in caplog.text
+
+
+def test_oldest_recording_beyond_the_per_user_cap_is_closed(client, decoders):
+    recordings = [send_chunk(client) for _ in range(chat.MAX_RECORDINGS_PER_USER + 1)]
+
+    assert [decoder.closed for decoder in decoders] == [True] + [False] * chat.MAX_RECORDINGS_PER_USER
+    assert list(chat._recordings) == recordings[1:]
+
+
+def test_idle_recording_is_closed_on_the_next_request(client, decoders, monkeypatch):
+    monkeypatch.setattr(chat, 'RECORDING_IDLE_SECONDS', 0)
+    first = send_chunk(client)
+    second = send_chunk(client)
+
+    assert decoders[0].closed and not decoders[1].closed
+    assert first not in chat._recordings and second in chat._recordings
@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+from app.models import Conversation, Message
+from app.utils.context_cache import ContextCache, message_entry
+
+START = datetime(2025, 3, 1, 9, 0)
+
+
+@pytest.fixture
+def conversation(user):
+    conversation = Conversation(user_id=user.id, last_updated=START)
+    db.session.add(conversation)
+    db.session.flush()
+    for i in range(4):
+        sender = 'user' if i % 2 == 0 else 'doctor'
+        db.session.add(Message(conversation_id=conversation.id, sender=sender,
+                               text_content=f"Message {i}", timestamp=START + timedelta(minutes=i)))
+    db.session.commit()
+    return conversation
+
+
+class Loader:
+    """``load`` callback for :meth:`ContextCache.history` that counts its calls."""
+
+    def __init__(self, conversation):
+        self.conversation = conversation
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        query = Message.query.filter_by(conversation_id=self.conversation.id)
+        if self.conversation.summarized_until:
+            query = query.filter(Message.id > self.conversation.summarized_until)
+        return [message_entry(m) for m in query.order_by(Message.timestamp, Message.id)]
+
+
+def write_turn(conversation, text):
+    """Commit a turn the way the chat routes do; returns the version before it and its entry."""
+    previous_version = (conversation.last_updated, conversation.summarized_until)
+    message = Message(conversation_id=conversation.id, sender='user', text_content=text,
+                      timestamp=conversation.last_updated + timedelta(minutes=10))
+    conversation.last_updated = message.timestamp
+    db.session.add(message)
+    db.session.commit()
+    return previous_version, message_entry(message)
+
+
+def commit_elsewhere(conversation, **values):
+    """Change the conversation's row the way another process would, behind this session's back."""
+    db.session.execute(db.update(Conversation).where(Conversation.id == conversation.id).values(**values))
+    db.session.commit()
+
+
+def texts(previous):
+    return [entry['text'] for entry in previous]
+
+
+def test_turn_written_here_is_appended_without_a_reload(conversation):
+    cache, load = ContextCache(), Loader(conversation)
+    cache.history(conversation, load)
+
+    previous_version, entry = write_turn(conversation, 'Follow-up')
+    cache.record_turn(conversation, previous_version, [entry])
+    previous, messages = cache.history(conversation, load)
+
+    assert load.calls == 1
+    assert texts(previous) == ['Message 0', 'Message 1', 'Message 2', 'Message 3', 'Follow-up']
+    assert messages[-1]['content'] == 'Follow-up'
+    assert cache.stats()['hits'] == 1
+
+
+def test_fold_committed_during_a_turn_drops_the_history(conversation):
+    cache, load = ContextCache(), Loader(conversation)
+    cache.history(conversation, load)
+    folded = Message.query.filter_by(conversation_id=conversation.id).order_by(Message.id).all()[1]
+
+    # The summarizer folds while the reply is generated, then the turn commits.
+    previous_version = (conversation.last_updated, conversation.summarized_until)
+    commit_elsewhere(conversation, summarized_until=folded.id, summary='Earlier: a cough.')
+    _, entry = write_turn(conversation, 'Follow-up')
+    cache.record_turn(conversation, previous_version, [entry])
+    previous, _ = cache.history(conversation, load)
+
+    assert load.calls == 2
+    assert texts(previous) == ['Message 2', 'Message 3', 'Follow-up']
+
+
+def test_turn_written_by_another_process_reloads_the_history(conversation):
+    cache, load = ContextCache(), Loader(conversation)
+    cache.history(conversation, load)
+
+    db.session.add(Message(conversation_id=conversation.id, sender='user', text_content='Elsewhere',
+                           timestamp=START + timedelta(minutes=30)))
+    commit_elsewhere(conversation, last_updated=START + timedelta(minutes=30))
+    previous, _ = cache.history(conversation, load)
+
+    assert load.calls == 2
+    assert texts(previous)[-1] == 'Elsewhere'
+    assert cache.stats()['misses'] == 2
@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+
+from app import db
+from app.models import Conversation, Message
+from app.utils.conversation_feed import conversation_page
+from tests.conftest import create_user
+
+START = datetime(2025, 3, 1, 9, 0)
+
+
+def add_conversations(user, count, same_start_from=None):
+    """Conversations an hour apart, oldest first; from ``same_start_from`` on they share a start time."""
+    conversations = []
+    for i in range(count):
+        hours = i if same_start_from is None else min(i, same_start_from)
+        conversation = Conversation(user_id=user.id, start_time=START + timedelta(hours=hours))
+        db.session.add(conversation)
+        db.session.flush()
+        db.session.add(Message(conversation_id=conversation.id, sender='user', text_content=f"Question {i}"))
+        db.session.add(Message(conversation_id=conversation.id, sender='doctor', text_content=f"Answer {i}"))
+        conversations.append(conversation)
+    db.session.commit()
+    return conversations
+
+
+def all_pages(user_id, limit):
+    pages, cursor = [], None
+    while True:
+        feed, cursor = conversation_page(user_id, limit, before=cursor)
+        pages.append([conversation.id for conversation, _ in feed])
+        if not cursor:
+            return pages
+
+
+def test_pages_walk_every_conversation_newest_first(user):
+    conversations = add_conversations(user, 5)
+    ids = [c.id for c in reversed(conversations)]
+
+    assert all_pages(user.id, 2) == [ids[:2], ids[2:4], ids[4:]]
+
+
+def test_cursor_breaks_start_time_ties_by_id(user):
+    conversations = add_conversations(user, 5, same_start_from=2)
+    ids = [c.id for c in sorted(conversations, key=lambda c: (c.start_time, c.id), reverse=True)]
+
+    assert sum(all_pages(user.id, 2), []) == ids
+
+
+def test_messages_come_with_their_conversation_in_order(user):
+    add_conversations(user, 2)
+    create_user('other')
+
+    feed, cursor = conversation_page(user.id, 10)
+
+    assert cursor is None
+    assert [[m.text_content for m in messages] for _, messages in feed] == [
+        ['Question 1', 'Answer 1'], ['Question 0', 'Answer 0']
+    ]
+
+
+def test_endpoint_pages_and_rejects_bad_cursors(client, user):
+    conversations = add_conversations(user, 3)
+
+    first = client.get('/chat/conversations?limit=2').get_json()
+    second = client.get(f"/chat/conversations?before={first['next_cursor']}").get_json()
+
+    assert [c['id'] for c in first['conversations']] == [conversations[2].id, conversations[1].id]
+    assert [c['id'] for c in second['conversations']] == [conversations[0].id]
+    assert second['next_cursor'] is None
+    assert client.get('/chat/conversations?before=yesterday').status_code == 400
+
+
+def test_other_users_conversations_are_not_listed(client):
+    add_conversations(create_user('other'), 2)
+
+    assert client.get('/chat/conversations').get_json() == {'conversations': [], 'next_cursor': None}
@@ -0,0 +1,26 @@
+from sqlalchemy.pool import QueuePool, StaticPool
+
+from app import db
+
+
+def test_in_memory_sqlite_subclass_gets_static_pool(make_app):
+    app = make_app(SQLALCHEMY_DATABASE_URI='sqlite://')
+
+    with app.app_context():
+        assert isinstance(db.engine.pool, StaticPool)
+
+
+def test_sqlite_file_gets_sized_queue_pool_with_pragmas(make_app):
+    app = make_app(DB_POOL_SIZE=3)
+
+    with app.app_context():
+        assert isinstance(db.engine.pool, QueuePool)
+        assert db.engine.pool.size() == 3
+        assert db.session.execute(db.text('PRAGMA journal_mode')).scalar() == 'wal'
+
+
+def test_explicit_engine_options_are_kept(make_app):
+    app = make_app(SQLALCHEMY_ENGINE_OPTIONS={'poolclass': StaticPool, 'connect_args': {'check_same_thread': False}})
+
+    with app.app_context():
+        assert isinstance(db.engine.pool, StaticPool)
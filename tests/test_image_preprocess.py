@@ -0,0 +1,49 @@
+import io
+
+import pytest
+from PIL import Image
+
+from app.utils.image_preprocess import ImagePreprocessor, InvalidImageError
+from tests.conftest import create_user
+
+
+def save_png(path, size=(1600, 800)):
+    Image.new('RGBA', size, (255, 0, 0, 128)).save(path, format='PNG')
+
+
+def test_images_are_shrunk_to_rgb_jpeg():
+    out = io.BytesIO()
+    Image.new('RGBA', (1600, 800), (255, 0, 0, 128)).save(out, format='PNG')
+
+    img = Image.open(io.BytesIO(ImagePreprocessor(max_side=400).preprocess(out.getvalue())))
+
+    assert img.format == 'JPEG' and img.mode == 'RGB'
+    assert img.size == (400, 200)
+
+
+def test_undecodable_upload_is_rejected():
+    with pytest.raises(InvalidImageError):
+        ImagePreprocessor().preprocess(b'not an image')
+
+
+def test_repeated_images_are_served_from_the_cache(tmp_path):
+    first, copy = tmp_path / 'a.png', tmp_path / 'b.png'
+    save_png(first)
+    copy.write_bytes(first.read_bytes())
+    preprocessor = ImagePreprocessor()
+
+    encoded = preprocessor.encode(str(first))
+    assert preprocessor.encode(str(first)) == encoded  # Same file, unchanged
+    assert preprocessor.encode(str(copy)) == encoded    # Same content
+
+    assert preprocessor.stats() == {'entries': 1, 'hits': 2, 'misses': 1, 'hit_rate': 0.6667}
+
+
+def test_status_reports_image_cache(make_app):
+    app = make_app()
+    with app.app_context():
+        create_user()
+    client = app.test_client()
+    client.post('/auth/login', data={'username': 'patient', 'password': 'secret123'})
+
+    assert client.get('/status/llm').get_json()['image_cache']['entries'] == 0
@@ -0,0 +1,99 @@
+import time
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+from app.models import ChatJob, Conversation
+from app.utils.jobs import JobQueue, QueueFullError
+from tests.conftest import create_user
+
+
+def wait_for_job(client, job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f'/chat/jobs/{job_id}').get_json()
+        if job['status'] in ('done', 'failed'):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+
+def add_job(job_id, user_id, **fields):
+    conversation = Conversation(user_id=user_id)
+    db.session.add(conversation)
+    db.session.flush()
+    db.session.add(ChatJob(id=job_id, user_id=user_id, conversation_id=conversation.id, **fields))
+    db.session.commit()
+
+
+def test_job_runs_and_stores_reply(client):
+    response = client.post('/chat/jobs', json={'text': 'I have a headache.'})
+
+    assert response.status_code == 202
+    job = wait_for_job(client, response.get_json()['job_id'])
+    assert job['status'] == 'done'
+    assert job['result']['response'].startswith('Hello!')
+    assert job['result']['conversation_id'] == response.get_json()['conversation_id']
+
+
+def test_too_many_pending_jobs_is_rejected(app, client, user):
+    app.config['JOB_MAX_PENDING_PER_USER'] = 1
+    add_job('a' * 32, user.id)
+
+    response = client.post('/chat/jobs', json={'text': 'Hello'})
+
+    assert response.status_code == 429
+
+
+def test_stale_running_job_is_failed_and_frees_its_slot(app, client, user):
+    app.config['JOB_MAX_PENDING_PER_USER'] = 1
+    app.config['JOB_TIMEOUT'] = 60
+    add_job('c' * 32, user.id, status='running', created_at=datetime.utcnow() - timedelta(minutes=5))
+
+    response = client.post('/chat/jobs', json={'text': 'Hello'})
+
+    assert response.status_code == 202
+    stale = client.get(f"/chat/jobs/{'c' * 32}").get_json()
+    assert stale['status'] == 'failed'
+    assert stale['error'] == 'Timed out'
+
+
+def test_job_events_stop_with_an_error_after_the_timeout(app, client, user):
+    app.config['JOB_TIMEOUT'] = 1
+    add_job('d' * 32, user.id)  # Never picked up by a worker
+
+    body = client.get(f"/chat/jobs/{'d' * 32}/events").get_data(as_text=True)
+
+    assert body.startswith('event: status')
+    assert 'event: error' in body
+    assert 'Timed out waiting for the job' in body
+
+
+def test_jobs_of_other_users_are_hidden(app, client):
+    add_job('b' * 32, create_user('other').id)
+
+    assert client.get(f"/chat/jobs/{'b' * 32}").status_code == 404
+
+
+def test_queue_runs_jobs_in_app_context_and_rejects_when_full(make_app):
+    from flask import current_app
+
+    app = make_app(JOB_WORKERS=1, JOB_QUEUE_MAX_DEPTH=1)
+    queue = JobQueue(app)
+    release, ran = threading.Event(), []
+
+    def blocking():
+        ran.append(current_app.name)
+        release.wait(5)
+
+    queue.submit(blocking)
+    while not ran:  # The worker has taken the first job off the queue
+        time.sleep(0.01)
+    queue.submit(blocking)
+    with pytest.raises(QueueFullError):
+        queue.submit(blocking)
+    release.set()
+    queue._queue.join()
+    assert ran == [app.name, app.name]
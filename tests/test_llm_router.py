@@ -0,0 +1,123 @@
+import time
+import threading
+
+import pytest
+from ollama import ResponseError
+
+from app.utils.llm_local import build_llm_service
+from app.utils.llm_router import NoBackendAvailable, OllamaRouter
+from app.utils.ollama_client import OllamaConnection
+from app.utils.services import _default_config
+from benchmarks.fake_ollama import FakeOllama
+
+MESSAGES = [{'role': 'user', 'content': 'Hello'}]
+
+
+@pytest.fixture
+def second_ollama():
+    server = FakeOllama(tokens_per_second=0).start()
+    yield server
+    server.stop()
+
+
+def router_for(*servers, **kwargs):
+    kwargs.setdefault('health_interval', 0)
+    return OllamaRouter([OllamaConnection(s.url, max_attempts=1) for s in servers], **kwargs)
+
+
+def test_fails_over_to_the_next_host(ollama, second_ollama):
+    ollama.fail_status = 500
+    router = router_for(ollama, second_ollama)
+
+    assert router.chat(model='llava:7b', messages=MESSAGES)['message']['content']
+    down, up = router.backends
+    assert not down.healthy and down.failures == 1
+    assert up.healthy and up.requests == 1
+
+    # The unhealthy host is skipped until a health check finds it again.
+    router.chat(model='llava:7b', messages=MESSAGES)
+    assert ollama.requests == 1
+    ollama.fail_status = None
+    router.check_health()
+    assert down.healthy
+
+
+def test_stream_fails_over_before_the_first_chunk(ollama, second_ollama):
+    ollama.fail_status = 503
+    router = router_for(ollama, second_ollama)
+
+    chunks = list(router.chat_stream(model='llava:7b', messages=MESSAGES))
+
+    assert ''.join(c['message']['content'] for c in chunks).strip()
+    assert second_ollama.requests == 1
+
+
+def test_successful_call_marks_the_host_healthy_again(ollama):
+    ollama.fail_status = 500
+    router = router_for(ollama)
+    backend = router.backends[0]
+    with pytest.raises(ResponseError):
+        router.chat(model='llava:7b', messages=MESSAGES)
+    assert not backend.healthy and backend.last_error
+
+    # With no healthy host left the router still tries this one.
+    ollama.fail_status = None
+    router.chat(model='llava:7b', messages=MESSAGES)
+    assert backend.healthy and backend.last_error is None
+
+    ollama.fail_status = 503
+    with pytest.raises(ResponseError):
+        list(router.chat_stream(model='llava:7b', messages=MESSAGES))
+    ollama.fail_status = None
+    assert list(router.chat_stream(model='llava:7b', messages=MESSAGES))
+    assert backend.healthy and backend.last_error is None
+
+
+def test_client_errors_do_not_fail_over(ollama, second_ollama):
+    ollama.fail_status = second_ollama.fail_status = 400
+    router = router_for(ollama, second_ollama)
+
+    with pytest.raises(ResponseError):
+        router.chat(model='llava:7b', messages=MESSAGES)
+    assert ollama.requests + second_ollama.requests == 1
+    assert all(b.healthy for b in router.backends)
+
+
+def test_requests_go_to_the_least_busy_host(ollama, second_ollama):
+    router = router_for(ollama, second_ollama, max_concurrency=2)
+    busy = router.backends[0]
+    busy.outstanding = 1
+
+    router.chat(model='llava:7b', messages=MESSAGES)
+
+    assert (ollama.requests, second_ollama.requests) == (0, 1)
+
+
+def test_waits_for_a_slot_at_the_concurrency_limit(ollama):
+    ollama.latency = 0.2
+    router = router_for(ollama, max_concurrency=1, acquire_timeout=0.05)
+    started = threading.Event()
+
+    def slow_call():
+        started.set()
+        router.chat(model='llava:7b', messages=MESSAGES)
+
+    thread = threading.Thread(target=slow_call)
+    thread.start()
+    started.wait()
+    while router.queue_depth == 0:
+        time.sleep(0.01)
+    with pytest.raises(NoBackendAvailable):
+        router.chat(model='llava:7b', messages=MESSAGES)
+    thread.join()
+    assert router.queue_depth == 0
+
+
+def test_hosts_come_from_the_config(ollama, second_ollama):
+    config = dict(_default_config(), OLLAMA_HOSTS=f"{ollama.url}, {second_ollama.url}",
+                  OLLAMA_HOST_MAX_CONCURRENCY=3, OLLAMA_HEALTH_INTERVAL=0)
+
+    router = build_llm_service(config).connection
+
+    assert [b.host for b in router.backends] == [ollama.url, second_ollama.url]
+    assert {b.max_concurrency for b in router.backends} == {3}
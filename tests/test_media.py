@@ -0,0 +1,82 @@
+import os
+
+import pytest
+
+HASHED = 'a' * 64 + '.wav'
+DATA = b'RIFF' + bytes(range(60))
+
+
+@pytest.fixture
+def media(app):
+    """Write ``name`` into UPLOAD_FOLDER and return its URL."""
+    def write(name, data=DATA):
+        path = os.path.join(app.config['UPLOAD_FOLDER'], name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return f"/static/uploads/{name}"
+    return write
+
+
+def test_upload_route_takes_precedence_over_static_files(app, media):
+    # UPLOAD_FOLDER is a temporary directory, not static/uploads, so only this route can find the file.
+    url = media(HASHED)
+
+    assert app.url_map.bind('').match(url)[0] == 'media.serve_upload'
+    response = app.test_client().get(url)
+    assert response.status_code == 200
+    assert response.data == DATA
+
+
+def test_range_request_gets_partial_content(app, media):
+    response = app.test_client().get(media(HASHED), headers={'Range': 'bytes=0-3'})
+
+    assert response.status_code == 206
+    assert response.data == b'RIFF'
+    assert response.headers['Content-Range'] == f"bytes 0-3/{len(DATA)}"
+
+
+def test_hashed_name_is_the_etag_and_cached_as_immutable(app, media):
+    client, url = app.test_client(), media(HASHED)
+
+    response = client.get(url)
+
+    assert response.headers['ETag'] == f'"{"a" * 64}"'
+    cache_control = response.cache_control
+    assert cache_control.private and cache_control.immutable and not cache_control.public
+    assert cache_control.max_age == app.config['MEDIA_MAX_AGE']
+    assert client.get(url, headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+
+def test_other_names_are_revalidated(app, media):
+    response = app.test_client().get(media('1742797632_recording.webm'))
+
+    assert response.status_code == 200
+    assert response.headers['ETag']
+    assert response.cache_control.private and not response.cache_control.immutable
+
+
+@pytest.mark.parametrize('name', ['.env', 'blobs/.tmp/upload'])
+def test_hidden_files_are_not_served(app, media, name):
+    assert app.test_client().get(media(name)).status_code == 404
+
+
+def test_missing_and_escaping_paths_are_not_served(app):
+    client = app.test_client()
+
+    assert client.get('/static/uploads/nothing.png').status_code == 404
+    assert client.get('/static/uploads/../config.py').status_code == 404
+
+
+def test_accel_redirect_hands_the_file_to_nginx(app, media):
+    app.config['MEDIA_ACCEL_REDIRECT'] = '/protected-uploads/'
+    client, url = app.test_client(), media(HASHED)
+
+    response = client.get(url)
+
+    assert response.status_code == 200
+    assert response.data == b''
+    assert response.headers['X-Accel-Redirect'] == f"/protected-uploads/{HASHED}"
+    assert response.mimetype == 'audio/x-wav'
+    assert response.cache_control.immutable
+    assert client.get(url, headers={'If-None-Match': response.headers['ETag']}).status_code == 304
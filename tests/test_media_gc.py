@@ -0,0 +1,74 @@
+import os
+
+import pytest
+
+from app import db
+from app.models import Blob, Conversation, Message
+from app.utils.blob_store import blob_store
+from app.utils.media_gc import media_collector
+from tests.test_blob_store import png_bytes, upload
+
+
+@pytest.fixture
+def no_grace(monkeypatch):
+    monkeypatch.setattr(media_collector, 'grace', 0)
+
+
+def add_message(user, **media):
+    conversation = Conversation(user_id=user.id)
+    db.session.add(conversation)
+    db.session.flush()
+    db.session.add(Message(conversation_id=conversation.id, sender='user', text_content='See attached', **media))
+    db.session.commit()
+
+
+def touch(app, name):
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    path = os.path.join(app.config['UPLOAD_FOLDER'], name)
+    with open(path, 'wb') as f:
+        f.write(b'x' * 10)
+    return path
+
+
+def test_unreferenced_blobs_are_collected(client, no_grace):
+    kept = upload(client, png_bytes())
+    dropped = upload(client, png_bytes('blue'))
+    client.post('/chat/message', json={'text': 'Is this a rash?', 'image_path': kept})
+
+    report = media_collector.sweep()
+
+    assert report['blobs'] == 1 and report['bytes'] > 0
+    assert os.path.exists(blob_store.resolve(kept))
+    assert not os.path.exists(blob_store.resolve(dropped))
+    assert [blob.ref_count for blob in Blob.query.all()] == [1]
+
+
+def test_blobs_within_the_grace_period_are_kept(client):
+    url = upload(client, png_bytes())
+
+    assert media_collector.sweep()['blobs'] == 0
+    assert os.path.exists(blob_store.resolve(url))
+
+
+def test_drifted_reference_counts_are_corrected(client, user, no_grace):
+    url = upload(client, png_bytes())
+    add_message(user, image_path=url)  # Written without acquiring a reference
+
+    report = media_collector.sweep()
+
+    assert report['recounted'] == 1 and report['blobs'] == 0
+    assert Blob.query.one().ref_count == 1
+
+
+def test_only_unreferenced_generated_files_are_collected(app, user, no_grace):
+    generated = [touch(app, name) for name in ('7_0123abcd_recording.webm', '1742806361_recording.wav',
+                                               'response_1742.mp3')]
+    referenced = touch(app, '1742797632_recording.mp3')
+    others = [touch(app, name) for name in ('1742794707_acne.jpg', 'README.txt')]
+    add_message(user, audio_path='/static/uploads/1742797632_recording.mp3')
+
+    report = media_collector.sweep()
+
+    assert report['files'] == 3
+    assert not any(os.path.exists(path) for path in generated)
+    assert all(os.path.exists(path) for path in [referenced] + others)
@@ -0,0 +1,75 @@
+import time
+import threading
+
+import pytest
+
+from app.utils.model_manager import model_manager
+
+MODEL = 'llava:7b'
+
+
+@pytest.fixture
+def preload_app(make_app, ollama, monkeypatch):
+    """An app with preloading on; tests call ``refresh()`` instead of the background thread."""
+    ollama.load_time = 0.3
+    monkeypatch.setattr(model_manager._thread, 'start', lambda count=1: None)
+    monkeypatch.setattr(model_manager, '_states', {})
+    return make_app(MODEL_PRELOAD=True, MODEL_CHECK_INTERVAL=60, OLLAMA_KEEP_ALIVE='1s')
+
+
+def state(ollama):
+    return model_manager._state(ollama.url, MODEL)
+
+
+def test_ready_is_503_until_the_models_are_loaded(preload_app, ollama):
+    client = preload_app.test_client()
+    assert client.get('/ready').status_code == 503
+    assert not model_manager.ready()
+
+    model_manager.refresh()
+
+    response = client.get('/ready')
+    assert response.status_code == 200
+    assert response.get_json()['models'][0]['state'] == 'loaded'
+    assert ollama.loads == 1
+
+
+def test_refresh_reloads_a_model_whose_keep_alive_ran_out(preload_app, ollama):
+    client = preload_app.test_client()
+    model_manager.refresh()
+    assert state(ollama) == 'loaded'
+    time.sleep(1.1)  # OLLAMA_KEEP_ALIVE=1s, so /api/ps no longer lists it
+
+    refresh = threading.Thread(target=model_manager.refresh)
+    refresh.start()
+    while state(ollama) == 'loaded':
+        time.sleep(0.01)
+    assert state(ollama) in ('unloaded', 'loading')
+    assert client.get('/ready').status_code == 503
+    refresh.join()
+
+    assert state(ollama) == 'loaded'
+    assert client.get('/ready').status_code == 200
+    assert ollama.loads == 2
+
+
+def test_model_expiring_before_the_next_check_is_kept_alive(preload_app, ollama):
+    model_manager.refresh()
+    requests = ollama.requests
+
+    model_manager.refresh()
+
+    # /api/ps plus the load request that resets keep_alive; nothing is reloaded.
+    assert ollama.requests == requests + 2
+    assert ollama.loads == 1
+    assert state(ollama) == 'loaded'
+
+
+def test_failed_load_is_reported_and_not_ready(preload_app, ollama):
+    ollama.fail_status = 500
+
+    model_manager.refresh()
+
+    assert state(ollama) == 'failed'
+    assert model_manager.stats()[0]['error']
+    assert preload_app.test_client().get('/ready').status_code == 503
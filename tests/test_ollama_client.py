@@ -0,0 +1,84 @@
+import time
+
+import httpx
+import pytest
+from ollama import ResponseError
+
+from app.utils.ollama_client import CircuitBreaker, CircuitOpenError, OllamaConnection, is_transient
+
+MESSAGES = [{'role': 'user', 'content': 'Hello'}]
+
+
+@pytest.mark.parametrize('exc, transient', [
+    (httpx.ConnectError('refused'), True),
+    (httpx.ReadTimeout('slow'), True),
+    (ResponseError('overloaded', 503), True),
+    (ResponseError('busy', 429), True),
+    (ResponseError('model not found', 404), False),
+    (ResponseError('bad request', 400), False),
+    (CircuitOpenError(), False),
+    (ValueError(), False),
+])
+def test_is_transient(exc, transient):
+    assert is_transient(exc) is transient
+
+
+def test_breaker_opens_then_lets_one_trial_call_through():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    breaker.before_call()  # Still closed
+    breaker.record_failure()
+
+    assert breaker.state == 'open'
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    time.sleep(0.06)
+    breaker.before_call()
+    assert breaker.state == 'half_open'
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # Only one trial at a time
+    breaker.record_success()
+    assert breaker.state == 'closed' and breaker.failures == 0
+
+
+def test_failed_trial_call_reopens_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=5, reset_timeout=0)
+    for _ in range(5):
+        breaker.record_failure()
+    breaker.before_call()
+    breaker.record_failure()
+
+    assert breaker.state == 'open'
+
+
+def test_connection_chats(ollama):
+    connection = OllamaConnection(ollama.url)
+
+    response = connection.chat(model='llava:7b', messages=MESSAGES)
+
+    assert response['message']['content']
+    assert connection.breaker.state == 'closed'
+
+
+def test_server_errors_are_retried_and_open_the_breaker(ollama):
+    ollama.fail_status = 500
+    connection = OllamaConnection(ollama.url, max_attempts=2, failure_threshold=2)
+
+    with pytest.raises(ResponseError):
+        connection.chat(model='llava:7b', messages=MESSAGES)
+    assert ollama.requests == 2
+    assert connection.breaker.state == 'open'
+    with pytest.raises(CircuitOpenError):
+        connection.chat(model='llava:7b', messages=MESSAGES)
+    assert ollama.requests == 2
+
+
+def test_client_errors_are_not_retried_and_keep_the_breaker_closed(ollama):
+    ollama.fail_status = 400
+    connection = OllamaConnection(ollama.url, max_attempts=3, failure_threshold=1)
+
+    with pytest.raises(ResponseError):
+        connection.chat(model='llava:7b', messages=MESSAGES)
+    assert ollama.requests == 1
+    assert connection.breaker.state == 'closed'
@@ -0,0 +1,28 @@
+import random
+
+import pytest
+
+from app import db
+from benchmarks import query_plans
+
+USERS, CONVERSATIONS = 20, 5
+
+
+@pytest.fixture(scope='module')
+def plans(tmp_path_factory):
+    random.seed(7)
+    app = query_plans.make_app(tmp_path_factory.mktemp('plans') / 'plans.db')
+    with app.app_context():
+        db.create_all()
+        query_plans.seed(USERS, CONVERSATIONS, messages=12)
+        yield {name: (ok, plan) for name, ok, _, plan in query_plans.check_plans(USERS, CONVERSATIONS)}
+        db.session.remove()
+
+
+@pytest.mark.parametrize('name', [
+    'feed conversations', 'feed messages', 'context window', 'conversation messages', 'pending jobs', 'expired jobs'
+])
+def test_hot_query_uses_its_index_without_sorting(plans, name):
+    ok, plan = plans[name]
+
+    assert ok, ' / '.join(plan)
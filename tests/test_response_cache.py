@@ -0,0 +1,80 @@
+from app.utils.metrics import metrics
+from app.utils.response_cache import ResponseCache, profile_bucket
+from tests.conftest import create_user
+
+
+def patient(**fields):
+    info = {'username': 'alice', 'age': 34, 'gender': 'Female', 'medical_history': 'Asthma'}
+    info.update(fields)
+    return info
+
+
+def lookups(result):
+    return dict(metrics.counter('response_cache_lookups_total', '', ('result',)).samples()).get(
+        f'response_cache_lookups_total{{result="{result}"}}', 0
+    )
+
+
+def test_reply_is_shared_with_the_username_swapped():
+    cache = ResponseCache()
+    cache.put('What helps a cough?', patient(), 'alice, try honey and rest.')
+
+    assert cache.get('what helps a COUGH', patient(username='bob')) == 'bob, try honey and rest.'
+
+
+def test_replies_are_not_shared_across_ages_or_histories():
+    cache = ResponseCache()
+    cache.put('What helps a cough?', patient(), 'At 34, try honey.')
+
+    assert profile_bucket(patient(age=35)) != profile_bucket(patient())
+    assert cache.get('What helps a cough?', patient(age=35)) is None
+    assert cache.get('What helps a cough?', patient(medical_history='Diabetes')) is None
+
+
+def test_entries_expire_and_are_evicted_least_recently_used_first():
+    cache = ResponseCache(max_entries=2, ttl=0)
+    cache.put('cough', patient(), 'Rest.')
+    assert cache.get('cough', patient()) is None
+
+    cache = ResponseCache(max_entries=2)
+    cache.put('cough', patient(), 'Rest.')
+    cache.put('fever', patient(), 'Fluids.')
+    cache.get('cough', patient())
+    cache.put('rash', patient(), 'Cream.')
+
+    assert cache.get('fever', patient()) is None
+    assert cache.get('cough', patient()) == 'Rest.'
+
+
+def test_similar_prompts_hit_through_embeddings():
+    vectors = {'what helps a cough': (1.0, 0.0), 'how do i soothe a cough': (0.99, 0.05), 'rash': (0.0, 1.0)}
+    cache = ResponseCache(embed=vectors.get)
+    cache.put('What helps a cough?', patient(), 'Honey.')
+
+    assert cache.get('How do I soothe a cough?', patient()) == 'Honey.'
+    assert cache.get('Rash', patient()) is None
+    assert cache.stats()['semantic_hits'] == 1
+
+
+def test_lookups_are_counted():
+    before = {result: lookups(result) for result in ('hit', 'miss')}
+    cache = ResponseCache()
+    cache.get('cough', patient())
+    cache.put('cough', patient(), 'Rest.')
+    cache.get('cough', patient())
+
+    assert lookups('hit') == before['hit'] + 1
+    assert lookups('miss') == before['miss'] + 1
+    assert cache.stats() == {'entries': 1, 'hits': 1, 'semantic_hits': 0, 'misses': 1, 'hit_rate': 0.5}
+
+
+def test_status_reports_response_cache(make_app):
+    app = make_app(RESPONSE_CACHE_ENABLED=True)
+    with app.app_context():
+        create_user()
+    client = app.test_client()
+    client.post('/auth/login', data={'username': 'patient', 'password': 'secret123'})
+
+    status = client.get('/status/llm').get_json()
+
+    assert status['response_cache']['entries'] == 0
@@ -0,0 +1,52 @@
+import json
+
+from app import db
+from app.models import Message
+from benchmarks.fake_ollama import DEFAULT_REPLY
+
+
+def parse_events(body):
+    events = []
+    for raw in body.decode('utf-8').split('\n\n'):
+        if not raw.strip():
+            continue
+        lines = dict(line.split(': ', 1) for line in raw.splitlines())
+        events.append((lines['event'], json.loads(lines['data'])))
+    return events
+
+
+def test_stream_sends_tokens_then_done(client):
+    response = client.post('/chat/message/stream', json={'text': 'I have a cough.'})
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    assert response.headers['Cache-Control'] == 'no-cache'
+    events = parse_events(response.data)
+    names = [name for name, _ in events]
+    assert names[-1] == 'done'
+    assert set(names[:-1]) == {'token'}
+    streamed = ''.join(data['text'] for name, data in events if name == 'token')
+    assert streamed.strip() == DEFAULT_REPLY
+
+    done = events[-1][1]
+    assert done['response'] == DEFAULT_REPLY.split('Dr. Jhatka:')[-1].strip()
+    assert done['ttft_ms'] is not None and done['total_ms'] >= done['ttft_ms']
+    reply = db.session.get(Message, done['message_id'])
+    assert reply.sender == 'doctor' and reply.text_content == done['response']
+    assert [m.sender for m in reply.conversation.messages] == ['user', 'doctor']
+
+
+def test_stream_reports_llm_failure_without_saving(client, ollama):
+    ollama.fail_status = 400  # Not retried
+
+    response = client.post('/chat/message/stream', json={'text': 'I have a cough.'})
+
+    assert parse_events(response.data) == [('error', {'error': 'LLM processing failed'})]
+    assert Message.query.filter_by(sender='user', text_content='I have a cough.').count() == 0
+
+
+def test_stream_rejects_empty_message(client):
+    response = client.post('/chat/message/stream', json={})
+
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Message or media required'}
@@ -0,0 +1,63 @@
+import threading
+
+import pytest
+import speech_recognition as sr
+
+from app.utils.audio_decode import SAMPLE_RATE
+from app.utils.services import _default_config
+from app.utils.stt import GoogleSTT, STTBackend, WhisperSTT, build_stt_backend
+
+
+def silence(seconds=0.1):
+    return sr.AudioData(b'\0\0' * int(SAMPLE_RATE * seconds), SAMPLE_RATE, 2)
+
+
+class RecordingWhisper(WhisperSTT):
+    """Runs no model; records which thread ran which batch."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.calls = []
+
+    def _run(self, arrays, language):
+        self.calls.append((threading.current_thread().name, len(arrays)))
+        return [f"{len(array)} samples" for array in arrays]
+
+
+def test_backends_must_implement_transcribe():
+    with pytest.raises(TypeError):
+        STTBackend()
+
+
+def test_batch_is_run_by_the_batcher_thread():
+    stt = RecordingWhisper(batch_size=4, batch_window=0.05)
+
+    texts = stt.transcribe_batch([silence(0.1), silence(0.2), silence(0.3)])
+
+    assert texts == ['1600 samples', '3200 samples', '4800 samples']
+    assert {name for name, _ in stt.calls} == {'whisper-batcher'}
+    assert sum(size for _, size in stt.calls) == 3
+
+
+def test_concurrent_requests_share_a_batch():
+    stt = RecordingWhisper(batch_size=4, batch_window=0.2)
+    threads = [threading.Thread(target=stt.transcribe, args=(silence(),)) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert stt.calls == [('whisper-batcher', 3)]
+
+
+def test_backend_and_settings_come_from_the_config():
+    config = dict(_default_config(), STT_BACKEND='whisper', STT_MODEL='openai/whisper-tiny',
+                  STT_BATCH_SIZE=2, STT_BATCH_WINDOW_MS=50)
+
+    stt = build_stt_backend(config)
+
+    assert isinstance(stt, WhisperSTT)
+    assert (stt.model, stt.batch_size, stt.batch_window) == ('openai/whisper-tiny', 2, 0.05)
+    assert isinstance(build_stt_backend(dict(config, STT_BACKEND='Google')), GoogleSTT)
+    with pytest.raises(ValueError):
+        build_stt_backend(dict(config, STT_BACKEND='vosk'))
@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+from app.models import Conversation, Message
+from app.routes.chat import _recent_messages, get_user_info
+from app.utils.context_cache import context_cache
+from app.utils.summarizer import summarizer
+from tests.conftest import create_user
+
+START = datetime(2025, 3, 1, 9, 0)
+
+
+@pytest.fixture
+def small_window_app(make_app):
+    app = make_app(SUMMARY_RECENT_MESSAGES=2, SUMMARY_BATCH=2)
+    with app.app_context():
+        yield app
+        db.session.remove()
+
+
+def add_conversation(user, count):
+    conversation = Conversation(user_id=user.id)
+    db.session.add(conversation)
+    db.session.flush()
+    for i in range(count):
+        sender = 'user' if i % 2 == 0 else 'doctor'
+        db.session.add(Message(conversation_id=conversation.id, sender=sender,
+                               text_content=f"Message {i}", timestamp=START + timedelta(minutes=i)))
+    db.session.commit()
+    return conversation
+
+
+def texts(entries):
+    return [entry['text'] for entry in entries]
+
+
+def test_window_comes_from_the_config(small_window_app):
+    assert summarizer.window == 4
+    assert context_cache.window == 4
+
+
+def test_short_conversation_is_not_summarized(small_window_app, ollama):
+    conversation = add_conversation(create_user(), 4)
+
+    summarizer.summarize(conversation.id)
+
+    assert ollama.requests == 0
+    assert conversation.summary is None and conversation.summarized_until is None
+
+
+def test_oldest_messages_are_folded_into_the_summary(small_window_app, ollama):
+    conversation = add_conversation(create_user(), 5)
+    messages = Message.query.order_by(Message.id).all()
+
+    summarizer.summarize(conversation.id)
+
+    assert conversation.summary.startswith('Dr. Jhatka: Hello!')
+    assert conversation.summarized_until == messages[2].id  # All but the 2 most recent
+    assert 'Message 2' in ollama._last_prompt and 'Message 3' not in ollama._last_prompt
+    assert texts(_recent_messages(conversation)) == ['Message 3', 'Message 4']
+
+
+def test_failed_summary_keeps_the_old_one(small_window_app, ollama):
+    conversation = add_conversation(create_user(), 5)
+    conversation.summary, conversation.summarized_until = 'Earlier: a cough.', None
+    db.session.commit()
+    ollama.fail_status = 500
+
+    summarizer.summarize(conversation.id)
+
+    assert conversation.summary == 'Earlier: a cough.'
+    assert conversation.summarized_until is None
+
+
+def test_prompt_history_is_the_summary_plus_the_window(small_window_app):
+    user = create_user()
+    conversation = add_conversation(user, 7)
+
+    assert texts(_recent_messages(conversation)) == ['Message 3', 'Message 4', 'Message 5', 'Message 6']
+
+    conversation.summary = 'Earlier: a cough.'
+    conversation.summarized_until = Message.query.filter_by(text_content='Message 4').one().id
+    db.session.commit()
+    user_info = get_user_info(conversation, user=user)
+
+    assert user_info['summary'] == 'Earlier: a cough.'
+    assert texts(user_info['previous_conversation']) == ['Message 5', 'Message 6']
@@ -0,0 +1,65 @@
+import os
+import time
+
+from app import db
+from app.models import Conversation, Message
+from app.utils import tts_pool as tts_pool_module
+from app.utils.tts_cache import TTSCache, synthesize_cached
+from app.utils.tts_pool import tts_pool
+
+
+def write(path, size):
+    with open(path, 'wb') as f:
+        f.write(b'\0' * size)
+
+
+def test_evict_removes_least_recently_used_first(tmp_path):
+    cache = TTSCache(str(tmp_path), max_bytes=250)
+    for i, key in enumerate(['old', 'used', 'new']):
+        write(cache.path(key), 100)
+        os.utime(cache.path(key), (1000 + i, 1000 + i))
+    cache.get('used')  # Touched, so now the most recent
+
+    assert cache.evict() == 100
+    assert sorted(os.listdir(tmp_path)) == ['new.wav', 'used.wav']
+
+
+def test_synthesize_cached_renders_a_reply_once(tmp_path):
+    cache = TTSCache(str(tmp_path))
+    rendered = []
+
+    def render(text, path):
+        rendered.append(text)
+        write(path, 10)
+
+    first = synthesize_cached(cache, 'Drink water', 'voice', 150, 'en', render)
+    second = synthesize_cached(cache, 'Drink water', 'voice', 150, 'en', render)
+
+    assert first == second and os.path.exists(first)
+    assert rendered == ['Drink water']
+
+
+def test_evicted_reply_audio_is_synthesized_again(client, user, monkeypatch):
+    def synthesize(text, language="en"):
+        os.makedirs(tts_pool.cache_dir, exist_ok=True)
+        write(os.path.join(tts_pool.cache_dir, 'reply.wav'), 10)
+        return 'reply.wav'
+
+    monkeypatch.setattr(tts_pool_module, '_synthesize', synthesize)
+    conversation = Conversation(user_id=user.id)
+    db.session.add(conversation)
+    db.session.flush()
+    message = Message(conversation_id=conversation.id, sender='doctor', text_content='Rest well.',
+                      audio_path=tts_pool.public_prefix + 'reply.wav', audio_status='ready')
+    db.session.add(message)
+    db.session.commit()
+
+    status = client.get(f'/chat/messages/{message.id}/audio').get_json()
+    assert status['status'] == 'pending'
+
+    deadline = time.monotonic() + 5
+    while status['status'] == 'pending' and time.monotonic() < deadline:
+        time.sleep(0.05)
+        status = client.get(f'/chat/messages/{message.id}/audio').get_json()
+    assert status == {'message_id': message.id, 'status': 'ready', 'audio': tts_pool.public_prefix + 'reply.wav'}
+    assert os.path.exists(os.path.join(tts_pool.cache_dir, 'reply.wav'))
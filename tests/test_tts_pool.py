@@ -0,0 +1,69 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from app import db
+from app.models import Conversation, Message
+from app.utils import tts_pool as tts_pool_module
+from app.utils.tts_pool import tts_pool
+
+
+@pytest.fixture
+def reply(app, user):
+    conversation = Conversation(user_id=user.id)
+    db.session.add(conversation)
+    db.session.flush()
+    message = Message(conversation_id=conversation.id, sender='doctor', text_content='Rest well.',
+                      audio_status='pending')
+    db.session.add(message)
+    db.session.commit()
+    return message
+
+
+def wait_for_audio(message, timeout=5):
+    """Poll until ``_on_done``, which runs after the future resolves, has committed."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        db.session.rollback()
+        if db.session.get(Message, message.id).audio_status != 'pending':
+            return db.session.get(Message, message.id)
+        time.sleep(0.02)
+    raise AssertionError(f"Audio of message {message.id} is still pending")
+
+
+def test_synthesized_reply_becomes_ready(reply):
+    tts_pool.submit(reply.id, reply.text_content).result(timeout=5)
+
+    message = wait_for_audio(reply)
+    assert message.audio_status == 'ready'
+    assert message.audio_path == tts_pool.public_prefix + 'stub.wav'
+
+
+def test_failed_synthesis_marks_the_reply_failed(reply, monkeypatch):
+    def synthesize(text, language="en"):
+        raise RuntimeError('audio driver crashed')
+
+    monkeypatch.setattr(tts_pool_module, '_synthesize', synthesize)
+
+    tts_pool.submit(reply.id, reply.text_content)
+
+    message = wait_for_audio(reply)
+    assert message.audio_status == 'failed'
+    assert message.audio_path is None
+
+
+def test_broken_pool_is_replaced_and_the_reply_still_synthesized(reply, monkeypatch):
+    class BrokenExecutor:
+        def submit(self, *args):
+            raise BrokenProcessPool('A child process terminated abruptly')
+
+    fresh = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(tts_pool, '_executor', BrokenExecutor())
+    monkeypatch.setattr(tts_pool_module, 'ProcessPoolExecutor', lambda **kwargs: fresh)
+
+    tts_pool.submit(reply.id, reply.text_content)
+
+    assert tts_pool._executor is fresh
+    assert wait_for_audio(reply).audio_status == 'ready'
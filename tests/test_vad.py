@@ -0,0 +1,119 @@
+import io
+import math
+import wave
+import shutil
+
+import numpy as np
+import pytest
+
+from app.utils import vad
+from app.utils.audio_decode import SAMPLE_RATE, StreamDecoder
+from app.utils.speech import SpeechService
+from app.utils.stt import STTBackend
+
+
+def tone(seconds, amplitude=8000):
+    t = np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+    return (amplitude * np.sin(2 * math.pi * 440 * t)).astype('<i2').tobytes()
+
+
+def silence(seconds):
+    return b'\0\0' * int(SAMPLE_RATE * seconds)
+
+
+class RawPCMDecoder:
+    """Treats the file as raw PCM; stands in for ffmpeg."""
+
+    def __init__(self):
+        self.fed = 0
+        self.pending = b''
+
+    def feed(self, path):
+        with open(path, 'rb') as f:
+            f.seek(self.fed)
+            data = f.read()
+        self.fed += len(data)
+        self.pending += data
+
+    def take(self):
+        pcm, self.pending = self.pending, b''
+        return pcm
+
+    finish = take
+
+    def close(self):
+        pass
+
+
+class CountingSTT(STTBackend):
+    def __init__(self):
+        self.segments = []
+
+    def transcribe(self, audio, language="en-US"):
+        self.segments.append(len(audio.frame_data))
+        return f"segment {len(self.segments)}"
+
+
+def test_frame_energies_are_rms_per_frame():
+    samples = np.array([3, -4] * 240 + [0] * 480 + [1], dtype='<i2')
+
+    energies, size = vad.frame_energies(samples.tobytes(), SAMPLE_RATE)
+
+    assert size == 480
+    assert energies == pytest.approx([math.sqrt(12.5), 0.0])
+
+
+def test_split_finds_speech_between_silences():
+    pcm = silence(1) + tone(1) + silence(1) + tone(0.5) + silence(0.3)
+
+    segments = vad.split(pcm, SAMPLE_RATE)
+
+    assert [seg.closed for seg in segments] == [True, False]
+    starts = [seg.start / (SAMPLE_RATE * 2) for seg in segments]
+    assert starts == pytest.approx([0.85, 2.85], abs=0.04)
+
+
+def test_stream_decodes_and_analyses_each_chunk_once(tmp_path, monkeypatch):
+    analysed = []
+    frame_energies = vad.frame_energies
+    monkeypatch.setattr(vad, 'frame_energies', lambda pcm, *args: analysed.append(len(pcm)) or frame_energies(pcm, *args))
+    stt = CountingSTT()
+    service = SpeechService(stt)
+    state = {'offset': 0, 'texts': [], 'decoder': RawPCMDecoder(), 'pcm': bytearray(), 'energies': []}
+    path = tmp_path / 'recording.raw'
+    pcm = silence(5) + tone(1) + silence(1) + tone(1) + silence(1) + tone(0.5)
+    chunk = SAMPLE_RATE * 2 // 2  # Half a second per upload
+
+    partials = []
+    for i in range(0, len(pcm), chunk):
+        with open(path, 'ab') as f:
+            f.write(pcm[i:i + chunk])
+        partials.append(service.transcribe_stream(str(path), state, final=i + chunk >= len(pcm)))
+
+    assert partials[-1] == 'segment 1 segment 2 segment 3'
+    assert sum(analysed) <= len(pcm) + len(analysed) * 960  # Each frame once, plus partial frames
+    assert state['offset'] + len(state['pcm']) == len(pcm)
+    # Leading silence was dropped instead of being re-analysed on every chunk.
+    assert len(state['energies']) < SpeechService.stream_keep_frames + 100
+
+
+@pytest.mark.skipif(not shutil.which('ffmpeg'), reason='ffmpeg is not installed')
+def test_stream_decoder_decodes_a_growing_file(tmp_path):
+    out = io.BytesIO()
+    with wave.open(out, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(SAMPLE_RATE)
+        w.writeframes(tone(2))
+    data, path = out.getvalue(), tmp_path / 'recording.wav'
+    decoder = StreamDecoder()
+    pcm = b''
+    for i in range(0, len(data), 16000):
+        with open(path, 'ab') as f:
+            f.write(data[i:i + 16000])
+        decoder.feed(str(path))
+        pcm += decoder.take()
+    pcm += decoder.finish()
+
+    assert decoder.fed == len(data)
+    assert len(pcm) == SAMPLE_RATE * 2 * 2